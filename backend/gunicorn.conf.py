@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for production.
+
+Serves the ASGI application with uvicorn workers:
+
+    gunicorn trip_tracker.asgi:application
+
+Gunicorn reads this file from the working directory. PORT, WEB_CONCURRENCY
+and KEEP_ALIVE override the defaults below.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Each worker is an event loop with one thread for sync views; more than
+# one per core only adds contention
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Writes invalidate cached responses by bumping version keys, which a
+# per-process locmem cache keeps from the other workers
+if workers > 1 and os.environ.get("CACHE_BACKEND", "locmem") == "locmem":
+    raise RuntimeError(
+        f"{workers} workers cannot share the locmem cache: set CACHE_BACKEND "
+        "to db (after manage.py createcachetable) or file, or WEB_CONCURRENCY=1"
+    )
+
+# Under ASGI each request's sync code runs in a new thread, so a persistent
+# connection would never be reused; Postgres uses its pool instead
+os.environ.setdefault("CONN_MAX_AGE", "0")
+
+# Keep idle client connections open for reuse; set above the load balancer's
+# idle timeout if there is one in front
+keepalive = int(os.environ.get("KEEP_ALIVE", 75))
+
+timeout = 30
+graceful_timeout = 30
+
+# Recycle workers now and then to bound memory growth
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = "-"
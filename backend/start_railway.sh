@@ -5,9 +5,13 @@ set -e
 
 echo "🚛 Starting Trip Tracker on Railway..."
 
+# Every worker must see the others' cache invalidations
+export CACHE_BACKEND="${CACHE_BACKEND:-db}"
+
 # Run migrations
 echo "Running database migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 # Load fixtures
 echo "Loading fixtures..."
@@ -15,5 +19,5 @@ python manage.py loaddata user_driver.json
 python manage.py loaddata truck.json
 python manage.py loaddata trailer.json
 
-echo "Starting Django server..."
-python manage.py runserver 0.0.0.0:${PORT:-8080} 
\ No newline at end of file
+echo "Starting Gunicorn with uvicorn workers..."
+exec gunicorn trip_tracker.asgi:application 
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Database configuration.
+
+DATABASE_URL selects the database: a postgres:// URL gets a psycopg
+connection pool, a sqlite:// URL (or no URL, for the project's db.sqlite3)
+gets SQLite tuned for concurrent readers and writers. The tuning PRAGMAs are
+applied to every new SQLite connection by the connection_created receiver
+below, which is connected as soon as the settings import this module.
+"""
+
+import os
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+import dj_database_url
+
+# Applied in order to every new SQLite connection
+SQLITE_PRAGMAS = {
+    # Milliseconds to wait for a lock before "database is locked"; first, so
+    # it also covers switching the journal mode
+    "busy_timeout": 5000,
+    # Readers see the last commit while a writer appends to the WAL, so
+    # writers no longer block readers (or readers writers)
+    "journal_mode": "wal",
+    # With WAL, NORMAL only risks the last commits on power loss, never
+    # corruption, and skips an fsync per transaction
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_settings(path):
+    """Settings for a tuned SQLite database at `path`"""
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(path),
+        "CONN_MAX_AGE": _env_int("CONN_MAX_AGE", 600),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Take the write lock when a transaction starts: a deferred
+            # transaction that reads and then writes can't wait for a busy
+            # lock, it fails at once with "database is locked"
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        },
+    }
+
+
+def database_settings(default_sqlite_path):
+    """settings.DATABASES["default"] from DATABASE_URL and related variables"""
+    url = os.environ.get("DATABASE_URL", f"sqlite:///{default_sqlite_path}")
+    database = dj_database_url.parse(url)
+
+    if database["ENGINE"] == "django.db.backends.postgresql":
+        # The pool is shared by every thread of the process, which also covers
+        # ASGI, where each request's sync code runs in a fresh thread; Django
+        # requires CONN_MAX_AGE = 0 with it
+        database["CONN_MAX_AGE"] = 0
+        database["OPTIONS"] = {
+            "pool": {
+                "min_size": _env_int("DATABASE_POOL_MIN_SIZE", 2),
+                "max_size": _env_int("DATABASE_POOL_MAX_SIZE", 10),
+                "timeout": _env_int("DATABASE_POOL_TIMEOUT", 10),
+            }
+        }
+    elif database["ENGINE"] == "django.db.backends.sqlite3":
+        database.update(sqlite_settings(database["NAME"]))
+    return database
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,14 +45,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "trips.metrics.metrics_middleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "trips.tokens.token_auth_middleware",
+    "trips.writebehind.read_your_writes_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "trips.caching.response_cache_middleware",
 ]
 
 ROOT_URLCONF = "trip_tracker.urls"
@@ -75,10 +82,35 @@ WSGI_APPLICATION = "trip_tracker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_URL selects Postgres (pooled) or SQLite; see trip_tracker/database.py
+# for the SQLite tuning and the other DATABASE_* and CONN_MAX_AGE variables.
+
+DATABASES = {"default": database_settings(BASE_DIR / "db.sqlite3")}
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND is "locmem" (default), "file" (CACHE_LOCATION is a directory)
+# or "db" (CACHE_LOCATION is a table; run `manage.py createcachetable`).
+# Local memory is per process: cache versions bumped by one worker are not
+# seen by others, so run several workers with "file" or "db".
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+}
+CACHE_LOCATIONS = {
+    "locmem": "trip-tracker",
+    "file": str(BASE_DIR / "cache"),
+    "db": "trip_tracker_cache",
+}
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", CACHE_LOCATIONS[CACHE_BACKEND]),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
@@ -136,3 +168,46 @@ CORS_ALLOW_CREDENTIALS = True
 #     "http://localhost:3000",
 #     "http://127.0.0.1:3000",
 # ]
+
+# Worker processes rendering batches of printable daily logs
+LOG_RENDER_WORKERS = int(os.environ.get("LOG_RENDER_WORKERS", os.cpu_count() or 1))
+
+# Profile a sample of requests and keep the profiles of those slower than
+# PROFILE_SLOW_REQUESTS seconds (unset: no profiling)
+PROFILE_SLOW_REQUESTS = (
+    float(os.environ["PROFILE_SLOW_REQUESTS"])
+    if os.environ.get("PROFILE_SLOW_REQUESTS")
+    else None
+)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", BASE_DIR / "profiles")
+
+# Road route providers, tried in order (see trips.routing); straight_line
+# needs no network. Each provider's routes are cached in the database, up to
+# ROUTE_CACHE_MAX_ENTRIES.
+ROUTE_PROVIDERS = os.environ.get("ROUTE_PROVIDERS", "mapbox,straight_line").split(",")
+MAPBOX_ACCESS_TOKEN = os.environ.get("MAPBOX_ACCESS_TOKEN", "")
+OSRM_URL = os.environ.get("OSRM_URL", "")
+ROUTE_CACHE_MAX_ENTRIES = int(os.environ.get("ROUTE_CACHE_MAX_ENTRIES", "10000"))
+
+# Where duty status events are fanned out to streams (see trips.events):
+# LocalHub within each process, or BrokerHub through EVENT_BROKER across them
+EVENT_HUB = os.environ.get("EVENT_HUB", "trips.events.LocalHub")
+EVENT_BROKER = os.environ.get("EVENT_BROKER", "trips.events.LocalBroker")
+
+# Completed daily logs older than this many days are moved to the archive by
+# `manage.py archive_daily_logs` (see trips.archive)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "183"))
+
+# API bearer tokens (see trips.tokens): how long one lasts, and how often each
+# process reloads the list of revoked ones
+AUTH_TOKEN_MAX_AGE = int(os.environ.get("AUTH_TOKEN_MAX_AGE", "43200"))
+AUTH_TOKEN_DENYLIST_REFRESH = int(os.environ.get("AUTH_TOKEN_DENYLIST_REFRESH", "30"))
+
+# Single duty status POSTs journaled and stored in batches by a writer thread
+# instead of in the request (see trips.writebehind): a batch is written every
+# WRITE_BEHIND_FLUSH_MS or WRITE_BEHIND_MAX_EVENTS statuses
+DUTY_STATUS_WRITE_BEHIND = os.environ.get("DUTY_STATUS_WRITE_BEHIND") == "1"
+WRITE_BEHIND_DIR = os.environ.get("WRITE_BEHIND_DIR", BASE_DIR / "journal")
+WRITE_BEHIND_FLUSH_MS = int(os.environ.get("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_MAX_EVENTS = int(os.environ.get("WRITE_BEHIND_MAX_EVENTS", "500"))
@@ -4,6 +4,7 @@ Production Django settings for trip_tracker project.
 
 import os
 from pathlib import Path
+from .database import database_settings
 from .settings import *
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -20,12 +21,8 @@ ALLOWED_HOSTS = ['*']
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Configured from DATABASE_URL in trip_tracker/database.py
+DATABASES = {'default': database_settings(BASE_DIR / 'db.sqlite3')}
 
 # CORS settings for production
 CORS_ALLOW_ALL_ORIGINS = False  # Disable for production
@@ -1,11 +1,43 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .models import Driver, Trailer, DailyLog, DutyStatus, Truck
+from .pagination import EstimatedCountPaginator
+
+# Statuses shown on a daily log's page; the rest are a link away
+INLINE_DUTY_STATUSES = 50
+# Pages past the one shown that a changelist counts rows for
+COUNTED_PAGES_AHEAD = 10
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """For tables that grow with the fleet: no full-table counts"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        # Count far enough past the page shown that the next ones can be
+        # reached, so every page of a long list is a few clicks away
+        try:
+            page = max(int(request.GET.get(PAGE_VAR, 1)), 1)
+        except ValueError:
+            page = 1
+        return self.paginator(
+            queryset,
+            per_page,
+            count_up_to=(page + COUNTED_PAGES_AHEAD) * per_page,
+            **kwargs,
+        )
 
 
 @admin.register(Driver)
 class DriverAdmin(admin.ModelAdmin):
     list_display = ["user", "license_number", "phone", "created_at"]
+    list_select_related = ["user"]
     list_filter = ["created_at"]
     search_fields = [
         "user__username",
@@ -15,6 +47,13 @@ class DriverAdmin(admin.ModelAdmin):
         "phone",
     ]
     readonly_fields = ["created_at", "updated_at"]
+    autocomplete_fields = ["user"]
+
+    def get_queryset(self, request):
+        # For autocompletes too; the changelist skips list_select_related
+        # when the queryset already selects related objects
+        queryset = super().get_queryset(request)
+        return queryset.select_related(*self.list_select_related)
 
 
 @admin.register(Truck)
@@ -33,15 +72,38 @@ class TrailerAdmin(admin.ModelAdmin):
     readonly_fields = ["created_at", "updated_at"]
 
 
+class LatestDutyStatusFormSet(BaseInlineFormSet):
+    """A log's latest INLINE_DUTY_STATUSES statuses, newest first"""
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            self._queryset = self.queryset.select_related(
+                "daily_log__driver__user"
+            ).order_by("-timestamp", "-id")[:INLINE_DUTY_STATUSES]
+        return self._queryset
+
+
 class DutyStatusInline(admin.TabularInline):
+    """
+    Read-only view of a log's latest statuses, where new ones can be added;
+    existing ones are edited on their own pages
+    """
+
     model = DutyStatus
-    extra = 1
+    formset = LatestDutyStatusFormSet
+    extra = 0
     fields = ["duty_status", "location_address", "timestamp", "notes"]
-    readonly_fields = ["created_at"]
+    show_change_link = True
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(DailyLog)
-class DailyLogAdmin(admin.ModelAdmin):
+class DailyLogAdmin(LargeTableAdmin):
     list_display = [
         "id",
         "driver",
@@ -51,31 +113,55 @@ class DailyLogAdmin(admin.ModelAdmin):
         "status",
         "created_at",
     ]
-    list_filter = ["status", "created_at", "truck", "trailer"]
+    list_select_related = ["driver__user", "co_driver__user", "truck", "trailer"]
+    # A filter per truck or trailer would list the whole fleet; search them
+    list_filter = ["status", "created_at"]
     search_fields = [
         "driver__user__username",
         "co_driver__user__username",
         "truck__truck_number",
         "trailer__trailer_number",
     ]
-    readonly_fields = ["created_at", "updated_at"]
+    readonly_fields = ["created_at", "updated_at", "all_duty_statuses"]
+    autocomplete_fields = ["driver", "co_driver", "truck", "trailer"]
     inlines = [DutyStatusInline]
     fieldsets = (
         (
             "Daily Log Information",
             {"fields": ("driver", "co_driver", "truck", "trailer", "status")},
         ),
+        ("Duty Statuses", {"fields": ("all_duty_statuses",)}),
         (
             "Timestamps",
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
 
+    def get_queryset(self, request):
+        # For autocompletes too, as for drivers
+        queryset = super().get_queryset(request)
+        return queryset.select_related(*self.list_select_related)
+
+    @admin.display(description="All duty statuses")
+    def all_duty_statuses(self, obj):
+        if obj.pk is None:
+            return "-"
+        url = reverse("admin:trips_dutystatus_changelist")
+        return format_html(
+            '<a href="{}?daily_log__id__exact={}">Every status of this log</a> '
+            "(the latest {} are listed below)",
+            url,
+            obj.pk,
+            INLINE_DUTY_STATUSES,
+        )
+
 
 @admin.register(DutyStatus)
-class DutyStatusAdmin(admin.ModelAdmin):
+class DutyStatusAdmin(LargeTableAdmin):
     list_display = ["daily_log", "duty_status", "location_address", "timestamp"]
+    list_select_related = ["daily_log__driver__user"]
     list_filter = ["duty_status", "timestamp", "created_at"]
     search_fields = ["daily_log__driver__user__username", "location_address", "notes"]
     readonly_fields = ["created_at"]
+    autocomplete_fields = ["daily_log"]
     ordering = ["daily_log", "timestamp"]
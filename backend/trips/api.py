@@ -1,17 +1,79 @@
-from typing import List
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import List, Literal, Tuple
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth import logout as django_logout
 from django.contrib.auth.models import User
-from django.shortcuts import get_object_or_404
-
-from ninja import NinjaAPI, Schema
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from asgiref.sync import sync_to_async
+from ninja import NinjaAPI, Query, Schema
+from ninja.errors import HttpError
 from ninja.orm import create_schema
-
+from ninja.pagination import paginate
+
+from .archive import archived_daily_log, archived_duty_statuses
+from .caching import (
+    DAILY_LOGS,
+    FLEET_RECORDS,
+    cached_response,
+    collection_version,
+    conditional_response,
+    log_version,
+)
+from .events import (
+    FLEET,
+    astream_events,
+    driver_channel,
+    get_hub,
+    log_channel,
+    stream_events,
+)
+from .exports import FORMATS, astream_export, export_queryset, stream_export
+from .fleet import fleet_hos_summary
+from .grid import get_grid, get_zone
+from .hos import evaluate_driver
+from .ingest import (
+    IDEMPOTENCY_KEY_LENGTH,
+    MAX_BATCH_SIZE,
+    ingest_duty_statuses,
+    validate_item,
+)
+from .metrics import (
+    CONTENT_TYPE,
+    PREFIX,
+    MeteredRenderer,
+    instrument_views,
+    registry,
+)
 from .models import Driver, DailyLog, Truck, Trailer, DutyStatus
+from .pagination import KeysetPagination
+from .positions import drivers_along, drivers_within, nearest_drivers
+from .printing import (
+    RENDERERS,
+    driver_sheets,
+    log_sheet,
+    printable_logs,
+    render_document,
+)
+from .routing import RouteUnavailable, get_route
+from .tokens import expiry_time, issue_token, revoke, session_principal
+from .writebehind import (
+    RECEIPT_WAIT_SECONDS,
+    get_queue,
+    new_receipt,
+    receipt_status,
+    wait_for_receipt,
+)
 
 # Create API instance
-api = NinjaAPI()
+api = NinjaAPI(renderer=MeteredRenderer())
 
 @api.get("/")
 def api_root(request):
@@ -19,12 +81,113 @@ def api_root(request):
     return {"message": "Trip Tracker API is running", "status": "ok"}
 
 # Auto-generate schema from model
-DailyLogSchema = create_schema(DailyLog, depth=2, exclude=["co_driver"])
 DailyLogCreateSchema = create_schema(DailyLog, exclude=["id", "created_at", "updated_at"])
 UserSchema = create_schema(User, exclude=["password", "groups", "user_permissions"])
-DriverSchema = create_schema(Driver, depth=2)
-TruckSchema = create_schema(Truck)
-TrailerSchema = create_schema(Trailer)
+TruckSchema = create_schema(
+    Truck, fields=["id", "truck_number", "make_model", "year", "license_plate"]
+)
+TrailerSchema = create_schema(
+    Trailer, fields=["id", "trailer_number", "trailer_type", "capacity"]
+)
+
+
+def full_name(user):
+    return user.get_full_name() or user.username
+
+
+class DriverSchema(Schema):
+    id: int
+    name: str
+    username: str
+    license_number: str
+    phone: str
+
+    @staticmethod
+    def resolve_name(obj):
+        return full_name(obj.user)
+
+    @staticmethod
+    def resolve_username(obj):
+        return obj.user.username
+
+
+# Related objects a daily log can embed with ?expand=
+EXPANDABLE = ("driver", "co_driver", "truck", "trailer")
+
+
+def expanded_relations(expand):
+    """The relations named in an ?expand= value, e.g. "driver,truck" """
+    relations = {name.strip() for name in (expand or "").split(",") if name.strip()}
+    unknown = relations.difference(EXPANDABLE)
+    if unknown:
+        raise HttpError(
+            400,
+            f"Cannot expand {', '.join(sorted(unknown))}; "
+            f"choose from {', '.join(EXPANDABLE)}",
+        )
+    return relations
+
+
+class DailyLogSchema(Schema):
+    """
+    A daily log with the ids of its driver and equipment and the few fields
+    lists show. The related objects themselves are only embedded when asked
+    for with ?expand=driver,co_driver,truck,trailer.
+    """
+
+    id: int
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    driver_id: int
+    co_driver_id: int | None = None
+    truck_id: int
+    trailer_id: int
+    driver_name: str
+    truck_number: str
+    trailer_number: str
+    miles: float
+    driver: DriverSchema | None = None
+    co_driver: DriverSchema | None = None
+    truck: TruckSchema | None = None
+    trailer: TrailerSchema | None = None
+
+    @staticmethod
+    def resolve_driver_name(obj):
+        return full_name(obj.driver.user)
+
+    @staticmethod
+    def resolve_truck_number(obj):
+        return obj.truck.truck_number
+
+    @staticmethod
+    def resolve_trailer_number(obj):
+        return obj.trailer.trailer_number
+
+    @staticmethod
+    def _expanded(obj, context, relation):
+        expand = context["request"].GET.get("expand")
+        if relation in expanded_relations(expand):
+            return getattr(obj, relation)
+        return None
+
+    @staticmethod
+    def resolve_driver(obj, context):
+        return DailyLogSchema._expanded(obj, context, "driver")
+
+    @staticmethod
+    def resolve_co_driver(obj, context):
+        return DailyLogSchema._expanded(obj, context, "co_driver")
+
+    @staticmethod
+    def resolve_truck(obj, context):
+        return DailyLogSchema._expanded(obj, context, "truck")
+
+    @staticmethod
+    def resolve_trailer(obj, context):
+        return DailyLogSchema._expanded(obj, context, "trailer")
+
+
 DutyStatusSchema = create_schema(DutyStatus)
 DutyStatusCreateSchema = create_schema(DutyStatus, exclude=["id", "created_at", "daily_log"])
 
@@ -36,6 +199,14 @@ class DailyLogCreateInput(Schema):
     co_driver_id: int | None = None
     status: str = "planning"
 
+
+class DailyLogUpdateInput(Schema):
+    driver_id: int | None = None
+    co_driver_id: int | None = None
+    truck_id: int | None = None
+    trailer_id: int | None = None
+    status: str | None = None
+
 class DutyStatusCreateInput(Schema):
     duty_status: str
     location_address: str
@@ -43,6 +214,107 @@ class DutyStatusCreateInput(Schema):
     longitude: float | None = None
     timestamp: str
     notes: str | None = None
+    idempotency_key: str | None = None
+
+
+class DutyStatusBatchItem(DutyStatusCreateInput):
+    daily_log_id: int
+
+
+class DutyStatusBatchResult(Schema):
+    index: int
+    status: str
+    id: int | None = None
+    error: str | None = None
+
+
+class DutyStatusBatchResponse(Schema):
+    created: int
+    duplicates: int
+    errors: int
+    events_per_second: float
+    results: List[DutyStatusBatchResult]
+
+
+class HosViolationSchema(Schema):
+    rule: str
+    occurred_at: datetime
+    detail: str
+
+
+class HosClocksSchema(Schema):
+    driving_remaining: float
+    window_remaining: float
+    break_remaining: float
+    cycle_remaining: float
+    available_to_drive: float
+    off_duty_elapsed: float
+
+
+class HosReportSchema(Schema):
+    as_of: datetime
+    current_status: str | None = None
+    violations: List[HosViolationSchema]
+    clocks: HosClocksSchema
+
+
+class GridTransitionSchema(Schema):
+    slot: int
+    status: str
+
+
+class LogGridSchema(Schema):
+    daily_log_id: int
+    date: date
+    timezone: str
+    statuses: List[str]
+    slots: List[int]
+    totals: dict[str, float]
+    transitions: List[GridTransitionSchema]
+
+
+class LastStatusSchema(Schema):
+    duty_status: str
+    timestamp: datetime
+    location_address: str
+    latitude: float | None = None
+    longitude: float | None = None
+
+
+class NearbyDriverSchema(Schema):
+    driver_id: int
+    name: str
+    latitude: float
+    longitude: float
+    distance_km: float
+    along_route_km: float | None = None
+    duty_status: str
+    location_address: str
+    timestamp: datetime
+
+
+class CorridorInput(Schema):
+    route: List[Tuple[float, float]]
+    width_km: float = 10
+    limit: int = 100
+    max_age_hours: float | None = None
+
+
+class RouteSchema(Schema):
+    polyline: str
+    distance_km: float
+    duration_hours: float
+    provider: str
+    cached: bool
+
+
+class DriverHosSummarySchema(Schema):
+    driver_id: int
+    name: str
+    cycle_hours_used: float
+    cycle_hours_remaining: float
+    today: dict[str, float]
+    last_status: LastStatusSchema | None = None
 
 
 # Login schema
@@ -57,11 +329,22 @@ class LoginResponseSchema(Schema):
     user: UserSchema | None = None
     driver: DriverSchema | None = None
     message: str = None
+    # Bearer token for the Authorization header, and when it expires
+    token: str | None = None
+    expires_at: datetime | None = None
+
+
+class PrincipalSchema(Schema):
+    user_id: int
+    username: str
+    driver_id: int | None
+    is_staff: bool
+    expires_at: datetime | None = None
 
 
 @api.post("/login", response=LoginResponseSchema)
 def login(request, payload: LoginSchema):
-    """Authenticate user and return user data"""
+    """Authenticate user and return user data with a bearer token"""
     user = authenticate(username=payload.username, password=payload.password)
 
     if user is not None:
@@ -71,11 +354,14 @@ def login(request, payload: LoginSchema):
         except Driver.DoesNotExist:
             driver = None
 
+        token, expires_at = issue_token(user, driver.id if driver else None)
         return {
             "success": True,
             "user": user,
             "driver": driver,
             "message": "Login successful",
+            "token": token,
+            "expires_at": expiry_time(expires_at),
         }
     else:
         return {
@@ -88,21 +374,111 @@ def login(request, payload: LoginSchema):
 
 @api.post("/logout")
 def logout(request):
-    """Log out the current user (session-based)"""
+    """Log out the current user, revoking their bearer token"""
+    if request.principal:
+        revoke(request.principal)
     django_logout(request)
     return {"success": True, "message": "Logged out successfully"}
 
 
+@api.get("/me", response=PrincipalSchema)
+def me(request):
+    """Who the request is authenticated as, by bearer token or session"""
+    principal = request.principal or session_principal(request.user)
+    if principal is None:
+        raise HttpError(401, "Not authenticated")
+    return {
+        **principal._asdict(),
+        "expires_at": principal.expires_at and expiry_time(principal.expires_at),
+    }
+
+
+# Columns DailyLogSchema shows from each relation when it is not expanded
+DISPLAY_COLUMNS = {
+    "driver": [
+        "driver__user__first_name",
+        "driver__user__last_name",
+        "driver__user__username",
+    ],
+    "truck": ["truck__truck_number"],
+    "trailer": ["trailer__trailer_number"],
+}
+EXPANDED_QUERYSETS = {
+    "driver": Driver.objects.select_related("user"),
+    "co_driver": Driver.objects.select_related("user"),
+    "truck": Truck.objects.all(),
+    "trailer": Trailer.objects.all(),
+}
+
+
+def daily_logs_with_relations(expand=()):
+    """
+    Daily logs with what DailyLogSchema serializes: the display columns of
+    their driver and equipment joined in, and each expanded relation fetched
+    in bulk, one query for the whole page
+    """
+    columns = ["id", "status", "miles", "created_at", "updated_at", *EXPANDABLE]
+    joined = []
+    for relation, display_columns in DISPLAY_COLUMNS.items():
+        if relation not in expand:
+            joined.append(display_columns[0].rpartition("__")[0])
+            columns.extend(display_columns)
+    daily_logs = DailyLog.objects.only(*columns).prefetch_related(
+        *(
+            Prefetch(relation, queryset=EXPANDED_QUERYSETS[relation])
+            for relation in EXPANDABLE
+            if relation in expand
+        )
+    )
+    # select_related() without arguments would join every relation
+    return daily_logs.select_related(*joined) if joined else daily_logs
+
+
+def daily_log_list_versions(request, **kwargs):
+    return collection_version(DAILY_LOGS), collection_version(FLEET_RECORDS)
+
+
+def daily_log_versions(request, daily_log_id, **kwargs):
+    return log_version(daily_log_id), collection_version(FLEET_RECORDS)
+
+
 @api.get("/daily-logs", response=List[DailyLogSchema])
-def list_daily_logs(request):
-    """Get all daily logs"""
-    return DailyLog.objects.all().order_by('-created_at')
+@cached_response(daily_log_list_versions)
+@paginate(KeysetPagination)
+async def list_daily_logs(
+    request,
+    driver_id: int | None = None,
+    truck_id: int | None = None,
+    status: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    expand: str | None = None,
+):
+    """Get daily logs, newest first, one cursor page at a time"""
+    daily_logs = daily_logs_with_relations(expanded_relations(expand))
+    if driver_id is not None:
+        daily_logs = daily_logs.filter(driver_id=driver_id)
+    if truck_id is not None:
+        daily_logs = daily_logs.filter(truck_id=truck_id)
+    if status:
+        daily_logs = daily_logs.filter(status=status)
+    if created_after:
+        daily_logs = daily_logs.filter(created_at__gte=created_after)
+    if created_before:
+        daily_logs = daily_logs.filter(created_at__lt=created_before)
+    return daily_logs
 
 
 @api.get("/daily-logs/{daily_log_id}", response=DailyLogSchema)
-def get_daily_log(request, daily_log_id: int):
+@cached_response(daily_log_versions)
+async def get_daily_log(request, daily_log_id: int, expand: str | None = None):
     """Get a specific daily log by ID"""
-    return get_object_or_404(DailyLog, id=daily_log_id)
+    daily_log = await daily_logs_with_relations(expanded_relations(expand)).filter(
+        id=daily_log_id
+    ).afirst() or await sync_to_async(archived_daily_log)(daily_log_id)
+    if daily_log is None:
+        raise Http404
+    return daily_log
 
 
 @api.post("/daily-logs", response=DailyLogSchema)
@@ -127,7 +503,7 @@ def create_daily_log(request, payload: DailyLogCreateInput):
 
 
 @api.put("/daily-logs/{daily_log_id}", response=DailyLogSchema)
-def update_daily_log(request, daily_log_id: int, payload: DailyLogSchema):
+def update_daily_log(request, daily_log_id: int, payload: DailyLogUpdateInput):
     """Update a daily log"""
     daily_log = get_object_or_404(DailyLog, id=daily_log_id)
     for attr, value in payload.dict(exclude_unset=True).items():
@@ -144,19 +520,103 @@ def delete_daily_log(request, daily_log_id: int):
     return {"success": True}
 
 
+@api.get("/daily-logs/{daily_log_id}/grid", response=LogGridSchema)
+async def get_daily_log_grid(request, daily_log_id: int, tz: str | None = None):
+    """Get the 96-slot paper-log grid, totals and transitions for a daily log"""
+    daily_log = await aget_object_or_404(DailyLog, id=daily_log_id)
+    try:
+        zone = get_zone(tz)
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    return await sync_to_async(get_grid)(daily_log, zone)
+
+
+def printable_response(request, sheets, format, title):
+    document = render_document(sheets, format, title)
+    response = conditional_response(request, document, RENDERERS[format][2])
+    response["Content-Disposition"] = f'inline; filename="{title}.{format}"'
+    return response
+
+
+@api.get("/daily-logs/{daily_log_id}/print")
+def print_daily_log(
+    request,
+    daily_log_id: int,
+    format: Literal["pdf", "svg"] = "pdf",
+    tz: str | None = None,
+):
+    """Render a daily log as a printable paper-log page (PDF or SVG)"""
+    daily_log = get_object_or_404(printable_logs(), id=daily_log_id)
+    try:
+        zone = get_zone(tz)
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    sheet = log_sheet(daily_log, zone)
+    return printable_response(request, [sheet], format, f"daily-log-{daily_log_id}")
+
+
 # DutyStatus endpoints
+def duty_status_list_versions(request, daily_log_id, **kwargs):
+    return (log_version(daily_log_id),)
+
+
 @api.get("/daily-logs/{daily_log_id}/duty-statuses", response=List[DutyStatusSchema])
-def list_duty_statuses(request, daily_log_id: int):
+@cached_response(duty_status_list_versions)
+async def list_duty_statuses(request, daily_log_id: int):
     """Get all duty statuses for a daily log"""
+    if not await DailyLog.objects.filter(id=daily_log_id).aexists():
+        duty_statuses = await sync_to_async(archived_duty_statuses)(daily_log_id)
+        if duty_statuses is None:
+            raise Http404
+        return duty_statuses
+    return [
+        duty_status
+        async for duty_status in DutyStatus.objects.filter(daily_log_id=daily_log_id)
+    ]
+
+
+class DutyStatusReceiptSchema(Schema):
+    # Send it as X-Write-Receipt to read the status once it is stored
+    receipt: str
+    status: Literal["queued"]
+
+
+@api.post(
+    "/daily-logs/{daily_log_id}/duty-statuses",
+    response={200: DutyStatusSchema, 202: DutyStatusReceiptSchema},
+)
+def create_duty_status(request, daily_log_id: int, payload: DutyStatusCreateInput):
+    """Create a new duty status for a daily log, or queue it for write-behind"""
     daily_log = get_object_or_404(DailyLog, id=daily_log_id)
-    return daily_log.duty_statuses.all()
 
+    if payload.idempotency_key:
+        if len(payload.idempotency_key) > IDEMPOTENCY_KEY_LENGTH:
+            raise HttpError(
+                400, f"Idempotency key longer than {IDEMPOTENCY_KEY_LENGTH} characters"
+            )
+        existing = DutyStatus.objects.filter(
+            idempotency_key=payload.idempotency_key
+        ).first()
+        if existing:
+            if existing.daily_log_id != daily_log.id:
+                raise HttpError(
+                    409, "Idempotency key already used for another daily log"
+                )
+            return existing
+
+    if settings.DUTY_STATUS_WRITE_BEHIND:
+        record = {
+            "daily_log_id": daily_log.id,
+            **payload.dict(),
+            "idempotency_key": payload.idempotency_key or new_receipt(),
+        }
+        _, error = validate_item(
+            SimpleNamespace(**record), {daily_log.id: daily_log.driver_id}
+        )
+        if error:
+            raise HttpError(400, error)
+        return 202, {"receipt": get_queue().submit(record), "status": "queued"}
 
-@api.post("/daily-logs/{daily_log_id}/duty-statuses", response=DutyStatusSchema)
-def create_duty_status(request, daily_log_id: int, payload: DutyStatusCreateInput):
-    """Create a new duty status for a daily log"""
-    daily_log = get_object_or_404(DailyLog, id=daily_log_id)
-    
     duty_status = DutyStatus.objects.create(
         daily_log=daily_log,
         duty_status=payload.duty_status,
@@ -164,15 +624,60 @@ def create_duty_status(request, daily_log_id: int, payload: DutyStatusCreateInpu
         latitude=payload.latitude,
         longitude=payload.longitude,
         timestamp=payload.timestamp,
-        notes=payload.notes
+        notes=payload.notes or "",
+        idempotency_key=payload.idempotency_key,
     )
     return duty_status
 
 
+@api.post("/duty-statuses/batch", response=DutyStatusBatchResponse)
+def create_duty_statuses_batch(request, payload: List[DutyStatusBatchItem]):
+    """Create duty statuses for one or many daily logs in a single transaction"""
+    if len(payload) > MAX_BATCH_SIZE:
+        raise HttpError(400, f"Batch size is limited to {MAX_BATCH_SIZE} events")
+
+    started = time.perf_counter()
+    results = ingest_duty_statuses(payload)
+    elapsed = time.perf_counter() - started
+
+    counts = {"created": 0, "duplicate": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "created": counts["created"],
+        "duplicates": counts["duplicate"],
+        "errors": counts["error"],
+        "events_per_second": round(len(payload) / elapsed, 1) if elapsed else 0.0,
+        "results": results,
+    }
+
+
+@api.get(
+    "/duty-statuses/receipts/{receipt}",
+    response={200: DutyStatusSchema, 202: DutyStatusReceiptSchema},
+)
+def get_duty_status_receipt(request, receipt: str, wait: float = 0):
+    """
+    The duty status a write-behind receipt stands for, waiting up to `wait`
+    seconds for it to be stored
+    """
+    if wait:
+        wait_for_receipt(receipt, min(wait, RECEIPT_WAIT_SECONDS))
+    duty_status = DutyStatus.objects.filter(idempotency_key=receipt).first()
+    if duty_status:
+        return duty_status
+    status, error = receipt_status(receipt)
+    if status == "queued":
+        return 202, {"receipt": receipt, "status": "queued"}
+    if status == "error":
+        raise HttpError(422, error)
+    raise Http404
+
+
 @api.get("/duty-statuses/{duty_status_id}", response=DutyStatusSchema)
-def get_duty_status(request, duty_status_id: int):
+async def get_duty_status(request, duty_status_id: int):
     """Get a specific duty status by ID"""
-    return get_object_or_404(DutyStatus, id=duty_status_id)
+    return await aget_object_or_404(DutyStatus, id=duty_status_id)
 
 
 @api.put("/duty-statuses/{duty_status_id}", response=DutyStatusSchema)
@@ -191,3 +696,213 @@ def delete_duty_status(request, duty_status_id: int):
     duty_status = get_object_or_404(DutyStatus, id=duty_status_id)
     duty_status.delete()
     return {"success": True}
+
+
+# Duty status event streams
+# A stream ends after `timeout` seconds and the browser reconnects, so a
+# worker shutting down is not held open indefinitely
+STREAM_SECONDS = 300
+MAX_STREAM_SECONDS = 3600
+
+
+def event_stream(request, channel, timeout):
+    """A Server-Sent Events response with the events on `channel`"""
+    if not 0 <= timeout <= MAX_STREAM_SECONDS:
+        raise HttpError(400, f"timeout must be 0 to {MAX_STREAM_SECONDS} seconds")
+    # Under ASGI an open stream waits on the event loop rather than a thread
+    if isinstance(request, ASGIRequest):
+        content = astream_events(channel, timeout)
+    else:
+        content = stream_events(channel, timeout)
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Tell nginx-style proxies not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# The streams don't look their log or driver up: a request's database
+# connection would stay open for as long as it listens
+@api.get("/daily-logs/{daily_log_id}/duty-statuses/events")
+async def daily_log_duty_status_events(
+    request, daily_log_id: int, timeout: float = STREAM_SECONDS
+):
+    """Stream a daily log's duty status changes as Server-Sent Events"""
+    return event_stream(request, log_channel(daily_log_id), timeout)
+
+
+@api.get("/drivers/{driver_id}/duty-statuses/events")
+async def driver_duty_status_events(
+    request, driver_id: int, timeout: float = STREAM_SECONDS
+):
+    """Stream a driver's duty status changes as Server-Sent Events"""
+    return event_stream(request, driver_channel(driver_id), timeout)
+
+
+@api.get("/fleet/duty-statuses/events")
+async def fleet_duty_status_events(request, timeout: float = STREAM_SECONDS):
+    """Stream every duty status change as Server-Sent Events"""
+    return event_stream(request, FLEET, timeout)
+
+
+@api.get("/drivers/{driver_id}/hos", response=HosReportSchema)
+def get_driver_hos(
+    request,
+    driver_id: int,
+    report_from: datetime | None = None,
+    as_of: datetime | None = None,
+):
+    """Get HOS violations and remaining clocks (in hours) for a driver"""
+    driver = get_object_or_404(Driver, id=driver_id)
+    return evaluate_driver(driver.id, report_from=report_from, as_of=as_of)
+
+
+@api.get("/drivers/{driver_id}/daily-logs/print")
+def print_driver_daily_logs(
+    request,
+    driver_id: int,
+    format: Literal["pdf", "svg"] = "pdf",
+    tz: str | None = None,
+):
+    """Render a driver's daily logs for the last 8 days into one document"""
+    driver = get_object_or_404(Driver, id=driver_id)
+    try:
+        zone = get_zone(tz)
+    except ValueError as error:
+        raise HttpError(400, str(error))
+    sheets = driver_sheets(driver.id, zone)
+    if not sheets:
+        raise HttpError(404, "No daily logs in the last 8 days")
+    return printable_response(request, sheets, format, f"driver-{driver_id}-logs")
+
+
+@api.get("/fleet/hos-summary", response=List[DriverHosSummarySchema])
+def get_fleet_hos_summary(request, driver_ids: List[int] = Query(None)):
+    """Get cycle usage, today's totals and last known status for every driver"""
+    return fleet_hos_summary(driver_ids=driver_ids or None)
+
+
+@api.get("/exports/duty-statuses")
+def export_duty_statuses(
+    request,
+    driver_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    format: Literal["csv", "ndjson"] = "csv",
+):
+    """Stream duty statuses as CSV or NDJSON, optionally for a driver and days"""
+    if start and end and start > end:
+        raise HttpError(400, "start must not be after end")
+    statuses = export_queryset(driver_id=driver_id, start=start, end=end)
+    # An iterator the server can consume without buffering the whole export
+    if isinstance(request, ASGIRequest):
+        content = astream_export(statuses, format)
+    else:
+        content = stream_export(statuses, format)
+    response = StreamingHttpResponse(content, content_type=FORMATS[format][0])
+    filename = "-".join(
+        ["duty-statuses"]
+        + [str(value) for value in (driver_id, start, end) if value is not None]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{format}"'
+    return response
+
+
+MAX_NEARBY_RESULTS = 1000
+MAX_SEARCH_KM = 2000
+MAX_ROUTE_POINTS = 1000
+
+
+def check_point(latitude, longitude):
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HttpError(400, f"Invalid position {latitude}, {longitude}")
+
+
+def check_search(distance_km, limit):
+    if not 0 < distance_km <= MAX_SEARCH_KM:
+        raise HttpError(400, f"Distance must be between 0 and {MAX_SEARCH_KM} km")
+    if not 0 < limit <= MAX_NEARBY_RESULTS:
+        raise HttpError(400, f"limit must be between 1 and {MAX_NEARBY_RESULTS}")
+
+
+@api.get("/drivers/nearby", response=List[NearbyDriverSchema])
+def get_nearby_drivers(
+    request,
+    lat: float,
+    lon: float,
+    radius_km: float | None = None,
+    limit: int = 10,
+    max_age_hours: float | None = None,
+):
+    """Get the drivers last seen nearest a point, or all within radius_km of it"""
+    check_point(lat, lon)
+    if radius_km is None:
+        check_search(1, limit)
+        return nearest_drivers(lat, lon, limit, max_age_hours=max_age_hours)
+    check_search(radius_km, limit)
+    return drivers_within(lat, lon, radius_km, limit, max_age_hours=max_age_hours)
+
+
+@api.post("/drivers/corridor", response=List[NearbyDriverSchema])
+def get_corridor_drivers(request, payload: CorridorInput):
+    """Get the drivers last seen within width_km of a route, in order along it"""
+    if not 0 < len(payload.route) <= MAX_ROUTE_POINTS:
+        raise HttpError(400, f"A route has 1 to {MAX_ROUTE_POINTS} points")
+    for latitude, longitude in payload.route:
+        check_point(latitude, longitude)
+    check_search(payload.width_km, payload.limit)
+    return drivers_along(
+        payload.route,
+        payload.width_km,
+        payload.limit,
+        max_age_hours=payload.max_age_hours,
+    )
+
+
+MAX_ROUTE_WAYPOINTS = 25
+
+
+def parse_waypoints(waypoints):
+    """'lat,lon;lat,lon;...' as a list of (latitude, longitude)"""
+    try:
+        points = [
+            tuple(float(value) for value in point.split(","))
+            for point in waypoints.split(";")
+        ]
+    except ValueError:
+        points = []
+    if not 2 <= len(points) <= MAX_ROUTE_WAYPOINTS or any(
+        len(point) != 2 for point in points
+    ):
+        raise HttpError(
+            400,
+            f"waypoints must be 2 to {MAX_ROUTE_WAYPOINTS} 'lat,lon' pairs "
+            "separated by ';'",
+        )
+    for latitude, longitude in points:
+        check_point(latitude, longitude)
+    return points
+
+
+@api.get("/routes", response=RouteSchema)
+def get_road_route(request, waypoints: str):
+    """Get the road route through 'lat,lon;lat,lon;...' as an encoded polyline"""
+    try:
+        return get_route(parse_waypoints(waypoints))
+    except RouteUnavailable as error:
+        raise HttpError(503, f"No route: {error}")
+
+
+@api.get("/metrics", include_in_schema=False)
+def metrics(request):
+    """Per-route request metrics of this process, for Prometheus"""
+    streams = (
+        f"# HELP {PREFIX}event_subscribers Open duty status event streams\n"
+        f"# TYPE {PREFIX}event_subscribers gauge\n"
+        f"{PREFIX}event_subscribers {get_hub().subscriber_count()}\n"
+    )
+    return HttpResponse(registry.render() + streams, content_type=CONTENT_TYPE)
+
+
+# After every endpoint is defined
+instrument_views(api.default_router)
@@ -0,0 +1,295 @@
+"""
+Archival of old daily logs out of the live tables.
+
+Completed daily logs created before a cutoff move, with their duty statuses,
+to ArchivedDailyLog: the log's own columns, and its statuses as one
+zlib-compressed JSON document of a list per column. Each run records an
+ArchiveSegment per calendar month it archived, the manifest of what moved
+and how much it takes. Logs move in batches, each in its own transaction,
+so an interrupted run loses nothing and the next one carries on.
+
+Reads go through: archived_daily_log and archived_duty_statuses build
+unsaved DailyLog and DutyStatus instances, which serialize like live ones.
+restore_daily_logs moves logs back with the same ids.
+
+Archiving only moves rows, bypassing the signal handlers: per-day totals
+stay as they are (rebuild_all_totals reads archived statuses too), and logs
+older than the HOS cycle never feed positions or cycle snapshots.
+"""
+
+import json
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import DAILY_LOGS, bump_collection_version, bump_log_version
+from .cycle import CYCLE_DAYS
+from .models import ArchivedDailyLog, ArchiveSegment, DailyLog, DutyStatus
+from .totals import local_day
+
+ARCHIVED_LOG_STATUSES = ("completed",)
+# Logs the HOS clocks still read are never archived
+MIN_AGE = timedelta(days=CYCLE_DAYS + 1)
+BATCH_SIZE = 500
+COMPRESSION_LEVEL = 9
+
+LOG_COLUMNS = [
+    "id",
+    "driver_id",
+    "co_driver_id",
+    "truck_id",
+    "trailer_id",
+    "status",
+    "miles",
+    "created_at",
+    "updated_at",
+]
+STATUS_COLUMNS = [
+    "id",
+    "duty_status",
+    "location_address",
+    "latitude",
+    "longitude",
+    "timestamp",
+    "notes",
+    "idempotency_key",
+    "created_at",
+]
+STATUS_FIELDS = {name: DutyStatus._meta.get_field(name) for name in STATUS_COLUMNS}
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (str, int)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    # Decimal coordinates keep their exact digits
+    return str(value)
+
+
+def encode_statuses(rows):
+    """
+    (raw size, compressed bytes) for rows of STATUS_COLUMNS values; a list
+    per column compresses far better than a document per status
+    """
+    columns = {
+        name: [_json_value(row[index]) for row in rows]
+        for index, name in enumerate(STATUS_COLUMNS)
+    }
+    raw = json.dumps(columns, separators=(",", ":")).encode()
+    return len(raw), zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def decode_columns(data, names=STATUS_COLUMNS):
+    """The archived statuses as a list of values per column in `names`"""
+    columns = json.loads(zlib.decompress(bytes(data)))
+    return [
+        [STATUS_FIELDS[name].to_python(value) for value in columns[name]]
+        for name in names
+    ]
+
+
+def decode_statuses(daily_log_id, data):
+    """Archived statuses as unsaved DutyStatus instances, in time order"""
+    return [
+        DutyStatus(daily_log_id=daily_log_id, **dict(zip(STATUS_COLUMNS, values)))
+        for values in zip(*decode_columns(data))
+    ]
+
+
+def archivable(before):
+    """Live daily logs an archive run with this cutoff would move"""
+    return DailyLog.objects.filter(
+        status__in=ARCHIVED_LOG_STATUSES, created_at__lt=before
+    )
+
+
+def _invalidate(daily_log_ids):
+    for daily_log_id in daily_log_ids:
+        bump_log_version(daily_log_id)
+    bump_collection_version(DAILY_LOGS)
+
+
+def archive_daily_logs(before, batch_size=BATCH_SIZE, progress=None):
+    """
+    Move completed daily logs created before `before`, and their statuses,
+    to the archive; returns the logs, statuses and bytes moved
+    """
+    if before > timezone.now() - MIN_AGE:
+        raise ValueError(f"Only logs older than {MIN_AGE.days} days can be archived")
+
+    moved = dict.fromkeys(["logs", "duty_statuses", "raw_bytes", "stored_bytes"], 0)
+    segments = {}
+    while True:
+        with transaction.atomic():
+            logs = list(
+                archivable(before)
+                .select_for_update()
+                .order_by("id")
+                .values_list(*LOG_COLUMNS)[:batch_size]
+            )
+            if not logs:
+                break
+            daily_log_ids = [log[0] for log in logs]
+            statuses = {daily_log_id: [] for daily_log_id in daily_log_ids}
+            for row in (
+                DutyStatus.objects.filter(daily_log_id__in=daily_log_ids)
+                .order_by("timestamp", "id")
+                .values_list("daily_log_id", *STATUS_COLUMNS)
+            ):
+                statuses[row[0]].append(row[1:])
+
+            records = []
+            counts = defaultdict(lambda: defaultdict(int))
+            for log in logs:
+                values = dict(zip(LOG_COLUMNS, log))
+                month = local_day(values["created_at"]).replace(day=1)
+                if month not in segments:
+                    segments[month] = ArchiveSegment.objects.create(month=month)
+                rows = statuses[values["id"]]
+                raw_bytes, data = encode_statuses(rows)
+                records.append(
+                    ArchivedDailyLog(
+                        segment=segments[month],
+                        duty_status_count=len(rows),
+                        duty_statuses=data,
+                        **values,
+                    )
+                )
+                for name, count in [
+                    ("logs", 1),
+                    ("duty_statuses", len(rows)),
+                    ("raw_bytes", raw_bytes),
+                    ("stored_bytes", len(data)),
+                ]:
+                    counts[month][name] += count
+                    moved[name] += count
+
+            ArchivedDailyLog.objects.bulk_create(records)
+            for month, month_counts in counts.items():
+                ArchiveSegment.objects.filter(id=segments[month].id).update(
+                    **{name: F(name) + count for name, count in month_counts.items()}
+                )
+            # Raw deletes skip the signal handlers: nothing derived changes
+            DutyStatus.objects.filter(daily_log_id__in=daily_log_ids)._raw_delete(
+                DutyStatus.objects.db
+            )
+            DailyLog.objects.filter(id__in=daily_log_ids)._raw_delete(
+                DailyLog.objects.db
+            )
+        _invalidate(daily_log_ids)
+        if progress:
+            progress(moved)
+    return moved
+
+
+def restore_daily_logs(archived, batch_size=BATCH_SIZE, progress=None):
+    """
+    Move the ArchivedDailyLog rows of the queryset `archived` back to the
+    live tables, with their ids; returns the logs and statuses restored
+    """
+    restored = {"logs": 0, "duty_statuses": 0}
+    while True:
+        with transaction.atomic():
+            records = list(archived.select_for_update().order_by("id")[:batch_size])
+            if not records:
+                break
+            logs = [
+                DailyLog(**{name: getattr(record, name) for name in LOG_COLUMNS})
+                for record in records
+            ]
+            statuses = [
+                status
+                for record in records
+                for status in decode_statuses(record.id, record.duty_statuses)
+            ]
+            # bulk_create stamps auto_now(_add) fields; put the originals back
+            log_times = [(log.created_at, log.updated_at) for log in logs]
+            status_times = [status.created_at for status in statuses]
+            DailyLog.objects.bulk_create(logs)
+            DutyStatus.objects.bulk_create(statuses, batch_size=1000)
+            for log, (created_at, updated_at) in zip(logs, log_times):
+                log.created_at, log.updated_at = created_at, updated_at
+            for status, created_at in zip(statuses, status_times):
+                status.created_at = created_at
+            DailyLog.objects.bulk_update(logs, ["created_at", "updated_at"])
+            DutyStatus.objects.bulk_update(statuses, ["created_at"], batch_size=1000)
+
+            counts = defaultdict(lambda: defaultdict(int))
+            for record in records:
+                counts[record.segment_id]["logs"] += 1
+                counts[record.segment_id]["duty_statuses"] += record.duty_status_count
+                counts[record.segment_id]["raw_bytes"] += len(
+                    zlib.decompress(record.duty_statuses)
+                )
+                counts[record.segment_id]["stored_bytes"] += len(record.duty_statuses)
+            ArchivedDailyLog.objects.filter(id__in=[log.id for log in logs]).delete()
+            for segment_id, segment_counts in counts.items():
+                ArchiveSegment.objects.filter(id=segment_id).update(
+                    **{name: F(name) - count for name, count in segment_counts.items()}
+                )
+            ArchiveSegment.objects.filter(id__in=counts, logs=0).delete()
+        _invalidate([log.id for log in logs])
+        restored["logs"] += len(logs)
+        restored["duty_statuses"] += len(statuses)
+        if progress:
+            progress(restored)
+    return restored
+
+
+def archived_daily_log(daily_log_id):
+    """An archived daily log as an unsaved DailyLog with its relations, or None"""
+    record = (
+        ArchivedDailyLog.objects.select_related(
+            "driver__user", "co_driver__user", "truck", "trailer"
+        )
+        .defer("duty_statuses")
+        .filter(id=daily_log_id)
+        .first()
+    )
+    if record is None:
+        return None
+    return DailyLog(
+        driver=record.driver,
+        co_driver=record.co_driver,
+        truck=record.truck,
+        trailer=record.trailer,
+        **{
+            name: getattr(record, name)
+            for name in ["id", "status", "miles", "created_at", "updated_at"]
+        },
+    )
+
+
+def archived_duty_statuses(daily_log_id):
+    """The statuses of an archived daily log in time order, or None"""
+    data = (
+        ArchivedDailyLog.objects.filter(id=daily_log_id)
+        .values_list("duty_statuses", flat=True)
+        .first()
+    )
+    return None if data is None else decode_statuses(daily_log_id, data)
+
+
+def archived_events(fields, driver_ids=None):
+    """
+    (driver_id, *fields) for every archived status, by driver and then in
+    time order, as DutyStatus.objects.values_list would give them
+    """
+    records = ArchivedDailyLog.objects.order_by("driver_id", "id")
+    if driver_ids is not None:
+        records = records.filter(driver_id__in=driver_ids)
+    names = ["timestamp", "id", *fields]
+    rows = records.values_list("driver_id", "duty_statuses").iterator(chunk_size=500)
+    for driver_id, driver_records in groupby(rows, key=lambda row: row[0]):
+        events = []
+        for _, data in driver_records:
+            events.extend(zip(*decode_columns(data, names)))
+        events.sort(key=lambda event: event[:2])
+        for event in events:
+            yield (driver_id, *event[2:])
@@ -0,0 +1,440 @@
+"""
+API benchmark cases and measurements.
+
+Every endpoint of trips.api, and reading and recomputing a driver's cycle
+total, is a case, run in process through Django's test client, with a
+bearer token, against whatever database is configured, normally one seeded
+by trips.simulator (see the `benchmark` management command); the "Auth:"
+cases compare authenticating by session and by token. For each case this
+records latency percentiles with the cache cleared before every request,
+and, for reads, with it warm; the queries one request runs; the peak memory
+Python allocates for it; and the size of read responses. Writes run in a
+transaction that is rolled back, so every iteration sees the same data.
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .cycle import refresh_cycle_snapshot
+from .models import DailyLog, Driver, DutyStatus
+from .tokens import issue_token, verify_token
+from .totals import local_day
+
+BENCHMARK_USERNAME = "benchmark"
+BENCHMARK_PASSWORD = "benchmark-password"
+BATCH_EVENTS = 100
+TRANSACTION_STATEMENTS = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+def percentile(sorted_values, fraction):
+    """The value `fraction` of the way through already sorted values"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+def _status_body(daily_log_id=None, **extra):
+    body = {
+        "duty_status": "on_duty",
+        "location_address": "Benchmark, TX",
+        "latitude": 32.7767,
+        "longitude": -96.797,
+        "timestamp": timezone.now().isoformat(),
+        "notes": "Benchmark",
+        **extra,
+    }
+    if daily_log_id is not None:
+        body["daily_log_id"] = daily_log_id
+    return body
+
+
+def benchmark_cases(sample):
+    """
+    (name, method, path, body) for every endpoint, keyed like the OpenAPI
+    schema ("GET /api/daily-logs/{daily_log_id}"), filled in from `sample`
+    """
+    log, status, driver = sample["log"], sample["status"], sample["driver"]
+    today = local_day(timezone.now())
+    return [
+        ("GET /api/", "GET", "/api/", None),
+        (
+            "POST /api/login",
+            "POST",
+            "/api/login",
+            {"username": BENCHMARK_USERNAME, "password": BENCHMARK_PASSWORD},
+        ),
+        ("POST /api/logout", "POST", "/api/logout", None),
+        ("GET /api/me", "GET", "/api/me", None),
+        ("GET /api/daily-logs", "GET", "/api/daily-logs?limit=20", None),
+        (
+            "POST /api/daily-logs",
+            "POST",
+            "/api/daily-logs",
+            {
+                "driver_id": driver,
+                "truck_id": sample["truck"],
+                "trailer_id": sample["trailer"],
+            },
+        ),
+        (
+            "GET /api/daily-logs/{daily_log_id}",
+            "GET",
+            f"/api/daily-logs/{log}",
+            None,
+        ),
+        (
+            "PUT /api/daily-logs/{daily_log_id}",
+            "PUT",
+            f"/api/daily-logs/{log}",
+            sample["log_body"],
+        ),
+        (
+            "DELETE /api/daily-logs/{daily_log_id}",
+            "DELETE",
+            f"/api/daily-logs/{log}",
+            None,
+        ),
+        (
+            "GET /api/daily-logs/{daily_log_id}/grid",
+            "GET",
+            f"/api/daily-logs/{log}/grid",
+            None,
+        ),
+        (
+            "GET /api/daily-logs/{daily_log_id}/print",
+            "GET",
+            f"/api/daily-logs/{log}/print",
+            None,
+        ),
+        (
+            "GET /api/daily-logs/{daily_log_id}/duty-statuses",
+            "GET",
+            f"/api/daily-logs/{log}/duty-statuses",
+            None,
+        ),
+        (
+            "POST /api/daily-logs/{daily_log_id}/duty-statuses",
+            "POST",
+            f"/api/daily-logs/{log}/duty-statuses",
+            _status_body(),
+        ),
+        (
+            "POST /api/duty-statuses/batch",
+            "POST",
+            "/api/duty-statuses/batch",
+            [
+                _status_body(
+                    log,
+                    timestamp=(timezone.now() + timedelta(minutes=index)).isoformat(),
+                )
+                for index in range(BATCH_EVENTS)
+            ],
+        ),
+        (
+            "GET /api/duty-statuses/{duty_status_id}",
+            "GET",
+            f"/api/duty-statuses/{status}",
+            None,
+        ),
+        (
+            "GET /api/duty-statuses/receipts/{receipt}",
+            "GET",
+            f"/api/duty-statuses/receipts/{sample['receipt']}",
+            None,
+        ),
+        (
+            "PUT /api/duty-statuses/{duty_status_id}",
+            "PUT",
+            f"/api/duty-statuses/{status}",
+            sample["status_body"],
+        ),
+        (
+            "DELETE /api/duty-statuses/{duty_status_id}",
+            "DELETE",
+            f"/api/duty-statuses/{status}",
+            None,
+        ),
+        # Streams end at once with timeout=0: this times opening one
+        (
+            "GET /api/daily-logs/{daily_log_id}/duty-statuses/events",
+            "GET",
+            f"/api/daily-logs/{log}/duty-statuses/events?timeout=0",
+            None,
+        ),
+        (
+            "GET /api/drivers/{driver_id}/duty-statuses/events",
+            "GET",
+            f"/api/drivers/{driver}/duty-statuses/events?timeout=0",
+            None,
+        ),
+        (
+            "GET /api/fleet/duty-statuses/events",
+            "GET",
+            "/api/fleet/duty-statuses/events?timeout=0",
+            None,
+        ),
+        (
+            "GET /api/drivers/{driver_id}/hos",
+            "GET",
+            f"/api/drivers/{driver}/hos",
+            None,
+        ),
+        (
+            "GET /api/drivers/{driver_id}/daily-logs/print",
+            "GET",
+            f"/api/drivers/{driver}/daily-logs/print",
+            None,
+        ),
+        (
+            "GET /api/drivers/nearby",
+            "GET",
+            "/api/drivers/nearby?lat=32.7767&lon=-96.797&limit=20",
+            None,
+        ),
+        (
+            "POST /api/drivers/corridor",
+            "POST",
+            "/api/drivers/corridor",
+            # Dallas to Atlanta along I-20
+            {
+                "route": [
+                    [32.7767, -96.797],
+                    [32.5252, -93.7502],
+                    [32.2988, -90.1848],
+                    [33.5186, -86.8104],
+                    [33.749, -84.388],
+                ],
+                "width_km": 25,
+            },
+        ),
+        (
+            "GET /api/routes",
+            "GET",
+            "/api/routes?waypoints=32.7767,-96.797;33.749,-84.388",
+            None,
+        ),
+        ("GET /api/fleet/hos-summary", "GET", "/api/fleet/hos-summary", None),
+        (
+            "GET /api/exports/duty-statuses",
+            "GET",
+            f"/api/exports/duty-statuses?driver_id={driver}"
+            f"&start={today - timedelta(days=7)}&end={today}",
+            None,
+        ),
+    ]
+
+
+def sample_records(client):
+    """Ids and request bodies for the cases: a mid-history log and its driver"""
+    User.objects.filter(username=BENCHMARK_USERNAME).exists() or (
+        User.objects.create_user(BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+    )
+    driver = Driver.objects.order_by("id").first()
+    logs = DailyLog.objects.filter(driver=driver).order_by("-created_at", "-id")
+    log = logs[min(3, logs.count() - 1)]
+    status = log.duty_statuses.order_by("timestamp", "id").first()
+    if not status.idempotency_key:
+        # Something for the receipt case to look up
+        DutyStatus.objects.filter(id=status.id).update(
+            idempotency_key=f"benchmark-{status.id}"
+        )
+    status_body = client.get(f"/api/duty-statuses/{status.id}").json()
+    return {
+        "driver": driver.id,
+        "truck": log.truck_id,
+        "trailer": log.trailer_id,
+        "log": log.id,
+        "status": status.id,
+        "receipt": status_body["idempotency_key"],
+        "log_body": client.get(f"/api/daily-logs/{log.id}").json(),
+        "status_body": {**status_body, "daily_log_id": status_body["daily_log"]},
+    }
+
+
+def _request(client, method, path, body):
+    kwargs = {}
+    if body is not None:
+        kwargs = {"data": json.dumps(body), "content_type": "application/json"}
+    response = getattr(client, method.lower())(path, **kwargs)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {path} returned {response.status_code}")
+    return response
+
+
+def _query_count(queries):
+    # Leave out the transaction a write case is rolled back in
+    return sum(not query["sql"].startswith(TRANSACTION_STATEMENTS) for query in queries)
+
+
+def _summary(seconds):
+    seconds = sorted(seconds)
+    return {
+        "mean": round(statistics.fmean(seconds) * 1000, 3),
+        "p50": round(percentile(seconds, 0.50) * 1000, 3),
+        "p95": round(percentile(seconds, 0.95) * 1000, 3),
+        "p99": round(percentile(seconds, 0.99) * 1000, 3),
+    }
+
+
+def _timed(run, iterations, before=None):
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def measure(run, iterations, warmup=2, cacheable=False, writes=False):
+    """Latency, query count and peak memory for `run`, a no-argument callable"""
+
+    def once():
+        if not writes:
+            return run()
+        with transaction.atomic():
+            run()
+            transaction.set_rollback(True)
+
+    for _ in range(warmup):
+        once()
+
+    result = {"latency_ms": _summary(_timed(once, iterations, cache.clear))}
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        once()
+    result["queries"] = _query_count(queries)
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        once()
+        result["peak_memory_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+    if cacheable:
+        once()
+        result["cached_latency_ms"] = _summary(_timed(once, iterations))
+        with CaptureQueriesContext(connection) as queries:
+            once()
+        result["cached_queries"] = _query_count(queries)
+    return result
+
+
+def run_benchmarks(iterations=20, only=None):
+    """Measure every case against the configured database"""
+    # A failing endpoint is recorded as an error rather than ending the run
+    client = Client(raise_request_exception=False)
+    sample = sample_records(client)
+    # Requests are authenticated the way the frontend makes them
+    user = User.objects.get(username=BENCHMARK_USERNAME)
+    token, _ = issue_token(user)
+    client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    results = {}
+    for name, method, path, body in benchmark_cases(sample):
+        if only and not any(part in name for part in only):
+            continue
+        try:
+            results[name] = measure(
+                lambda: _request(client, method, path, body),
+                iterations,
+                cacheable=method == "GET",
+                writes=method != "GET",
+            )
+        except RuntimeError as error:
+            results[name] = {"error": str(error)}
+            continue
+        if method == "GET":
+            response = _request(client, method, path, body)
+            if not response.streaming:
+                results[name]["response_bytes"] = len(response.content)
+
+    # Reading a driver's stored cycle total, and recomputing it
+    driver = Driver.objects.get(id=sample["driver"])
+    for name, run in [
+        ("Driver.get_current_cycle_hours", driver.get_current_cycle_hours),
+        ("cycle.refresh_cycle_snapshot", lambda: refresh_cycle_snapshot(driver.id)),
+    ]:
+        if not only or any(part in name for part in only):
+            results[name] = measure(run, iterations, writes=True)
+
+    # What authenticating a request costs: a session cookie, and a bearer
+    # token already verified or new to the process
+    session_client = Client(raise_request_exception=False)
+    session_client.force_login(user)
+
+    def uncached_token():
+        verify_token.cache_clear()
+        return _request(client, "GET", "/api/me", None)
+
+    for name, run in [
+        ("Auth: session", lambda: _request(session_client, "GET", "/api/me", None)),
+        ("Auth: bearer token", lambda: _request(client, "GET", "/api/me", None)),
+        ("Auth: bearer token (not cached)", uncached_token),
+    ]:
+        if not only or any(part in name for part in only):
+            results[name] = measure(run, iterations)
+    return results
+
+
+def run_http_benchmarks(url, iterations=20, only=None):
+    """Latency of the read cases against a running server, over keep-alive"""
+    target = urlsplit(url)
+    http = HTTPConnection(target.hostname, target.port, timeout=60)
+
+    def get(path):
+        http.request("GET", path)
+        response = http.getresponse()
+        content = response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"GET {path} returned {response.status}")
+        return content
+
+    log = json.loads(get("/api/daily-logs?limit=5"))["items"][-1]
+    statuses = json.loads(get(f"/api/daily-logs/{log['id']}/duty-statuses"))
+    sample = {
+        "driver": log["driver_id"],
+        "truck": log["truck_id"],
+        "trailer": log["trailer_id"],
+        "log": log["id"],
+        "status": statuses[0]["id"],
+        "receipt": statuses[0]["idempotency_key"],
+        "log_body": None,
+        "status_body": None,
+    }
+    results = {}
+    try:
+        for name, method, path, _ in benchmark_cases(sample):
+            if method != "GET" or (only and not any(part in name for part in only)):
+                continue
+            try:
+                for _ in range(2):
+                    get(path)
+            except RuntimeError as error:
+                results[name] = {"error": str(error)}
+                continue
+            results[name] = {
+                "latency_ms": _summary(_timed(lambda: get(path), iterations))
+            }
+    finally:
+        http.close()
+    return results
@@ -0,0 +1,188 @@
+"""
+Per-daily-log cache versioning and cached API responses.
+
+Derived payloads for a daily log are cached under keys that embed the log's
+current version. Any write to the log or its duty statuses bumps the version,
+so stale entries are simply never read again and expire on their own.
+Collections (every daily log, the drivers and equipment they embed) carry
+their own versions the same way.
+
+Cached responses are stored rendered, with a strong ETag over the body, so a
+hit, and a 304 for a client that already has it, costs only cache lookups.
+The cache backend is the `default` alias in settings.CACHES.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.http import parse_etags, quote_etag
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Collection versions
+DAILY_LOGS = "daily-logs"
+FLEET_RECORDS = "fleet-records"
+
+
+def _version_key(daily_log_id):
+    return f"daily-log:{daily_log_id}:version"
+
+
+def _version(key):
+    # Seed with a clock value so a version lost to eviction never repeats
+    return cache.get_or_set(key, time.time_ns(), None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def log_version(daily_log_id):
+    """Current cache version for a daily log"""
+    return _version(_version_key(daily_log_id))
+
+
+def bump_log_version(daily_log_id):
+    """Invalidate everything cached for a daily log"""
+    _bump(_version_key(daily_log_id))
+
+
+def collection_version(name):
+    """Current cache version for a collection such as DAILY_LOGS"""
+    return _version(f"collection:{name}:version")
+
+
+def bump_collection_version(name):
+    """Invalidate everything cached for a collection"""
+    _bump(f"collection:{name}:version")
+
+
+def log_cache_key(daily_log_id, name, *parts):
+    """Versioned cache key for a payload derived from a daily log"""
+    suffix = ":".join(str(part) for part in parts)
+    return f"daily-log:{daily_log_id}:{log_version(daily_log_id)}:{name}:{suffix}"
+
+
+def etag_for(content):
+    return quote_etag(hashlib.blake2b(content, digest_size=16).hexdigest())
+
+
+def not_modified(request, etag):
+    """Whether the request's If-None-Match already matches `etag`"""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    etags = [tag.removeprefix("W/") for tag in parse_etags(if_none_match)]
+    return "*" in etags or etag in etags
+
+
+def _cached(response, etag):
+    response["ETag"] = etag
+    # Clients may keep the body but must revalidate it on every use
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_response(request, content, content_type):
+    """A response for `content` with an ETag, or a 304 if the client has it"""
+    etag = etag_for(content)
+    if not_modified(request, etag):
+        return _cached(HttpResponseNotModified(), etag)
+    return _cached(HttpResponse(content, content_type=content_type), etag)
+
+
+def _cached_response(request, versions, kwargs):
+    """The cached response for a request, or None after noting where to store it"""
+    parts = ":".join(str(version) for version in versions(request, **kwargs))
+    key = f"response:{parts}:{request.get_full_path()}"
+    entry = cache.get(key)
+    if entry is None:
+        request._response_cache_key = key
+        return None
+
+    etag, content, content_type = entry
+    if not_modified(request, etag):
+        return _cached(HttpResponseNotModified(), etag)
+    return _cached(HttpResponse(content, content_type=content_type), etag)
+
+
+def cached_response(versions):
+    """
+    Cache a GET endpoint's rendered response.
+
+    `versions(request, **kwargs)` returns the cache versions the response
+    depends on; together with the request's full path they make the key.
+    On a miss the view runs as usual and response_cache_middleware stores
+    what it rendered. Works for sync and async views.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_view(request, **kwargs):
+                response = await sync_to_async(_cached_response)(
+                    request, versions, kwargs
+                )
+                if response is None:
+                    return await view_func(request, **kwargs)
+                return response
+
+            return async_view
+
+        @wraps(view_func)
+        def view(request, **kwargs):
+            response = _cached_response(request, versions, kwargs)
+            if response is None:
+                return view_func(request, **kwargs)
+            return response
+
+        return view
+
+    return decorator
+
+
+def _store_response(request, response):
+    """Entry to cache for a @cached_response miss, and the response to send"""
+    key = getattr(request, "_response_cache_key", None)
+    if key is None or response.status_code != 200 or response.streaming:
+        return None, response
+
+    etag = etag_for(response.content)
+    entry = (etag, response.content, response["Content-Type"])
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    return (key, entry), _cached(response, etag)
+
+
+@sync_and_async_middleware
+def response_cache_middleware(get_response):
+    """Store responses rendered by @cached_response views after a miss"""
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            store, response = _store_response(request, await get_response(request))
+            if store:
+                await cache.aset(*store, RESPONSE_CACHE_TIMEOUT)
+            return response
+
+        return async_middleware
+
+    def middleware(request):
+        store, response = _store_response(request, get_response(request))
+        if store:
+            cache.set(*store, RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    return middleware
@@ -0,0 +1,101 @@
+"""
+70-hour / 8-day cycle calculations.
+
+The cycle covers today and the previous seven calendar days in the home
+terminal's timezone. On-duty and driving time is read from the per-day
+totals (trips.totals), so a driver costs at most eight small rows, and the
+whole fleet is served by the same single query. The driver's current status
+is still open in those totals, and its time up to now is added here.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import DailyDutyTotal, Driver, DutyStatus
+from .totals import day_start, local_day
+
+CYCLE_LIMIT_HOURS = 70
+CYCLE_DAYS = 8
+ON_DUTY_STATUSES = ("driving", "on_duty")
+
+# How long a stored cycle snapshot is trusted. Writes refresh it through the
+# signal handlers; days leaving the 8-day window are only noticed when the
+# refresh_cycle_snapshots command (run every few minutes) or the fleet
+# summary refreshes snapshots older than this, so until then a snapshot
+# over-reports used hours (the safe direction).
+SNAPSHOT_MAX_AGE = timedelta(minutes=15)
+
+
+def cycle_start(now):
+    """Midnight at the start of the 8-day cycle ending today"""
+    return day_start(local_day(now) - timedelta(days=CYCLE_DAYS - 1))
+
+
+def cycle_seconds_by_driver(driver_ids=None, now=None):
+    """On-duty seconds per driver id for the current cycle, in one query"""
+    now = now or timezone.now()
+    window_start = cycle_start(now)
+    totals = DailyDutyTotal.objects.filter(
+        day__gte=local_day(window_start), day__lte=local_day(now)
+    )
+    if driver_ids is not None:
+        totals = totals.filter(driver_id__in=driver_ids)
+
+    seconds, open_status = {}, {}
+    for row in totals.order_by("driver_id", "day").values(
+        "driver_id",
+        "driving_minutes",
+        "on_duty_minutes",
+        "last_status",
+        "last_status_at",
+    ):
+        minutes = row["driving_minutes"] + row["on_duty_minutes"]
+        seconds[row["driver_id"]] = seconds.get(row["driver_id"], 0) + minutes * 60
+        open_status[row["driver_id"]] = (row["last_status"], row["last_status_at"])
+
+    for driver_id, (status, started_at) in open_status.items():
+        started_at = max(started_at, window_start)
+        if status in ON_DUTY_STATUSES and now > started_at:
+            seconds[driver_id] += (now - started_at).total_seconds()
+    return {driver_id: int(round(total)) for driver_id, total in seconds.items()}
+
+
+def cycle_seconds_for_driver(driver_id, now=None):
+    """On-duty seconds for one driver in the current cycle"""
+    return cycle_seconds_by_driver([driver_id], now=now).get(driver_id, 0)
+
+
+def refresh_cycle_snapshot(driver_id, now=None):
+    """Recompute and store the running cycle total for a driver"""
+    now = now or timezone.now()
+    last_status = (
+        DutyStatus.objects.filter(daily_log__driver_id=driver_id, timestamp__lte=now)
+        .order_by("-timestamp", "-id")
+        .values_list("duty_status", flat=True)
+        .first()
+    )
+    snapshot = {
+        "cycle_seconds": cycle_seconds_for_driver(driver_id, now=now),
+        "cycle_status": last_status or "",
+        "cycle_computed_at": now,
+    }
+    Driver.objects.filter(id=driver_id).update(**snapshot)
+    return snapshot
+
+
+def current_cycle_seconds(driver, now=None):
+    """
+    Read the stored running cycle total, accruing time for an open on-duty
+    status; never queries
+    """
+    now = now or timezone.now()
+    seconds = driver.cycle_seconds
+    computed_at = driver.cycle_computed_at
+    if (
+        computed_at is not None
+        and driver.cycle_status in ON_DUTY_STATUSES
+        and now > computed_at
+    ):
+        seconds += int((now - computed_at).total_seconds())
+    return seconds
@@ -0,0 +1,271 @@
+"""
+Duty-status changes pushed to clients as Server-Sent Events.
+
+Every committed create, update or delete of a duty status is published on
+the channels of its daily log, its driver and the fleet. A stream subscribes
+to one channel on the hub named by settings.EVENT_HUB:
+
+- LocalHub fans events out within the process. Publishing only hands the
+  encoded event to each subscriber's queue (for an async stream, on its own
+  event loop), so writers never wait for readers. It reaches the streams of
+  the process the write happened in, which suits a single worker.
+- BrokerHub sends events through a broker (settings.EVENT_BROKER) and fans
+  out what the broker delivers through a LocalHub, so a write in any process
+  reaches streams in all of them. LocalBroker is an in-memory stand-in; a
+  Redis or Postgres LISTEN/NOTIFY broker provides the same two methods.
+
+A subscriber that falls QUEUE_SIZE events behind is dropped: its stream ends
+and the browser reconnects and reloads, rather than the hub buffering for it
+without bound. Like exports, streams come in a sync and an async flavour;
+production serves the async one under ASGI, where an idle stream costs a
+queue and no thread.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from ninja.orm import create_schema
+
+from .models import DutyStatus
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+# How long a browser waits before reconnecting a dropped stream
+RETRY_MILLISECONDS = 3000
+EVENT_NAME = "duty_status"
+FLEET = "fleet"
+
+# The same schema trips.api renders duty statuses with
+DutyStatusSchema = create_schema(DutyStatus)
+
+
+def log_channel(daily_log_id):
+    return f"daily-log:{daily_log_id}"
+
+
+def driver_channel(driver_id):
+    return f"driver:{driver_id}"
+
+
+class Subscription(ABC):
+    """A stream's place on the hub; `put` may be called from any thread"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.dropped = False
+
+    @abstractmethod
+    def put(self, message):
+        """Queue an encoded event, or mark the subscription dropped if full"""
+
+
+class QueueSubscription(Subscription):
+    """For a sync stream, which blocks its thread on `get`"""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.queue = queue.Queue(QUEUE_SIZE)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped = True
+
+    def get(self, timeout):
+        """The next message, or None after `timeout` seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """For an async stream on the running event loop"""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+    async def get(self, timeout):
+        """The next message, or None after `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+
+class LocalHub:
+    """Fans events out to the subscribers in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscribers.setdefault(subscription.channel, set()).add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.channel, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(map(len, self._subscribers.values()))
+
+    def publish(self, channels, message):
+        """Queue an encoded event for every subscriber to `channels`"""
+        with self._lock:
+            subscribers = [
+                subscription
+                for channel in channels
+                for subscription in self._subscribers.get(channel, ())
+            ]
+        for subscription in subscribers:
+            if subscription.dropped:
+                continue
+            try:
+                subscription.put(message)
+            except RuntimeError:
+                # Its event loop has closed
+                self.unsubscribe(subscription)
+
+
+class LocalBroker:
+    """In-memory stand-in for a message broker, shared by every hub"""
+
+    listeners = []
+
+    def listen(self, callback):
+        self.listeners.append(callback)
+
+    def publish(self, payload):
+        for callback in list(self.listeners):
+            callback(payload)
+
+
+class BrokerHub(LocalHub):
+    """Publishes through a broker and fans out what it delivers locally"""
+
+    def __init__(self):
+        super().__init__()
+        self.broker = import_string(settings.EVENT_BROKER)()
+        self.broker.listen(self._received)
+
+    def publish(self, channels, message):
+        self.broker.publish(json.dumps([channels, message]))
+
+    def _received(self, payload):
+        channels, message = json.loads(payload)
+        super().publish(channels, message)
+
+
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+
+def get_hub():
+    """The process's hub of the class named by settings.EVENT_HUB"""
+    with _hubs_lock:
+        if settings.EVENT_HUB not in _hubs:
+            _hubs[settings.EVENT_HUB] = import_string(settings.EVENT_HUB)()
+        return _hubs[settings.EVENT_HUB]
+
+
+def encode_event(data, event=EVENT_NAME):
+    """An event as Server-Sent Events text"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def publish_duty_status_events(events, log_drivers):
+    """
+    Publish duty status changes once the current transaction commits.
+
+    `events` holds (action, duty_status, previous_daily_log_id) for statuses
+    "created", "updated" or "deleted"; `log_drivers` maps the daily logs
+    involved to their drivers. A status moved to another log is also
+    announced on the old log's channels.
+    """
+    for action, duty_status, previous_log_id in events:
+        log_ids = {duty_status.daily_log_id, previous_log_id} - {None}
+        channels = [FLEET]
+        for daily_log_id in log_ids:
+            channels.append(log_channel(daily_log_id))
+            if daily_log_id in log_drivers:
+                channels.append(driver_channel(log_drivers[daily_log_id]))
+        message = encode_event(
+            {
+                "action": action,
+                "daily_log_id": duty_status.daily_log_id,
+                "driver_id": log_drivers.get(duty_status.daily_log_id),
+                # Encoded now: a deleted instance loses its id afterwards
+                "duty_status": DutyStatusSchema.from_orm(duty_status).dict(),
+            }
+        )
+        transaction.on_commit(partial(_publish, sorted(set(channels)), message))
+
+
+def _publish(channels, message):
+    get_hub().publish(channels, message)
+
+
+def _opening():
+    return f"retry: {RETRY_MILLISECONDS}\n: connected\n\n"
+
+
+def stream_events(channel, timeout):
+    """Events on `channel` for `timeout` seconds, blocking between them"""
+    hub = get_hub()
+    subscription = QueueSubscription(channel)
+    hub.subscribe(subscription)
+    try:
+        yield _opening()
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            if subscription.dropped:
+                break
+            yield message or ": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def astream_events(channel, timeout):
+    """Events on `channel` for `timeout` seconds, awaiting between them"""
+    hub = get_hub()
+    subscription = AsyncSubscription(channel)
+    hub.subscribe(subscription)
+    try:
+        yield _opening()
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            if subscription.dropped:
+                break
+            yield message or ": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,110 @@
+"""
+Duty-status history exports (records of duty status) as CSV or NDJSON.
+
+Rows are read with a chunked iterator (a server-side cursor on Postgres) and
+encoded a batch at a time, so memory stays flat however many rows match.
+Both a sync and an async stream are provided: Django buffers a sync iterator
+whole when serving it over ASGI, and an async one when serving over WSGI.
+"""
+
+import csv
+import io
+import json
+from datetime import timedelta
+from itertools import batched
+
+from asgiref.sync import sync_to_async
+
+from .models import DutyStatus
+from .totals import day_start
+
+CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    "id",
+    "driver_id",
+    "driver_license",
+    "daily_log_id",
+    "truck_number",
+    "duty_status",
+    "timestamp",
+    "location_address",
+    "latitude",
+    "longitude",
+    "notes",
+]
+EXPORT_FIELDS = [
+    "id",
+    "daily_log__driver_id",
+    "daily_log__driver__license_number",
+    "daily_log_id",
+    "daily_log__truck__truck_number",
+    "duty_status",
+    "timestamp",
+    "location_address",
+    "latitude",
+    "longitude",
+    "notes",
+]
+TIMESTAMP = EXPORT_COLUMNS.index("timestamp")
+COORDINATES = (EXPORT_COLUMNS.index("latitude"), EXPORT_COLUMNS.index("longitude"))
+
+
+def export_queryset(driver_id=None, start=None, end=None):
+    """Duty statuses in time order; `start` and `end` are inclusive local days"""
+    statuses = DutyStatus.objects.all()
+    if driver_id is not None:
+        statuses = statuses.filter(daily_log__driver_id=driver_id)
+    if start:
+        statuses = statuses.filter(timestamp__gte=day_start(start))
+    if end:
+        statuses = statuses.filter(timestamp__lt=day_start(end + timedelta(days=1)))
+    return statuses.order_by("timestamp", "id").values_list(*EXPORT_FIELDS)
+
+
+def _values(row):
+    values = list(row)
+    values[TIMESTAMP] = values[TIMESTAMP].isoformat()
+    for index in COORDINATES:
+        if values[index] is not None:
+            values[index] = float(values[index])
+    return values
+
+
+def _csv_header():
+    return ",".join(EXPORT_COLUMNS) + "\r\n"
+
+
+def _csv_batch(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def _ndjson_batch(rows):
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _values(row)))) + "\n" for row in rows
+    )
+
+
+# format: (content type, header, batch encoder)
+FORMATS = {
+    "csv": ("text/csv", _csv_header, _csv_batch),
+    "ndjson": ("application/x-ndjson", None, _ndjson_batch),
+}
+
+
+def stream_export(queryset, export_format):
+    """Encoded chunks of the export, reading rows with a chunked iterator"""
+    _, header, encode = FORMATS[export_format]
+    if header:
+        yield header()
+    for rows in batched(queryset.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+        yield encode(rows)
+
+
+async def astream_export(queryset, export_format):
+    """stream_export for async servers, one chunk at a time off the event loop"""
+    chunks = stream_export(queryset, export_format)
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
@@ -0,0 +1,160 @@
+"""
+Fleet-wide HOS summary.
+
+Everything is fetched with a few set-based queries, regardless of fleet
+size:
+
+- the drivers, carrying their running cycle totals (see trips.cycle),
+- one query over the per-day totals refreshing any stale cycle totals,
+- today's per-day totals row for every driver,
+- each driver's latest status, ranked with a ROW_NUMBER window over recent
+  statuses, and over full history only for drivers idle for longer.
+"""
+
+from datetime import timedelta
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .cycle import (
+    CYCLE_LIMIT_HOURS,
+    SNAPSHOT_MAX_AGE,
+    current_cycle_seconds,
+    cycle_seconds_by_driver,
+)
+from .models import DailyDutyTotal, Driver, DutyStatus
+from .totals import day_start, local_day
+
+STATUS_NAMES = [value for value, _ in DutyStatus.DUTY_STATUSES]
+
+# Latest statuses are first looked for in this recent range
+RECENT_STATUS_LOOKBACK = timedelta(days=2)
+
+LAST_STATUS_FIELDS = (
+    "duty_status",
+    "timestamp",
+    "location_address",
+    "latitude",
+    "longitude",
+)
+
+
+def cycle_hours(driver, now):
+    """Hours used from the driver's running total, accruing an open shift"""
+    return round(current_cycle_seconds(driver, now) / 3600, 2)
+
+
+def latest_statuses(driver_ids, now, since=None):
+    """Each driver's most recent status at `now`, keyed by driver id"""
+    statuses = DutyStatus.objects.filter(timestamp__lte=now)
+    if since is not None:
+        statuses = statuses.filter(timestamp__gte=since)
+    if driver_ids is not None:
+        statuses = statuses.filter(daily_log__driver_id__in=driver_ids)
+    ranked = statuses.annotate(
+        driver_id=F("daily_log__driver_id"),
+        rank=Window(
+            RowNumber(),
+            partition_by=F("daily_log__driver_id"),
+            order_by=[F("timestamp").desc(), F("id").desc()],
+        ),
+    ).filter(rank=1)
+    return {
+        row["driver_id"]: row for row in ranked.values("driver_id", *LAST_STATUS_FIELDS)
+    }
+
+
+def todays_hours(driver_ids, latest, now):
+    """Hours per duty status today, per driver, including the open status"""
+    today = DailyDutyTotal.objects.filter(day=local_day(now))
+    if driver_ids is not None:
+        today = today.filter(driver_id__in=driver_ids)
+
+    minutes_fields = [f"{status}_minutes" for status in STATUS_NAMES]
+    hours = {}
+    for row in today.values("driver_id", *minutes_fields):
+        hours[row["driver_id"]] = {
+            status: row[field] / 60
+            for status, field in zip(STATUS_NAMES, minutes_fields)
+        }
+
+    midnight = day_start(local_day(now))
+    for driver_id, status in latest.items():
+        started_at = max(status["timestamp"], midnight)
+        if now > started_at:
+            driver_hours = hours.setdefault(driver_id, dict.fromkeys(STATUS_NAMES, 0))
+            driver_hours[status["duty_status"]] += (
+                now - started_at
+            ).total_seconds() / 3600
+    return hours
+
+
+def refresh_stale_cycles(drivers, now, latest=None):
+    """
+    Bring stale running cycle totals and statuses up to date with one
+    grouped query; `latest` holds the drivers' latest statuses if known.
+    Returns the number of drivers refreshed
+    """
+    stale = [
+        driver
+        for driver in drivers
+        if driver.cycle_computed_at is None
+        or now - driver.cycle_computed_at > SNAPSHOT_MAX_AGE
+    ]
+    if not stale:
+        return 0
+    stale_ids = [driver.id for driver in stale]
+    totals = cycle_seconds_by_driver(stale_ids, now=now)
+    if latest is None:
+        latest = latest_statuses(stale_ids, now)
+    for driver in stale:
+        driver.cycle_seconds = totals.get(driver.id, 0)
+        driver.cycle_status = (
+            latest[driver.id]["duty_status"] if driver.id in latest else ""
+        )
+        driver.cycle_computed_at = now
+    Driver.objects.bulk_update(
+        stale, ["cycle_seconds", "cycle_status", "cycle_computed_at"]
+    )
+    return len(stale)
+
+
+def fleet_hos_summary(driver_ids=None, now=None):
+    """Cycle usage, today's totals and last known status for many drivers"""
+    now = now or timezone.now()
+
+    drivers = Driver.objects.select_related("user").order_by("id")
+    if driver_ids is not None:
+        drivers = drivers.filter(id__in=driver_ids)
+    drivers = list(drivers)
+
+    latest = latest_statuses(driver_ids, now, since=now - RECENT_STATUS_LOOKBACK)
+    idle = [driver.id for driver in drivers if driver.id not in latest]
+    if idle:
+        latest.update(latest_statuses(idle, now))
+    refresh_stale_cycles(drivers, now, latest)
+    today = todays_hours(driver_ids, latest, now)
+
+    summary = []
+    for driver in drivers:
+        used = cycle_hours(driver, now)
+        last_status = latest.get(driver.id)
+        driver_today = today.get(driver.id, dict.fromkeys(STATUS_NAMES, 0))
+        summary.append(
+            {
+                "driver_id": driver.id,
+                "name": driver.user.get_full_name() or driver.user.username,
+                "cycle_hours_used": used,
+                "cycle_hours_remaining": round(max(0, CYCLE_LIMIT_HOURS - used), 2),
+                "today": {
+                    status: round(hours, 2) for status, hours in driver_today.items()
+                },
+                "last_status": (
+                    {field: last_status[field] for field in LAST_STATUS_FIELDS}
+                    if last_status
+                    else None
+                ),
+            }
+        )
+    return summary
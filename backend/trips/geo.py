@@ -0,0 +1,240 @@
+"""
+Geohashes, great-circle distances and search areas, without a GIS library.
+
+A geohash interleaves longitude and latitude bits and writes them in base 32,
+so points in the same cell share a prefix and a cell's points are a
+contiguous range in an index ordered by geohash. A search area (a circle, or
+a corridor along a route) is covered with the cells it touches, merged into
+as few prefix ranges as possible; rows in those ranges are the candidates,
+and the exact great-circle distance decides.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Stored precision: cells of about 1.2 x 0.6 km
+GEOHASH_PRECISION = 6
+# Cover an area with at most this many cells, choosing the finest
+# precision that stays under it
+MAX_CELLS = 64
+# Cover a route with at most this many boxes, merging consecutive segments
+MAX_CORRIDOR_BOXES = 32
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """The geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    code, bits, value, even = [], 0, 0, True
+    while len(code) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(BASE32[value])
+            bits = value = 0
+    return "".join(code)
+
+
+def cell_size(precision):
+    """(latitude, longitude) degrees spanned by a cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (south, west, north, east) around a circle. Longitudes may fall outside
+    -180..180 near the antimeridian; boxes() splits those.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = latitude - d_lat, latitude + d_lat
+    if south <= -90 or north >= 90:
+        # The circle contains a pole: every longitude
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    d_lon = math.degrees(
+        math.asin(
+            min(
+                1.0,
+                math.sin(radius_km / EARTH_RADIUS_KM)
+                / math.cos(math.radians(latitude)),
+            )
+        )
+    )
+    return south, longitude - d_lon, north, longitude + d_lon
+
+
+def boxes(box):
+    """A box as one or two boxes within -180..180 longitude"""
+    south, west, north, east = box
+    if east - west >= 360:
+        return [(south, -180.0, north, 180.0)]
+    if west < -180:
+        return [(south, west + 360, north, 180.0), (south, -180.0, north, east)]
+    if east > 180:
+        return [(south, west, north, 180.0), (south, -180.0, north, east - 360)]
+    return [box]
+
+
+def _cells(box, precision):
+    south, west, north, east = box
+    d_lat, d_lon = cell_size(precision)
+    cells = set()
+    lat = south
+    while True:
+        lon = west
+        while True:
+            cells.add(encode(min(lat, 90.0), min(lon, 180.0), precision))
+            if lon >= east:
+                break
+            lon = min(lon + d_lon, east)
+        if lat >= north:
+            break
+        lat = min(lat + d_lat, north)
+    return cells
+
+
+def covering_cells(search_boxes, max_cells=MAX_CELLS):
+    """Geohash cells covering the boxes, as fine as max_cells allows"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        d_lat, d_lon = cell_size(precision)
+        estimate = sum(
+            (math.ceil((north - south) / d_lat) + 1)
+            * (math.ceil((east - west) / d_lon) + 1)
+            for south, west, north, east in search_boxes
+        )
+        if estimate <= max_cells * 4 or precision == 1:
+            cells = set()
+            for box in search_boxes:
+                cells |= _cells(box, precision)
+            if len(cells) <= max_cells or precision == 1:
+                return cells
+    return cells
+
+
+def prefix_ranges(cells):
+    """
+    Cells merged into [start, stop) ranges of geohash strings. Cells next to
+    each other in geohash order become one range, and a full set of 32
+    sibling cells becomes their parent.
+    """
+    cells = set(cells)
+    # Promote complete families to their parent, repeatedly
+    changed = True
+    while changed:
+        changed = False
+        parents = {}
+        for cell in cells:
+            if len(cell) > 1:
+                parents.setdefault(cell[:-1], set()).add(cell)
+        for parent, children in parents.items():
+            if len(children) == 32:
+                cells -= children
+                cells.add(parent)
+                changed = True
+
+    ranges = []
+    for cell in sorted(cells):
+        stop = _successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((cell, stop))
+    return ranges
+
+
+def _successor(cell):
+    """The first string after every geohash starting with `cell`"""
+    while cell and cell[-1] == BASE32[-1]:
+        cell = cell[:-1]
+    if not cell:
+        return "~"
+    return cell[:-1] + BASE32[BASE32.index(cell[-1]) + 1]
+
+
+def _project(latitude, longitude, origin_latitude, origin_longitude):
+    """Kilometres east and north of an origin, on a plane tangent there"""
+    d_lon = (longitude - origin_longitude + 180) % 360 - 180
+    x = math.radians(d_lon) * EARTH_RADIUS_KM * math.cos(math.radians(origin_latitude))
+    y = math.radians(latitude - origin_latitude) * EARTH_RADIUS_KM
+    return x, y
+
+
+def segment_distance_km(latitude, longitude, start, end):
+    """
+    Distance from a point to the segment start-end, and how far along the
+    segment its closest point is. Uses a plane tangent at the segment's
+    midpoint, accurate to well under 1% for segments of a few hundred km.
+    """
+    origin = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+    ax, ay = _project(*start, *origin)
+    bx, by = _project(*end, *origin)
+    px, py = _project(latitude, longitude, *origin)
+    dx, dy = bx - ax, by - ay
+    length_squared = dx * dx + dy * dy
+    t = 0.0
+    if length_squared:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_squared))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy), t * math.sqrt(length_squared)
+
+
+def corridor_distance_km(latitude, longitude, route):
+    """
+    (distance from the route, distance along it to the closest point) for a
+    route given as a list of (latitude, longitude) points
+    """
+    if len(route) == 1:
+        return haversine_km(latitude, longitude, *route[0]), 0.0
+    best = None
+    travelled = 0.0
+    for start, end in zip(route, route[1:]):
+        distance, along = segment_distance_km(latitude, longitude, start, end)
+        if best is None or distance < best[0]:
+            best = (distance, travelled + along)
+        travelled += haversine_km(*start, *end)
+    return best
+
+
+def corridor_boxes(route, width_km, max_boxes=MAX_CORRIDOR_BOXES):
+    """
+    Boxes covering every segment of a route, widened by width_km. Runs of
+    consecutive segments share a box, so a long route still makes at most
+    max_boxes boxes (twice that across the antimeridian) and one query
+    """
+    segments = list(zip(route, route[1:] or route))
+    per_box = math.ceil(len(segments) / max_boxes)
+    search_boxes = []
+    for first in range(0, len(segments), per_box):
+        run = segments[first : first + per_box]
+        points = [run[0][0]] + [end for start, end in run]
+        south, west, north, east = bounding_box(*points[0], width_km)
+        longitude = points[0][1]
+        for latitude, next_longitude in points[1:]:
+            # Unwrap the longitude so crossing the antimeridian continues
+            # past 180 instead of jumping back across the map
+            longitude += (next_longitude - longitude + 180) % 360 - 180
+            box = bounding_box(latitude, longitude, width_km)
+            south, west = min(south, box[0]), min(west, box[1])
+            north, east = max(north, box[2]), max(east, box[3])
+        search_boxes.extend(boxes((south, west, north, east)))
+    return search_boxes
@@ -0,0 +1,86 @@
+"""
+Paper-log grid for a daily log: 24 hours split into 96 quarter-hour slots.
+
+Each status is floored to the quarter hour it starts in, as on the paper
+form, and fills slots until the next status begins. Slots before the first
+status of the day are off duty.
+"""
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import log_cache_key
+from .models import DutyStatus
+
+SLOTS_PER_DAY = 96
+SLOT_MINUTES = 15
+GRID_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Slot values are indexes into this list
+GRID_STATUSES = [value for value, _ in DutyStatus.DUTY_STATUSES]
+STATUS_INDEX = {status: index for index, status in enumerate(GRID_STATUSES)}
+OFF_DUTY = STATUS_INDEX["off_duty"]
+
+
+def get_zone(name):
+    """ZoneInfo for `name`, or the current Django timezone when not given"""
+    if not name:
+        return timezone.get_current_timezone()
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone '{name}'")
+
+
+def build_grid(daily_log, zone):
+    """Compute the grid payload in one pass over the log's statuses"""
+    statuses = list(
+        daily_log.duty_statuses.order_by("timestamp", "id").values_list(
+            "timestamp", "duty_status"
+        )
+    )
+    first_moment = statuses[0][0] if statuses else daily_log.created_at
+    day = first_moment.astimezone(zone).date()
+    day_start = datetime.combine(day, time.min, tzinfo=zone)
+
+    slots = [OFF_DUTY] * SLOTS_PER_DAY
+    current, current_slot = OFF_DUTY, 0
+    for timestamp, duty_status in statuses:
+        minutes = (timestamp - day_start) / timedelta(minutes=1)
+        slot = min(max(int(minutes // SLOT_MINUTES), 0), SLOTS_PER_DAY)
+        slots[current_slot:slot] = [current] * (slot - current_slot)
+        current, current_slot = STATUS_INDEX[duty_status], slot
+    slots[current_slot:] = [current] * (SLOTS_PER_DAY - current_slot)
+
+    counts = [0] * len(GRID_STATUSES)
+    transitions = []
+    for slot, value in enumerate(slots):
+        counts[value] += 1
+        if slot == 0 or value != slots[slot - 1]:
+            transitions.append({"slot": slot, "status": GRID_STATUSES[value]})
+
+    return {
+        "daily_log_id": daily_log.id,
+        "date": day,
+        "timezone": str(zone),
+        "statuses": GRID_STATUSES,
+        "slots": slots,
+        "totals": {
+            status: count * SLOT_MINUTES / 60
+            for status, count in zip(GRID_STATUSES, counts)
+        },
+        "transitions": transitions,
+    }
+
+
+def get_grid(daily_log, zone):
+    """Grid payload, cached until the log's duty statuses change"""
+    key = log_cache_key(daily_log.id, "grid", zone)
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_grid(daily_log, zone)
+        cache.set(key, grid, GRID_CACHE_TIMEOUT)
+    return grid
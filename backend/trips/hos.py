@@ -0,0 +1,248 @@
+"""
+Hours-of-service compliance engine (property-carrying, 70-hour/8-day).
+
+`evaluate_timeline` walks a driver's ordered duty statuses once, treating each
+status as lasting until the next one, and reports violations of:
+
+- the 11-hour driving limit,
+- the 14-hour on-duty window,
+- the 30-minute break required after 8 hours of driving,
+- the 70-hour/8-day cycle, over the same calendar days as trips.cycle,
+
+along with the clocks left at the end of the timeline. A 10-hour off-duty
+period resets the 11/14/break clocks and a 34-hour one restarts the cycle.
+Sleeper-berth split provisions are not modelled.
+
+Work is done on epoch seconds with a sliding window over on-duty spans, so
+the pass is linear in the number of statuses.
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from itertools import groupby
+
+from django.utils import timezone
+
+from .cycle import CYCLE_DAYS, CYCLE_LIMIT_HOURS, cycle_start
+from .models import DutyStatus
+
+HOUR = 3600
+
+DRIVING_LIMIT = 11 * HOUR
+WINDOW_LIMIT = 14 * HOUR
+BREAK_AFTER_DRIVING = 8 * HOUR
+BREAK_LENGTH = 30 * 60
+RESET_LENGTH = 10 * HOUR
+RESTART_LENGTH = 34 * HOUR
+CYCLE_LIMIT = CYCLE_LIMIT_HOURS * HOUR
+
+OFF_DUTY_STATUSES = ("off_duty", "sleeper_berth")
+
+
+def _to_datetime(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def evaluate_timeline(events, as_of=None, report_from=None):
+    """
+    Evaluate HOS rules over `events`, an iterable of (timestamp, duty_status)
+    pairs sorted by timestamp.
+
+    Statuses after `as_of` (default: now) are ignored and the last one is
+    assumed to continue until `as_of`. Violations starting before
+    `report_from` are evaluated (they affect the clocks) but not reported.
+    """
+    as_of = (as_of or timezone.now()).timestamp()
+    report_from = report_from.timestamp() if report_from else None
+
+    violations = []
+    shift_start = None
+    shift_driving = 0.0
+    driving_since_break = 0.0
+    non_driving_since = None
+    off_duty_since = None
+
+    # Sliding window of on-duty spans for the 70-hour/8-day cycle
+    cycle_spans = deque()
+    cycle_total = 0.0
+
+    # One violation per rule per shift / break period / cycle excursion
+    flagged = set()
+
+    def cycle_used(at):
+        nonlocal cycle_total
+        window_start = cycle_start(_to_datetime(at)).timestamp()
+        while cycle_spans and cycle_spans[0][1] <= window_start:
+            span_start, span_end = cycle_spans.popleft()
+            cycle_total -= span_end - span_start
+        if cycle_spans and cycle_spans[0][0] < window_start:
+            return cycle_total - (window_start - cycle_spans[0][0])
+        return cycle_total
+
+    def flag(rule, at, detail):
+        if rule in flagged:
+            return
+        flagged.add(rule)
+        if report_from is None or at >= report_from:
+            violations.append(
+                {"rule": rule, "occurred_at": _to_datetime(at), "detail": detail}
+            )
+
+    def close_segment(status, start, end):
+        nonlocal shift_start, shift_driving, driving_since_break
+        nonlocal non_driving_since, off_duty_since, cycle_total
+
+        if status in OFF_DUTY_STATUSES:
+            if off_duty_since is None:
+                off_duty_since = start
+            if non_driving_since is None:
+                non_driving_since = start
+            off_length = end - off_duty_since
+            if off_length >= RESET_LENGTH:
+                shift_start = None
+                shift_driving = 0.0
+                driving_since_break = 0.0
+                flagged.difference_update(("driving_11h", "window_14h", "break_30m"))
+            if off_length >= RESTART_LENGTH:
+                cycle_spans.clear()
+                cycle_total = 0.0
+                flagged.discard("cycle_70h")
+            return
+
+        off_duty_since = None
+        if shift_start is None:
+            shift_start = start
+        duration = end - start
+
+        if status == "driving":
+            if non_driving_since is not None and start - non_driving_since >= (
+                BREAK_LENGTH
+            ):
+                driving_since_break = 0.0
+                flagged.discard("break_30m")
+            non_driving_since = None
+
+            if shift_driving + duration > DRIVING_LIMIT:
+                flag(
+                    "driving_11h",
+                    start + max(0.0, DRIVING_LIMIT - shift_driving),
+                    "Driving beyond 11 hours since the last 10-hour break",
+                )
+            window_end = shift_start + WINDOW_LIMIT
+            if end > window_end:
+                flag(
+                    "window_14h",
+                    max(start, window_end),
+                    "Driving after the 14th hour since coming on duty",
+                )
+            if driving_since_break + duration > BREAK_AFTER_DRIVING:
+                flag(
+                    "break_30m",
+                    start + max(0.0, BREAK_AFTER_DRIVING - driving_since_break),
+                    "Driving past 8 hours without a 30-minute break",
+                )
+            shift_driving += duration
+            driving_since_break += duration
+        elif non_driving_since is None:
+            non_driving_since = start
+
+        if duration > 0:
+            cycle_spans.append((start, end))
+            cycle_total += duration
+        used = cycle_used(end)
+        if used > CYCLE_LIMIT and status == "driving":
+            flag(
+                "cycle_70h",
+                max(start, end - (used - CYCLE_LIMIT)),
+                "Driving after 70 on-duty hours in 8 days",
+            )
+        elif used <= CYCLE_LIMIT:
+            flagged.discard("cycle_70h")
+
+    previous = None
+    for timestamp, status in events:
+        at = timestamp.timestamp()
+        if at > as_of:
+            break
+        if previous is not None:
+            close_segment(previous[1], previous[0], at)
+        previous = (at, status)
+    if previous is not None:
+        close_segment(previous[1], previous[0], as_of)
+
+    if shift_start is None:
+        drive_left, window_left = DRIVING_LIMIT, WINDOW_LIMIT
+    else:
+        drive_left = DRIVING_LIMIT - shift_driving
+        window_left = WINDOW_LIMIT - (as_of - shift_start)
+    break_left = BREAK_AFTER_DRIVING - driving_since_break
+    cycle_left = CYCLE_LIMIT - cycle_used(as_of)
+    clocks = {
+        "driving_remaining": max(0.0, drive_left),
+        "window_remaining": max(0.0, window_left),
+        "break_remaining": max(0.0, break_left),
+        "cycle_remaining": max(0.0, cycle_left),
+        "off_duty_elapsed": as_of - off_duty_since if off_duty_since else 0.0,
+    }
+    clocks["available_to_drive"] = min(
+        clocks["driving_remaining"],
+        clocks["window_remaining"],
+        clocks["break_remaining"],
+        clocks["cycle_remaining"],
+    )
+
+    return {
+        "as_of": _to_datetime(as_of),
+        "current_status": previous[1] if previous else None,
+        "violations": violations,
+        "clocks": {name: round(value / HOUR, 2) for name, value in clocks.items()},
+    }
+
+
+def _history_start(report_from):
+    # Enough history before the reported range to know the cycle state
+    return report_from - timedelta(days=CYCLE_DAYS)
+
+
+def evaluate_driver(driver_id, report_from=None, as_of=None):
+    """HOS report for one driver, reporting violations since `report_from`"""
+    as_of = as_of or timezone.now()
+    report_from = report_from or as_of - timedelta(days=CYCLE_DAYS)
+    events = (
+        DutyStatus.objects.filter(
+            daily_log__driver_id=driver_id,
+            timestamp__gte=_history_start(report_from),
+            timestamp__lte=as_of,
+        )
+        .order_by("timestamp", "id")
+        .values_list("timestamp", "duty_status")
+    )
+    return evaluate_timeline(
+        events.iterator(chunk_size=5000), as_of=as_of, report_from=report_from
+    )
+
+
+def evaluate_fleet(driver_ids=None, report_from=None, as_of=None):
+    """HOS reports for many drivers from a single ordered query"""
+    as_of = as_of or timezone.now()
+    report_from = report_from or as_of - timedelta(days=CYCLE_DAYS)
+    events = DutyStatus.objects.filter(
+        timestamp__gte=_history_start(report_from), timestamp__lte=as_of
+    )
+    if driver_ids is not None:
+        events = events.filter(daily_log__driver_id__in=driver_ids)
+    rows = (
+        events.order_by("daily_log__driver_id", "timestamp", "id")
+        .values_list("daily_log__driver_id", "timestamp", "duty_status")
+        .iterator(chunk_size=5000)
+    )
+
+    reports = {}
+    for driver_id, driver_rows in groupby(rows, key=lambda row: row[0]):
+        reports[driver_id] = evaluate_timeline(
+            ((timestamp, status) for _, timestamp, status in driver_rows),
+            as_of=as_of,
+            report_from=report_from,
+        )
+    return reports
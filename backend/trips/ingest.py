@@ -0,0 +1,137 @@
+"""
+Batch ingest of duty statuses from ELD devices and the simulator.
+
+A batch is validated up front with a couple of lookups, then every valid
+event is written in one transaction with a single bulk INSERT. Events that
+carry an idempotency key already stored (or repeated within the batch) are
+reported as duplicates instead of being inserted again, so a gateway can
+safely replay its whole buffer after a reconnect.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DailyLog, DutyStatus
+from .signals import duty_statuses_changed
+
+MAX_BATCH_SIZE = 1000
+
+VALID_DUTY_STATUSES = {value for value, _ in DutyStatus.DUTY_STATUSES}
+IDEMPOTENCY_KEY_LENGTH = DutyStatus._meta.get_field("idempotency_key").max_length
+
+
+def validate_item(item, log_drivers):
+    """Return (DutyStatus, None) for a valid item or (None, error message)"""
+    if item.daily_log_id not in log_drivers:
+        return None, f"Daily log {item.daily_log_id} not found"
+    if item.duty_status not in VALID_DUTY_STATUSES:
+        return None, f"Invalid duty status '{item.duty_status}'"
+    if item.latitude is not None and not -90 <= item.latitude <= 90:
+        return None, "Latitude out of range"
+    if item.longitude is not None and not -180 <= item.longitude <= 180:
+        return None, "Longitude out of range"
+    if item.idempotency_key and len(item.idempotency_key) > IDEMPOTENCY_KEY_LENGTH:
+        return None, f"Idempotency key longer than {IDEMPOTENCY_KEY_LENGTH} characters"
+
+    try:
+        timestamp = parse_datetime(item.timestamp)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        return None, f"Invalid timestamp '{item.timestamp}'"
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    return (
+        DutyStatus(
+            daily_log_id=item.daily_log_id,
+            duty_status=item.duty_status,
+            location_address=item.location_address,
+            latitude=item.latitude,
+            longitude=item.longitude,
+            timestamp=timestamp,
+            notes=item.notes or "",
+            idempotency_key=item.idempotency_key,
+        ),
+        None,
+    )
+
+
+def _existing_keys(keys):
+    return dict(
+        DutyStatus.objects.filter(idempotency_key__in=keys).values_list(
+            "idempotency_key", "id"
+        )
+    )
+
+
+def ingest_duty_statuses(items):
+    """
+    Validate and store a batch of duty statuses.
+
+    Returns one result per input item, in order, with a `status` of
+    "created", "duplicate" or "error".
+    """
+    log_drivers = dict(
+        DailyLog.objects.filter(
+            id__in={item.daily_log_id for item in items}
+        ).values_list("id", "driver_id")
+    )
+    keys = {item.idempotency_key for item in items if item.idempotency_key}
+
+    # A concurrent replay can insert the same key between our lookup and the
+    # INSERT; the unique constraint catches it and we re-plan once.
+    for attempt in range(2):
+        existing = _existing_keys(keys) if keys else {}
+        results = [None] * len(items)
+        pending = []
+        batch_keys = {}
+
+        for index, item in enumerate(items):
+            key = item.idempotency_key
+            if key and key in existing:
+                results[index] = {"status": "duplicate", "id": existing[key]}
+                continue
+            if key and key in batch_keys:
+                results[index] = {"status": "duplicate", "same_as": batch_keys[key]}
+                continue
+
+            duty_status, error = validate_item(item, log_drivers)
+            if error:
+                results[index] = {"status": "error", "error": error}
+                continue
+            if key:
+                batch_keys[key] = index
+            pending.append((index, duty_status))
+
+        try:
+            with transaction.atomic():
+                created = DutyStatus.objects.bulk_create(
+                    [duty_status for _, duty_status in pending]
+                )
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    for (index, _), duty_status in zip(pending, created):
+        results[index] = {"status": "created", "id": duty_status.id}
+    for index, result in enumerate(results):
+        if "same_as" in result:
+            results[index] = {
+                "status": "duplicate",
+                "id": results[result.pop("same_as")]["id"],
+            }
+
+    # bulk_create skips post_save, so run the signal handlers' work once here
+    if created:
+        duty_statuses_changed(
+            [
+                (duty_status.daily_log_id, duty_status.timestamp)
+                for duty_status in created
+            ],
+            events=[("created", duty_status, None) for duty_status in created],
+        )
+
+    return [{"index": index, **result} for index, result in enumerate(results)]
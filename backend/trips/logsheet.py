@@ -0,0 +1,356 @@
+"""
+Printable daily log sheets, drawn as SVG or PDF with the standard library.
+
+A sheet is a plain dict describing one daily log (see trips.printing). It is
+drawn into a list of primitives on a US Letter landscape page, which the SVG
+and PDF writers below turn into a page fragment; documents are assembled
+from page fragments, so pages can be rendered, cached and combined
+separately. Nothing here touches Django, so pages can be rendered in worker
+processes.
+"""
+
+import zlib
+from xml.sax.saxutils import escape
+
+PAGE_WIDTH = 792
+PAGE_HEIGHT = 612
+MARGIN = 36
+
+GRID_LEFT = 126
+GRID_TOP = 170
+HOUR_WIDTH = 24
+ROW_HEIGHT = 28
+GRID_RIGHT = GRID_LEFT + 24 * HOUR_WIDTH
+TOTALS_RIGHT = PAGE_WIDTH - MARGIN
+SLOT_WIDTH = HOUR_WIDTH / 4
+
+REMARKS_TOP = 338
+REMARK_HEIGHT = 12
+MAX_REMARKS = (PAGE_HEIGHT - MARGIN - REMARKS_TOP) // REMARK_HEIGHT
+MAX_REMARK_CHARS = 150
+
+# Helvetica advance widths (1/1000 em) for characters 32-126, to align text
+# in PDF, which has no text-anchor
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278,
+    278, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584,
+    584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556,
+    833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+    278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222,
+    500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500,
+    500, 334, 260, 334, 584,
+]  # fmt: skip
+
+
+def _hour_label(hour):
+    return {0: "MIDNIGHT", 12: "NOON", 24: "MIDNIGHT"}.get(hour, str(hour))
+
+
+def draw_sheet(sheet):
+    """Drawing primitives for a sheet, in points from the top-left corner"""
+    ops = []
+
+    def text(x, y, value, size, anchor="start", bold=False):
+        ops.append(("text", x, y, str(value), size, anchor, bold))
+
+    def line(x1, y1, x2, y2, width=0.5):
+        ops.append(("line", x1, y1, x2, y2, width))
+
+    center = PAGE_WIDTH / 2
+    text(center, 60, "DAILY LOG BOOK", 18, "middle", bold=True)
+    text(
+        center,
+        78,
+        f"Daily Log #{sheet['daily_log_id']} • {sheet['date']} "
+        f"({sheet['timezone']})",
+        9,
+        "middle",
+    )
+
+    # Driver and equipment
+    info_width = (PAGE_WIDTH - 2 * MARGIN) / 4
+    ops.append(("rect", MARGIN, 92, PAGE_WIDTH - 2 * MARGIN, 44, 1.5))
+    for index, (label, value) in enumerate(
+        [
+            ("TRUCK NUMBER", sheet["truck_number"]),
+            ("TRAILER NUMBER", sheet["trailer_number"]),
+            ("DRIVER", sheet["driver"]),
+            ("CO-DRIVER", sheet["co_driver"]),
+        ]
+    ):
+        x = MARGIN + index * info_width
+        text(x + 8, 108, label, 7)
+        text(x + 8, 126, value or "N/A", 11, bold=True)
+
+    # Grid: hour labels, a row per status with quarter-hour ticks, totals
+    bottom = GRID_TOP + ROW_HEIGHT * len(sheet["statuses"])
+    for hour in range(25):
+        text(
+            GRID_LEFT + hour * HOUR_WIDTH,
+            GRID_TOP - 6,
+            _hour_label(hour),
+            5.5,
+            "middle",
+            bold=True,
+        )
+        line(
+            GRID_LEFT + hour * HOUR_WIDTH,
+            GRID_TOP,
+            GRID_LEFT + hour * HOUR_WIDTH,
+            bottom,
+        )
+    text(
+        (GRID_RIGHT + TOTALS_RIGHT) / 2,
+        GRID_TOP - 6,
+        "HOURS",
+        5.5,
+        "middle",
+        bold=True,
+    )
+
+    for row, status in enumerate(sheet["statuses"]):
+        top = GRID_TOP + row * ROW_HEIGHT
+        text(
+            GRID_LEFT - 6,
+            top + ROW_HEIGHT / 2 + 3,
+            sheet["labels"][row],
+            8,
+            "end",
+            bold=True,
+        )
+        line(MARGIN, top + ROW_HEIGHT, TOTALS_RIGHT, top + ROW_HEIGHT, 1)
+        for quarter in range(1, 96):
+            if quarter % 4:
+                x = GRID_LEFT + quarter * SLOT_WIDTH
+                tick = 0.5 if quarter % 4 == 2 else 0.3
+                line(x, top, x, top + ROW_HEIGHT * tick, 0.3)
+        text(
+            TOTALS_RIGHT - 6,
+            top + ROW_HEIGHT / 2 + 3,
+            f"{sheet['totals'][status]:.2f}",
+            9,
+            "end",
+            bold=True,
+        )
+    ops.append(("rect", GRID_LEFT, GRID_TOP, 24 * HOUR_WIDTH, bottom - GRID_TOP, 1.5))
+    ops.append(
+        ("rect", GRID_RIGHT, GRID_TOP, TOTALS_RIGHT - GRID_RIGHT, bottom - GRID_TOP, 1)
+    )
+    text(MARGIN, bottom + 16, f"TOTAL MILES DRIVING TODAY: {sheet['miles']:.1f}", 8)
+    text(GRID_RIGHT - 6, bottom + 16, "TOTAL", 8, "end", bold=True)
+    text(
+        TOTALS_RIGHT - 6,
+        bottom + 16,
+        f"{sum(sheet['totals'].values()):.2f}",
+        9,
+        "end",
+        bold=True,
+    )
+
+    # Duty line through the rows, from one transition to the next
+    points = []
+    transitions = sheet["transitions"]
+    for index, transition in enumerate(transitions):
+        row = sheet["statuses"].index(transition["status"])
+        y = GRID_TOP + row * ROW_HEIGHT + ROW_HEIGHT / 2
+        end = transitions[index + 1]["slot"] if index + 1 < len(transitions) else 96
+        points.append((GRID_LEFT + transition["slot"] * SLOT_WIDTH, y))
+        points.append((GRID_LEFT + end * SLOT_WIDTH, y))
+    if points:
+        ops.append(("path", points, 2))
+
+    # Remarks
+    text(MARGIN, REMARKS_TOP - 18, "REMARKS", 10, bold=True)
+    line(MARGIN, REMARKS_TOP - 14, TOTALS_RIGHT, REMARKS_TOP - 14, 1)
+    remarks = sheet["remarks"]
+    shown = remarks if len(remarks) <= MAX_REMARKS else remarks[: MAX_REMARKS - 1]
+    for index, remark in enumerate(shown):
+        y = REMARKS_TOP + index * REMARK_HEIGHT
+        text(MARGIN, y, remark["time"], 8, bold=True)
+        text(MARGIN + 32, y, remark["label"], 8, bold=True)
+        details = remark["location"]
+        if remark["notes"]:
+            details = f'{details} — "{remark["notes"]}"'
+        if len(details) > MAX_REMARK_CHARS:
+            details = details[: MAX_REMARK_CHARS - 1] + "…"
+        text(MARGIN + 110, y, details, 8)
+    if len(shown) < len(remarks):
+        text(
+            MARGIN,
+            REMARKS_TOP + len(shown) * REMARK_HEIGHT,
+            f"+ {len(remarks) - len(shown)} more changes of duty status",
+            8,
+        )
+    if not remarks:
+        text(MARGIN, REMARKS_TOP, "No duty status changes recorded", 8)
+    return ops
+
+
+def _number(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+# SVG
+
+
+def svg_page(sheet):
+    """SVG elements for one sheet"""
+    elements = [
+        f'<rect width="{PAGE_WIDTH}" height="{PAGE_HEIGHT}" '
+        'fill="white" stroke="none"/>'
+    ]
+    for op in draw_sheet(sheet):
+        kind = op[0]
+        if kind == "line":
+            _, x1, y1, x2, y2, width = op
+            elements.append(
+                f'<line x1="{_number(x1)}" y1="{_number(y1)}" x2="{_number(x2)}" '
+                f'y2="{_number(y2)}" stroke-width="{width}"/>'
+            )
+        elif kind == "rect":
+            _, x, y, w, h, width = op
+            elements.append(
+                f'<rect x="{_number(x)}" y="{_number(y)}" width="{_number(w)}" '
+                f'height="{_number(h)}" fill="none" stroke-width="{width}"/>'
+            )
+        elif kind == "path":
+            _, points, width = op
+            coordinates = " ".join(f"{_number(x)},{_number(y)}" for x, y in points)
+            elements.append(
+                f'<polyline points="{coordinates}" fill="none" '
+                f'stroke-width="{width}" stroke-linejoin="miter"/>'
+            )
+        else:
+            _, x, y, value, size, anchor, bold = op
+            weight = ' font-weight="bold"' if bold else ""
+            elements.append(
+                f'<text x="{_number(x)}" y="{_number(y)}" font-size="{size}" '
+                f'text-anchor="{anchor}"{weight} stroke="none">{escape(value)}</text>'
+            )
+    return "\n".join(elements)
+
+
+def svg_document(pages, title="Daily logs"):
+    """An SVG document with the pages stacked top to bottom"""
+    height = PAGE_HEIGHT * len(pages)
+    groups = "\n".join(
+        f'<g transform="translate(0,{PAGE_HEIGHT * index})">\n{page}\n</g>'
+        for index, page in enumerate(pages)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{PAGE_WIDTH}pt" '
+        f'height="{height}pt" viewBox="0 0 {PAGE_WIDTH} {height}" '
+        'font-family="Helvetica, Arial, sans-serif" stroke="black">\n'
+        f"<title>{escape(title)}</title>\n{groups}\n</svg>\n"
+    ).encode()
+
+
+# PDF
+
+
+def _text_width(value, size, bold):
+    width = sum(
+        HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556
+        for char in value
+    )
+    # Helvetica-Bold runs about 5% wider
+    return width * size / 1000 * (1.05 if bold else 1)
+
+
+def _pdf_string(value):
+    encoded = value.encode("cp1252", "replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def pdf_page(sheet):
+    """A compressed PDF content stream for one sheet"""
+    commands = []
+
+    def y(value):
+        return _number(PAGE_HEIGHT - value)
+
+    for op in draw_sheet(sheet):
+        kind = op[0]
+        if kind == "line":
+            _, x1, y1, x2, y2, width = op
+            commands.append(
+                f"{width} w {_number(x1)} {y(y1)} m {_number(x2)} {y(y2)} l S"
+            )
+        elif kind == "rect":
+            _, x, top, w, h, width = op
+            commands.append(
+                f"{width} w {_number(x)} {y(top + h)} {_number(w)} {_number(h)} re S"
+            )
+        elif kind == "path":
+            _, points, width = op
+            (first_x, first_y), rest = points[0], points[1:]
+            segments = " ".join(f"{_number(px)} {y(py)} l" for px, py in rest)
+            commands.append(
+                f"{width} w 0 j {_number(first_x)} {y(first_y)} m {segments} S"
+            )
+        else:
+            _, x, top, value, size, anchor, bold = op
+            if anchor != "start":
+                width = _text_width(value, size, bold)
+                x -= width / 2 if anchor == "middle" else width
+            font = "F2" if bold else "F1"
+            commands.append(
+                f"BT /{font} {size} Tf {_number(x)} {y(top)} Td (".encode()
+                + _pdf_string(value)
+                + b") Tj ET"
+            )
+    return zlib.compress(
+        b"\n".join(
+            command if isinstance(command, bytes) else command.encode()
+            for command in commands
+        )
+    )
+
+
+def pdf_document(pages, title="Daily logs"):
+    """A PDF document with one page per content stream"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+        b"/Encoding /WinAnsiEncoding >>",
+        b"<< /Title (" + _pdf_string(title) + b") /Producer (trip-tracker) >>",
+    ]
+    page_ids = []
+    for content in pages:
+        content_id = len(objects) + 1
+        objects.append(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+            + content
+            + b"\nendstream"
+        )
+        page_ids.append(len(objects) + 1)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> "
+            b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    document = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(document))
+        document += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(document)
+    document += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    document += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    document += (
+        b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    return bytes(document)
+
+
+RENDERERS = {
+    "svg": (svg_page, svg_document, "image/svg+xml"),
+    "pdf": (pdf_page, pdf_document, "application/pdf"),
+}
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from trips.archive import BATCH_SIZE, archivable, archive_daily_logs
+from trips.models import ArchiveSegment
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed daily logs older than --days, with their duty statuses, "
+        "out of the live tables into compressed monthly archive segments"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive logs created more than this many days ago",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count what would move"
+        )
+        parser.add_argument(
+            "--manifest", action="store_true", help="List the archive's segments"
+        )
+
+    def handle(self, *args, days, batch_size, dry_run, manifest, **options):
+        if manifest:
+            self.list_segments()
+            return
+
+        before = timezone.now() - timedelta(days=days)
+        if dry_run:
+            self.stdout.write(
+                f"{archivable(before).count()} daily logs created before "
+                f"{before:%Y-%m-%d} would be archived"
+            )
+            return
+
+        def progress(moved):
+            self.stdout.write(f"Archived {moved['logs']} daily logs...")
+
+        try:
+            moved = archive_daily_logs(
+                before,
+                batch_size=batch_size,
+                progress=progress if options["verbosity"] > 1 else None,
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        ratio = moved["raw_bytes"] / moved["stored_bytes"] if moved["logs"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved['logs']} daily logs and "
+                f"{moved['duty_statuses']} duty statuses in "
+                f"{moved['stored_bytes'] / 1024:.0f} KB ({ratio:.1f}x compressed)"
+            )
+        )
+
+    def list_segments(self):
+        for segment in ArchiveSegment.objects.order_by("month", "id"):
+            self.stdout.write(
+                f"{segment.id}\t{segment.month:%Y-%m}\t{segment.logs} logs\t"
+                f"{segment.duty_statuses} statuses\t"
+                f"{segment.stored_bytes / 1024:.0f} KB\t"
+                f"archived {segment.created_at:%Y-%m-%d %H:%M}"
+            )
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from trips.benchmarks import run_benchmarks, run_http_benchmarks
+from trips.models import DailyLog, Driver, DutyStatus
+
+DEFAULT_SIZES = "1000,100000,1000000"
+SEED_DAYS = 30
+# Duty statuses a simulated driver records per day (see trips.simulator)
+STATUSES_PER_DRIVER_DAY = 10.6
+# A change in p50 latency, queries or memory beyond this is a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint against databases seeded with 1k, 100k "
+        "and 1M duty statuses and write latency, queries and memory as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default=DEFAULT_SIZES,
+            help="Comma-separated duty status counts to seed and measure",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--case",
+            action="append",
+            dest="cases",
+            help="Only run cases whose name contains this (can be repeated)",
+        )
+        parser.add_argument("--output", help="JSON file to write")
+        parser.add_argument(
+            "--compare", help="Earlier JSON to compare against; flags regressions"
+        )
+        parser.add_argument(
+            "--data-dir",
+            default=os.path.join(tempfile.gettempdir(), "trip-tracker-benchmarks"),
+            help="Where seeded databases are kept between runs",
+        )
+        parser.add_argument(
+            "--url",
+            help="Time the read endpoints of a running server instead of seeding",
+        )
+        # Internal: measure the configured database and print JSON
+        parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, sizes, iterations, cases, output, compare, **options):
+        if options["measure"]:
+            self.stdout.write(json.dumps(self.measure(iterations, cases)))
+            return
+
+        results = {
+            "meta": {
+                "commit": _git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "iterations": iterations,
+            },
+            "sizes": {},
+        }
+        if options["url"]:
+            results["meta"]["url"] = options["url"]
+            results["sizes"]["server"] = {
+                "cases": run_http_benchmarks(options["url"], iterations, cases)
+            }
+        else:
+            for size in [int(size) for size in sizes.split(",")]:
+                database = self.seed(size, Path(options["data_dir"]))
+                self.stdout.write(f"Measuring {size:,} duty statuses...")
+                results["sizes"][str(size)] = self.run_child(
+                    database,
+                    ["benchmark", "--measure", "--iterations", str(iterations)]
+                    + [f"--case={case}" for case in cases or []],
+                    capture=True,
+                )
+
+        self.report(results)
+        if compare:
+            with open(compare, encoding="utf-8") as file:
+                self.compare(json.load(file), results)
+        if output:
+            with open(output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+    def run_child(self, database, arguments, capture=False):
+        """Run manage.py against a seeded SQLite database"""
+        environment = {**os.environ, "DATABASE_URL": f"sqlite:///{database}"}
+        completed = subprocess.run(
+            [sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), *arguments],
+            env=environment,
+            capture_output=capture,
+            text=True,
+        )
+        if completed.returncode:
+            raise CommandError(
+                f"manage.py {arguments[0]} failed against {database}:\n"
+                f"{completed.stderr or ''}"
+            )
+        return json.loads(completed.stdout) if capture else None
+
+    def seed(self, size, data_dir):
+        """A database with about `size` duty statuses, seeded once and reused"""
+        data_dir.mkdir(parents=True, exist_ok=True)
+        database = data_dir / f"statuses-{size}.sqlite3"
+        ready = database.with_suffix(".ready")
+        if ready.exists():
+            # Seeded by an earlier commit: bring the schema up to date
+            self.run_child(database, ["migrate", "--verbosity=0"])
+            return database
+
+        database.unlink(missing_ok=True)
+        drivers = max(1, round(size / (STATUSES_PER_DRIVER_DAY * SEED_DAYS)))
+        self.stdout.write(f"Seeding {size:,} duty statuses ({drivers} drivers)...")
+        started = time.perf_counter()
+        self.run_child(database, ["migrate", "--verbosity=0"])
+        self.run_child(
+            database,
+            [
+                "simulate_fleet",
+                f"--drivers={drivers}",
+                f"--days={SEED_DAYS}",
+                "--prefix=bench",
+                "--seed=1",
+                "--verbosity=0",
+            ],
+        )
+        ready.write_text(f"{time.perf_counter() - started:.1f}\n")
+        return database
+
+    def measure(self, iterations, cases):
+        # Requests as the test client makes them, with production settings
+        setup_test_environment(debug=False)
+        return {
+            "database": connection.vendor,
+            "counts": {
+                "drivers": Driver.objects.count(),
+                "daily_logs": DailyLog.objects.count(),
+                "duty_statuses": DutyStatus.objects.count(),
+            },
+            "cases": run_benchmarks(iterations, cases),
+        }
+
+    def report(self, results):
+        for size, result in results["sizes"].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{size}"))
+            if "counts" in result:
+                self.stdout.write(
+                    ", ".join(
+                        f"{count:,} {name}" for name, count in result["counts"].items()
+                    )
+                )
+            for name, case in result["cases"].items():
+                if "error" in case:
+                    self.stdout.write(self.style.ERROR(f"  {name:<55} {case['error']}"))
+                    continue
+                line = f"  {name:<55} p50 {case['latency_ms']['p50']:>9.2f} ms"
+                line += f"  p99 {case['latency_ms']['p99']:>9.2f} ms"
+                if "queries" in case:
+                    line += f"  {case['queries']:>3} queries"
+                    line += f"  {case['peak_memory_kb']:>9,.0f} KiB"
+                if "cached_latency_ms" in case:
+                    line += f"  cached p50 {case['cached_latency_ms']['p50']:.2f} ms"
+                self.stdout.write(line)
+
+    def compare(self, before, after):
+        """Print the change in each metric and fail on regressions"""
+        regressions = []
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"\nCompared with {before['meta'].get('commit')}"
+            )
+        )
+        for size, result in after["sizes"].items():
+            earlier = before["sizes"].get(size, {}).get("cases", {})
+            for name, case in result["cases"].items():
+                if name not in earlier or "error" in earlier[name]:
+                    continue
+                if "error" in case:
+                    regressions.append(f"{size} {name} failed")
+                    continue
+                for metric, old, new in [
+                    (
+                        "p50",
+                        earlier[name]["latency_ms"]["p50"],
+                        case["latency_ms"]["p50"],
+                    ),
+                    ("queries", earlier[name].get("queries"), case.get("queries")),
+                    (
+                        "memory",
+                        earlier[name].get("peak_memory_kb"),
+                        case.get("peak_memory_kb"),
+                    ),
+                ]:
+                    if not old or new is None:
+                        continue
+                    change = (new - old) / old
+                    if change > REGRESSION_THRESHOLD:
+                        regressions.append(f"{size} {name} {metric}")
+                        style = self.style.ERROR
+                    elif change < -REGRESSION_THRESHOLD:
+                        style = self.style.SUCCESS
+                    else:
+                        continue
+                    self.stdout.write(
+                        style(
+                            f"  {size} {name} {metric}: {old} -> {new} ({change:+.0%})"
+                        )
+                    )
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regressions: {', '.join(regressions)}"
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.exports import FORMATS, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export duty statuses as CSV or NDJSON, like /api/exports/duty-statuses, "
+        "to a file or standard output"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--driver", type=int, dest="driver_id")
+        parser.add_argument(
+            "--start", type=date.fromisoformat, help="First day, YYYY-MM-DD"
+        )
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day")
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write (default: stdout)")
+
+    def handle(self, *args, driver_id, start, end, format, output, **options):
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end")
+        chunks = stream_export(
+            export_queryset(driver_id=driver_id, start=start, end=end), format
+        )
+
+        if not output:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(output, "w", newline="", encoding="utf-8") as file:
+            file.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f"Exported duty statuses to {output}"))
@@ -0,0 +1,159 @@
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.benchmarks import percentile
+
+# Read endpoints; {log} is replaced with daily log ids found on the server
+DEFAULT_PATHS = [
+    "/api/daily-logs?limit=50",
+    "/api/daily-logs/{log}",
+    "/api/daily-logs/{log}/duty-statuses",
+    "/api/daily-logs/{log}/grid",
+]
+WRITE_PATH = "/api/daily-logs/{log}/duty-statuses"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read endpoints of a running server and report requests "
+        "per second and latency percentiles. With --write, each request posts "
+        "a duty status instead, so run that against a test deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Server base URL, e.g. http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=20, help="Seconds")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request, {log} for a daily log id (can be repeated)",
+        )
+        parser.add_argument("--logs", type=int, default=50, help="Daily logs to use")
+        parser.add_argument(
+            "--write",
+            action="store_true",
+            help="POST single duty statuses to the daily logs instead of reading",
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, url, concurrency, duration, paths, logs, write, **options):
+        target = urlsplit(url)
+        default_paths = [WRITE_PATH] if write else DEFAULT_PATHS
+        paths = self.expand_paths(target, paths or default_paths, logs)
+        method = "POST" if write else "GET"
+
+        latencies = [[] for _ in range(concurrency)]
+        errors = [0] * concurrency
+        deadline = time.perf_counter() + duration
+
+        def worker(index):
+            # One keep-alive connection per client, as a browser would
+            connection = HTTPConnection(target.hostname, target.port, timeout=30)
+            request = index
+            while time.perf_counter() < deadline:
+                path = paths[request % len(paths)]
+                request += concurrency
+                started = time.perf_counter()
+                try:
+                    connection.request(method, path, **write_body(write))
+                    response = connection.getresponse()
+                    response.read()
+                except OSError:
+                    errors[index] += 1
+                    connection.close()
+                    continue
+                # 202: queued by the write-behind ingest
+                if response.status not in (200, 202):
+                    errors[index] += 1
+                latencies[index].append(time.perf_counter() - started)
+            connection.close()
+
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        samples = sorted(latency for worker in latencies for latency in worker)
+        result = {
+            "url": url,
+            "method": method,
+            "concurrency": concurrency,
+            "duration": round(elapsed, 2),
+            "requests": len(samples),
+            "errors": sum(errors),
+            "requests_per_second": round(len(samples) / elapsed, 1),
+            "latency_ms": {
+                "mean": round(statistics.fmean(samples) * 1000, 2) if samples else 0,
+                "p50": round(percentile(samples, 0.50) * 1000, 2),
+                "p95": round(percentile(samples, 0.95) * 1000, 2),
+                "p99": round(percentile(samples, 0.99) * 1000, 2),
+            },
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+            return
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"{result['requests']} requests in {result['duration']}s, "
+            f"{result['errors']} errors\n"
+            f"{result['requests_per_second']} requests/s\n"
+            f"latency ms: mean {latency['mean']}, p50 {latency['p50']}, "
+            f"p95 {latency['p95']}, p99 {latency['p99']}"
+        )
+
+    def expand_paths(self, target, paths, logs):
+        """Fill in {log} with the ids of the newest daily logs on the server"""
+        if not any("{log}" in path for path in paths):
+            return paths
+
+        connection = HTTPConnection(target.hostname, target.port, timeout=30)
+        try:
+            connection.request("GET", f"/api/daily-logs?limit={logs}")
+            response = connection.getresponse()
+            items = (
+                json.loads(response.read())["items"] if response.status == 200 else []
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Could not list daily logs: {error}")
+        finally:
+            connection.close()
+        if not items:
+            raise CommandError("The server has no daily logs to request")
+
+        return [
+            path.format(log=item["id"]) if "{log}" in path else path
+            for item in items
+            for path in paths
+        ]
+
+
+def write_body(write):
+    """Request arguments for a write: a duty status timestamped now"""
+    if not write:
+        return {}
+    return {
+        "body": json.dumps(
+            {
+                "duty_status": "on_duty",
+                "location_address": "Load test",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+        ),
+        "headers": {"Content-Type": "application/json"},
+    }
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from trips.cycle import refresh_cycle_snapshot
+from trips.mileage import rebuild_all_log_miles
+from trips.models import Driver
+from trips.totals import rebuild_all_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-day duty totals and per-log miles from the full "
+        "duty-status history"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--driver",
+            type=int,
+            action="append",
+            dest="driver_ids",
+            help="Only rebuild this driver (can be repeated)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, driver_ids=None, batch_size=1000, **options):
+        created = rebuild_all_totals(driver_ids=driver_ids, batch_size=batch_size)
+        logs = rebuild_all_log_miles(driver_ids=driver_ids, batch_size=batch_size)
+
+        drivers = Driver.objects.all()
+        if driver_ids:
+            drivers = drivers.filter(id__in=driver_ids)
+        for driver_id in drivers.values_list("id", flat=True).iterator():
+            refresh_cycle_snapshot(driver_id)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {created} daily totals and the miles of {logs} logs"
+            )
+        )
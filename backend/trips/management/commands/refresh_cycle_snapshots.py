@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trips.fleet import refresh_stale_cycles
+from trips.models import Driver
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the running cycle totals stored on drivers that are older "
+        "than trips.cycle.SNAPSHOT_MAX_AGE, so days leaving the 8-day cycle "
+        "are dropped; run it every few minutes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size=1000, **options):
+        now = timezone.now()
+        drivers = Driver.objects.order_by("id")
+        refreshed, last_id = 0, 0
+        while batch := list(drivers.filter(id__gt=last_id)[:batch_size]):
+            refreshed += refresh_stale_cycles(batch, now)
+            last_id = batch[-1].id
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed the cycle snapshots of {refreshed} drivers")
+        )
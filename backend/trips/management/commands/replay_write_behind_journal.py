@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trips.writebehind import recover_journals
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the duty statuses left in write-behind journals by server "
+        "processes that have stopped; statuses already stored are skipped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            default=settings.WRITE_BEHIND_DIR,
+            help="Journal directory (default: WRITE_BEHIND_DIR)",
+        )
+
+    def handle(self, *args, dir, **options):
+        replayed = recover_journals(dir)
+        self.stdout.write(
+            self.style.SUCCESS(f"Replayed {replayed} journaled duty statuses")
+        )
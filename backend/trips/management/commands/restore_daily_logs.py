@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.archive import BATCH_SIZE, restore_daily_logs
+from trips.models import ArchivedDailyLog
+
+
+def month(value):
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    help = "Move archived daily logs and their duty statuses back to the live tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            type=month,
+            action="append",
+            dest="months",
+            help="Restore the logs archived for this month, YYYY-MM (can be repeated)",
+        )
+        parser.add_argument(
+            "--log",
+            type=int,
+            action="append",
+            dest="daily_log_ids",
+            help="Restore this daily log (can be repeated)",
+        )
+        parser.add_argument(
+            "--segment",
+            type=int,
+            action="append",
+            dest="segment_ids",
+            help="Restore the logs of this archive segment (can be repeated)",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, months, daily_log_ids, segment_ids, batch_size, **options):
+        if not (months or daily_log_ids or segment_ids):
+            raise CommandError(
+                "Choose what to restore with --month, --log or --segment"
+            )
+
+        archived = ArchivedDailyLog.objects.none()
+        if months:
+            archived |= ArchivedDailyLog.objects.filter(segment__month__in=months)
+        if daily_log_ids:
+            archived |= ArchivedDailyLog.objects.filter(id__in=daily_log_ids)
+        if segment_ids:
+            archived |= ArchivedDailyLog.objects.filter(segment_id__in=segment_ids)
+
+        restored = restore_daily_logs(archived, batch_size=batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Restored {restored['logs']} daily logs and "
+                f"{restored['duty_statuses']} duty statuses"
+            )
+        )
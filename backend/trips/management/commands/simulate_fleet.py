@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from trips.simulator import simulate_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate drivers with HOS-compliant multi-day trips, for load tests "
+        "and benchmarks against realistic data volumes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drivers", type=int, default=10)
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument(
+            "--prefix",
+            default="sim",
+            help="Usernames and equipment numbers start with this (default: sim)",
+        )
+        parser.add_argument("--seed", type=int, help="Seed for repeatable data")
+        parser.add_argument(
+            "--end",
+            type=datetime.fromisoformat,
+            help="Simulate up to this ISO date and time (default: now)",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=50, help="Drivers per transaction"
+        )
+
+    def handle(self, *args, drivers, days, prefix, seed, end, chunk_size, **options):
+        if end and timezone.is_naive(end):
+            end = timezone.make_aware(end)
+
+        def progress(totals):
+            self.stdout.write(
+                f"{totals['drivers']}/{drivers} drivers, "
+                f"{totals['daily_logs']} daily logs, "
+                f"{totals['duty_statuses']} duty statuses"
+            )
+
+        try:
+            totals = simulate_fleet(
+                drivers,
+                days,
+                prefix=prefix,
+                seed=seed,
+                end=end,
+                chunk_size=chunk_size,
+                progress=progress if options["verbosity"] > 1 else None,
+            )
+        except ValueError as error:
+            raise CommandError(f"{error}; choose another --prefix")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Simulated {totals['drivers']} drivers over {days} days: "
+                f"{totals['daily_logs']} daily logs, {totals['duty_statuses']} "
+                f"duty statuses in {totals['seconds']}s"
+            )
+        )
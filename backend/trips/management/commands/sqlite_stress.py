@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.utils import ConnectionHandler, OperationalError
+
+from trip_tracker.database import sqlite_settings
+from trips.benchmarks import percentile
+
+SCHEMA = (
+    "CREATE TABLE events "
+    "(id INTEGER PRIMARY KEY, driver INTEGER NOT NULL, payload TEXT NOT NULL)"
+)
+WRITE = "INSERT INTO events (driver, payload) VALUES (?, ?)"
+READ = "SELECT count(*), max(id) FROM events WHERE driver = ?"
+
+
+def default_connection(path):
+    """A connection as configured before tuning: rollback journal, deferred"""
+    return sqlite3.connect(path, timeout=5, isolation_level=None)
+
+
+def tuned_connection(path):
+    """A connection through Django's backend, set up by the project's hook"""
+    connection = ConnectionHandler({"default": sqlite_settings(path)})["default"]
+    connection.ensure_connection()
+    return connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writers and readers against a scratch SQLite file, "
+        "with SQLite's defaults and with the project's tuning, and compare"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=10, help="Seconds")
+        parser.add_argument(
+            "--rows-per-write", type=int, default=200, help="Rows per transaction"
+        )
+
+    def handle(self, *args, **options):
+        for mode in ["default", "tuned"]:
+            result = self.run(mode, **options)
+            self.stdout.write(
+                f"{mode:>7}: {result['writes']} write transactions, "
+                f"{result['reads']} reads, {result['errors']} lock errors, "
+                f"read latency ms p50 {result['read_p50']}, "
+                f"p99 {result['read_p99']}, max {result['read_max']}"
+            )
+
+    def run(self, mode, writers, readers, duration, rows_per_write, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            return self.stress(
+                mode,
+                os.path.join(directory, "stress.sqlite3"),
+                writers,
+                readers,
+                duration,
+                rows_per_write,
+            )
+
+    def stress(self, mode, path, writers, readers, duration, rows_per_write):
+        def connect():
+            """A raw sqlite3 connection and how to close it"""
+            if mode == "default":
+                connection = default_connection(path)
+                return connection, connection.close
+            connection = tuned_connection(path)
+            return connection.connection, connection.close
+
+        connection, close = connect()
+        connection.execute(SCHEMA)
+        close()
+        counts = {"writes": 0, "reads": 0, "errors": 0}
+        read_latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def writer(index):
+            connection, close = connect()
+            payload = "x" * 200
+            while time.perf_counter() < deadline:
+                try:
+                    connection.execute(
+                        "BEGIN" if mode == "default" else "BEGIN IMMEDIATE"
+                    )
+                    connection.executemany(WRITE, [(index, payload)] * rows_per_write)
+                    connection.execute("COMMIT")
+                except (sqlite3.OperationalError, OperationalError):
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    with lock:
+                        counts["errors"] += 1
+                    continue
+                with lock:
+                    counts["writes"] += 1
+            close()
+
+        def reader(index):
+            connection, close = connect()
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection.execute(READ, (index % max(writers, 1),)).fetchone()
+                except (sqlite3.OperationalError, OperationalError):
+                    with lock:
+                        counts["errors"] += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    counts["reads"] += 1
+                    read_latencies.append(elapsed)
+            close()
+
+        threads = [
+            threading.Thread(target=writer, args=(index,)) for index in range(writers)
+        ] + [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        read_latencies.sort()
+        return {
+            **counts,
+            "read_p50": round(percentile(read_latencies, 0.50) * 1000, 2),
+            "read_p99": round(percentile(read_latencies, 0.99) * 1000, 2),
+            "read_max": round((read_latencies[-1] if read_latencies else 0) * 1000, 2),
+        }
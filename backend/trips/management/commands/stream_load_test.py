@@ -0,0 +1,227 @@
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trips.benchmarks import percentile
+
+DEFAULT_SUBSCRIBERS = "100,1000,5000"
+CHANNEL_PATHS = {
+    "fleet": "/api/fleet/duty-statuses/events",
+    "driver": "/api/drivers/{driver}/duty-statuses/events",
+    "log": "/api/daily-logs/{log}/duty-statuses/events",
+}
+# Connections opened at once
+CONNECT_BATCH = 200
+DELIVERY_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold increasing numbers of duty status event streams open against a "
+        "running server, write statuses and report how fast every stream gets "
+        "them. Each write is a status created and then deleted on the newest "
+        "daily log, so run it against a test deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Server base URL, e.g. http://127.0.0.1:8000")
+        parser.add_argument(
+            "--subscribers",
+            default=DEFAULT_SUBSCRIBERS,
+            help="Comma-separated numbers of open streams to measure at",
+        )
+        parser.add_argument("--channel", choices=CHANNEL_PATHS, default="fleet")
+        parser.add_argument("--writes", type=int, default=5, help="Per level")
+        parser.add_argument("--pid", type=int, help="Server process to report RSS of")
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, url, subscribers, channel, writes, pid, **options):
+        target = urlsplit(url)
+        levels = sorted(int(count) for count in subscribers.split(","))
+        log = self.newest_log(target)
+        path = CHANNEL_PATHS[channel].format(log=log["id"], driver=log["driver_id"])
+        results = asyncio.run(
+            StreamLoadTest(target, f"{path}?timeout=3600", log["id"], pid).run(
+                levels, writes
+            )
+        )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+            return
+        for result in results:
+            latency = result["delivery_ms"]
+            self.stdout.write(
+                f"{result['subscribers']} streams ({result['failed']} failed) "
+                f"opened in {result['connect_seconds']}s; "
+                f"{result['deliveries']} deliveries, {result['missed']} missed; "
+                f"delivery ms: p50 {latency['p50']}, p95 {latency['p95']}, "
+                f"max {latency['max']}"
+                + (f"; server RSS {result['rss_mb']} MB" if "rss_mb" in result else "")
+            )
+
+    def newest_log(self, target):
+        connection = HTTPConnection(target.hostname, target.port, timeout=30)
+        try:
+            connection.request("GET", "/api/daily-logs?limit=1")
+            response = connection.getresponse()
+            items = json.loads(response.read())["items"]
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Could not list daily logs: {error}")
+        finally:
+            connection.close()
+        if not items:
+            raise CommandError("The server has no daily logs to write to")
+        return items[0]
+
+
+class StreamLoadTest:
+    def __init__(self, target, path, daily_log_id, pid):
+        self.target = target
+        self.path = path
+        self.daily_log_id = daily_log_id
+        self.pid = pid
+        self.readers = []
+        self.arrivals = []
+        self.expected = 0
+        self.delivered = None
+
+    async def run(self, levels, writes):
+        results = []
+        try:
+            for level in levels:
+                started = time.perf_counter()
+                failed = 0
+                while len(self.readers) + failed < level:
+                    batch = min(CONNECT_BATCH, level - len(self.readers) - failed)
+                    opened = await asyncio.gather(
+                        *(self.subscribe() for _ in range(batch)),
+                        return_exceptions=True,
+                    )
+                    failed += sum(isinstance(reader, Exception) for reader in opened)
+                connect_seconds = time.perf_counter() - started
+
+                latencies, missed = [], 0
+                for _ in range(writes):
+                    for write in (self.create_status, self.delete_status):
+                        received = await self.measure(write)
+                        latencies.extend(received)
+                        missed += self.expected - len(received)
+                latencies.sort()
+                result = {
+                    "subscribers": len(self.readers),
+                    "failed": failed,
+                    "connect_seconds": round(connect_seconds, 2),
+                    "deliveries": len(latencies),
+                    "missed": missed,
+                    "delivery_ms": {
+                        "mean": (
+                            round(statistics.fmean(latencies) * 1000, 1)
+                            if latencies
+                            else 0
+                        ),
+                        "p50": round(percentile(latencies, 0.50) * 1000, 1),
+                        "p95": round(percentile(latencies, 0.95) * 1000, 1),
+                        "max": round(latencies[-1] * 1000, 1) if latencies else 0,
+                    },
+                }
+                if self.pid:
+                    result["rss_mb"] = resident_mb(self.pid)
+                results.append(result)
+        finally:
+            for reader in self.readers:
+                reader.cancel()
+            await asyncio.gather(*self.readers, return_exceptions=True)
+        return results
+
+    async def subscribe(self):
+        """Open a stream and start reading it once it has connected"""
+        reader, writer = await asyncio.open_connection(
+            self.target.hostname, self.target.port
+        )
+        # HTTP/1.0, so the stream is not chunked
+        writer.write(
+            f"GET {self.path} HTTP/1.0\r\nHost: {self.target.netloc}\r\n"
+            "Accept: text/event-stream\r\n\r\n".encode()
+        )
+        status = await reader.readline()
+        if b" 200 " not in status:
+            writer.close()
+            raise ConnectionError(status.decode(errors="replace").strip())
+        while (await reader.readline()).strip() != b": connected":
+            pass
+        task = asyncio.create_task(self.read(reader, writer))
+        self.readers.append(task)
+        return task
+
+    async def read(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if line.startswith(b"event: duty_status"):
+                    self.arrivals.append(time.perf_counter())
+                    if len(self.arrivals) == self.expected:
+                        self.delivered.set()
+        finally:
+            writer.close()
+
+    async def measure(self, write):
+        """Seconds from sending `write` until each open stream had its event"""
+        self.arrivals = []
+        self.expected = sum(not reader.done() for reader in self.readers)
+        self.delivered = asyncio.Event()
+        started = time.perf_counter()
+        await asyncio.to_thread(write)
+        try:
+            await asyncio.wait_for(self.delivered.wait(), DELIVERY_TIMEOUT)
+        except TimeoutError:
+            pass
+        return [arrival - started for arrival in self.arrivals]
+
+    def request(self, method, path, body=None):
+        connection = HTTPConnection(self.target.hostname, self.target.port, timeout=30)
+        try:
+            connection.request(
+                method,
+                path,
+                body=json.dumps(body) if body is not None else None,
+                headers={"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+            content = response.read()
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise CommandError(f"{method} {path} returned {response.status}")
+        return json.loads(content)
+
+    def create_status(self):
+        self.status_id = self.request(
+            "POST",
+            f"/api/daily-logs/{self.daily_log_id}/duty-statuses",
+            {
+                "duty_status": "on_duty",
+                "location_address": "Stream load test",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            },
+        )["id"]
+
+    def delete_status(self):
+        self.request("DELETE", f"/api/duty-statuses/{self.status_id}")
+
+
+def resident_mb(pid):
+    """Resident memory of a process in MB, from /proc (Linux)"""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
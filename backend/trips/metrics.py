@@ -0,0 +1,313 @@
+"""
+Per-route request metrics, exposed in the Prometheus text format.
+
+metrics_middleware times every API request and records, under its route
+("GET /api/daily-logs/{daily_log_id}"): wall time, the number of SQL queries
+and the time spent in them, serialization time (validating and rendering what
+the view returned) and response size. Each is a histogram kept in this
+process, cumulative since it started, as Prometheus expects; rates and
+quantiles over a window come from the scraper. With several server workers
+each keeps its own, so scrape them individually.
+
+Queries are counted by a wrapper on every database connection (installed in
+trips.signals); the request they belong to travels in a context variable,
+which follows async views into the threads their queries run in.
+
+Setting PROFILE_SLOW_REQUESTS (seconds) profiles a sample of requests with
+cProfile and writes the profile of each one slower than that to PROFILE_DIR.
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from asgiref.sync import iscoroutinefunction
+from ninja.renderers import JSONRenderer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SERIALIZATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = tuple(256 * 4**power for power in range(8))
+
+HISTOGRAMS = {
+    "request_duration_seconds": ("Request wall time", DURATION_BUCKETS),
+    "db_queries": ("SQL queries per request", QUERY_BUCKETS),
+    "db_duration_seconds": ("Time spent in SQL queries", DURATION_BUCKETS),
+    "serialization_duration_seconds": (
+        "Time validating and rendering what the view returned",
+        SERIALIZATION_BUCKETS,
+    ),
+    "response_size_bytes": ("Response body size", SIZE_BUCKETS),
+}
+PREFIX = "trip_tracker_http_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_request = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "query_seconds", "view_finished", "rendered")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.view_finished = None
+        self.rendered = None
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        self.counts[bisect_left(buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Request counts and histograms by (method, route)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.histograms = {}
+
+    def record(self, method, route, status, observations):
+        with self._lock:
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in observations.items():
+                histogram = self.histograms.setdefault(
+                    (name, method, route), Histogram(HISTOGRAMS[name][1])
+                )
+                histogram.observe(HISTOGRAMS[name][1], value)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = sorted(self.requests.items())
+            histograms = {
+                key: (list(histogram.counts), histogram.total, histogram.count)
+                for key, histogram in self.histograms.items()
+            }
+
+        lines = [
+            f"# HELP {PREFIX}requests_total Requests by route and status",
+            f"# TYPE {PREFIX}requests_total counter",
+        ]
+        for (method, route, status), count in requests:
+            labels = _labels(method=method, route=route, status=status)
+            lines.append(f"{PREFIX}requests_total{{{labels}}} {count}")
+
+        for name, (description, buckets) in HISTOGRAMS.items():
+            lines.append(f"# HELP {PREFIX}{name} {description}")
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for (metric, method, route), (counts, total, count) in sorted(
+                histograms.items()
+            ):
+                if metric != name:
+                    continue
+                labels = _labels(method=method, route=route)
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f'{PREFIX}{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"{PREFIX}{name}_sum{{{labels}}} {total:.6f}")
+                lines.append(f"{PREFIX}{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting the current request's queries"""
+    metrics = _request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.query_seconds += time.perf_counter() - started
+
+
+def instrument_views(router):
+    """Note when each of a ninja router's views returns, to time serialization"""
+    for path_view in router.path_operations.values():
+        for operation in path_view.operations:
+            operation.view_func = _timed_view(operation.view_func)
+
+
+def _mark(attribute):
+    metrics = _request.get()
+    if metrics is not None:
+        setattr(metrics, attribute, time.perf_counter())
+
+
+class MeteredRenderer(JSONRenderer):
+    """ninja's JSON renderer, noting when a response has been rendered"""
+
+    def render(self, request, data, *, response_status):
+        try:
+            return super().render(request, data, response_status=response_status)
+        finally:
+            _mark("rendered")
+
+
+def _timed_view(view_func):
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_view(request, **kwargs):
+            try:
+                return await view_func(request, **kwargs)
+            finally:
+                _mark("view_finished")
+
+        return async_view
+
+    @wraps(view_func)
+    def view(request, **kwargs):
+        try:
+            return view_func(request, **kwargs)
+        finally:
+            _mark("view_finished")
+
+    return view
+
+
+def _route(request):
+    """The route of an API request, like /api/daily-logs/{daily_log_id}"""
+    match = request.resolver_match
+    if match is None or not match.route.startswith("api/"):
+        return None
+    return "/" + re.sub(r"<(?:\w+:)?(\w+)>", r"{\1}", match.route)
+
+
+def _observe(request, response, metrics, started, finished):
+    route = _route(request)
+    if route is None or route == "/api/metrics":
+        return
+    observations = {
+        "request_duration_seconds": finished - started,
+        "db_queries": metrics.queries,
+        "db_duration_seconds": metrics.query_seconds,
+    }
+    # Views returning an HttpResponse render it themselves
+    if metrics.view_finished is not None and metrics.rendered is not None:
+        observations["serialization_duration_seconds"] = (
+            metrics.rendered - metrics.view_finished
+        )
+    if not response.streaming:
+        observations["response_size_bytes"] = len(response.content)
+    registry.record(request.method, route, response.status_code, observations)
+
+
+_profiling = threading.Lock()
+
+
+def _start_profile():
+    """A running profiler for a sampled request, or None"""
+    threshold = getattr(settings, "PROFILE_SLOW_REQUESTS", None)
+    if threshold is None or random.random() >= settings.PROFILE_SAMPLE_RATE:
+        return None
+    # One profile at a time: the profiler sees every thread of the process
+    if not _profiling.acquire(blocking=False):
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler (a debugger, coverage) is active
+        _profiling.release()
+        return None
+    return profile
+
+
+def _finish_profile(profile, request, seconds):
+    try:
+        profile.disable()
+        if seconds < settings.PROFILE_SLOW_REQUESTS:
+            return
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        route = (_route(request) or request.path).strip("/")
+        name = re.sub(r"[^\w-]+", "-", f"{request.method}-{route}")
+        profile.dump_stats(
+            os.path.join(
+                settings.PROFILE_DIR,
+                f"{time.strftime('%Y%m%dT%H%M%S')}-{name}-{seconds * 1000:.0f}ms.prof",
+            )
+        )
+    finally:
+        _profiling.release()
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Record per-route metrics, and profile sampled slow requests"""
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            metrics = RequestMetrics()
+            token = _request.set(metrics)
+            profile = _start_profile()
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                finished = time.perf_counter()
+                _request.reset(token)
+                if profile:
+                    _finish_profile(profile, request, finished - started)
+            _observe(request, response, metrics, started, finished)
+            return response
+
+        return async_middleware
+
+    def middleware(request):
+        metrics = RequestMetrics()
+        token = _request.set(metrics)
+        profile = _start_profile()
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            finished = time.perf_counter()
+            _request.reset(token)
+            if profile:
+                _finish_profile(profile, request, finished - started)
+        _observe(request, response, metrics, started, finished)
+        return response
+
+    return middleware
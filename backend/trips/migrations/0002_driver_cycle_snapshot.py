@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="driver",
+            name="cycle_computed_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="cycle_seconds",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="driver",
+            name="cycle_status",
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+    ]
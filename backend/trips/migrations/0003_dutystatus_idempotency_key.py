@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0002_driver_cycle_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dutystatus",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0003_dutystatus_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyDutyTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("off_duty_minutes", models.FloatField(default=0)),
+                ("sleeper_berth_minutes", models.FloatField(default=0)),
+                ("driving_minutes", models.FloatField(default=0)),
+                ("on_duty_minutes", models.FloatField(default=0)),
+                (
+                    "miles",
+                    models.DecimalField(
+                        blank=True, decimal_places=1, max_digits=8, null=True
+                    ),
+                ),
+                (
+                    "first_status",
+                    models.CharField(
+                        choices=[
+                            ("off_duty", "Off Duty"),
+                            ("sleeper_berth", "Sleeper Berth"),
+                            ("driving", "Driving"),
+                            ("on_duty", "On Duty"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "last_status",
+                    models.CharField(
+                        choices=[
+                            ("off_duty", "Off Duty"),
+                            ("sleeper_berth", "Sleeper Berth"),
+                            ("driving", "Driving"),
+                            ("on_duty", "On Duty"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("last_status_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_totals",
+                        to="trips.driver",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("driver", "day"), name="unique_daily_duty_total"
+                    )
+                ],
+            },
+        ),
+    ]
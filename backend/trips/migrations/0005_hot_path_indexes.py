@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0004_dailydutytotal"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="dailydutytotal",
+            index=models.Index(fields=["day", "driver"], name="dailytotal_day_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dailylog",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="dailylog_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailylog",
+            index=models.Index(
+                fields=["driver", "-created_at", "-id"],
+                name="dailylog_driver_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailylog",
+            index=models.Index(
+                fields=["truck", "-created_at", "-id"],
+                name="dailylog_truck_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dutystatus",
+            index=models.Index(
+                fields=["daily_log", "timestamp"], name="dutystatus_log_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dutystatus",
+            index=models.Index(fields=["timestamp"], name="dutystatus_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dutystatus",
+            index=models.Index(
+                fields=["duty_status", "timestamp"], name="dutystatus_status_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from trips.geo import encode
+
+
+def populate_positions(apps, schema_editor):
+    DutyStatus = apps.get_model("trips", "DutyStatus")
+    DriverPosition = apps.get_model("trips", "DriverPosition")
+    Driver = apps.get_model("trips", "Driver")
+    located = DutyStatus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    latest_ids = Driver.objects.annotate(
+        latest=Subquery(
+            located.filter(daily_log__driver_id=OuterRef("pk"))
+            .order_by("-timestamp", "-id")
+            .values("id")[:1]
+        )
+    ).values("latest")
+    DriverPosition.objects.bulk_create(
+        (
+            DriverPosition(
+                driver_id=driver_id,
+                latitude=float(latitude),
+                longitude=float(longitude),
+                geohash=encode(float(latitude), float(longitude)),
+                duty_status=duty_status,
+                location_address=location_address,
+                timestamp=timestamp,
+            )
+            for driver_id, latitude, longitude, duty_status, location_address, timestamp in (
+                DutyStatus.objects.filter(id__in=latest_ids)
+                .values_list(
+                    "daily_log__driver_id",
+                    "latitude",
+                    "longitude",
+                    "duty_status",
+                    "location_address",
+                    "timestamp",
+                )
+                .iterator()
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0005_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriverPosition",
+            fields=[
+                (
+                    "driver",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="position",
+                        serialize=False,
+                        to="trips.driver",
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("geohash", models.CharField(db_index=True, max_length=12)),
+                (
+                    "duty_status",
+                    models.CharField(
+                        choices=[
+                            ("off_duty", "Off Duty"),
+                            ("sleeper_berth", "Sleeper Berth"),
+                            ("driving", "Driving"),
+                            ("on_duty", "On Duty"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("location_address", models.TextField()),
+                ("timestamp", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0006_driverposition"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailylog",
+            name="miles",
+            field=models.DecimalField(
+                decimal_places=1, default=0, editable=False, max_digits=8
+            ),
+        ),
+    ]
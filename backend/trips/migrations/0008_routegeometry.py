@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0007_dailylog_miles"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteGeometry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=40, unique=True)),
+                ("provider", models.CharField(max_length=100)),
+                ("waypoints", models.TextField()),
+                ("polyline", models.TextField()),
+                ("distance_km", models.FloatField()),
+                ("duration_hours", models.FloatField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_used_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
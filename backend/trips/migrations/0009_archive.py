@@ -0,0 +1,110 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trips", "0008_routegeometry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchiveSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("logs", models.PositiveIntegerField(default=0)),
+                ("duty_statuses", models.PositiveIntegerField(default=0)),
+                ("raw_bytes", models.PositiveBigIntegerField(default=0)),
+                ("stored_bytes", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["month"], name="archivesegment_month_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedDailyLog",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("planning", "Planning"),
+                            ("active", "Active"),
+                            ("completed", "Completed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "miles",
+                    models.DecimalField(decimal_places=1, default=0, max_digits=8),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("duty_status_count", models.PositiveIntegerField()),
+                ("duty_statuses", models.BinaryField()),
+                (
+                    "co_driver",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="trips.driver",
+                    ),
+                ),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_daily_logs",
+                        to="trips.driver",
+                    ),
+                ),
+                (
+                    "trailer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="trips.trailer"
+                    ),
+                ),
+                (
+                    "truck",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="trips.truck"
+                    ),
+                ),
+                (
+                    "segment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="daily_logs",
+                        to="trips.archivesegment",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["driver", "created_at"], name="archivedlog_driver_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,176 @@
+"""
+Miles driven, from the coordinates of consecutive duty statuses.
+
+A driving status lasts until the driver's next status, and the distance
+between their coordinates is the leg driven. ELDs record a location at least
+every hour while driving, so consecutive fixes follow the road closely
+enough for the log's "total miles driving today". A leg with a missing
+coordinate counts as zero.
+
+Legs are measured over a driver's statuses at once: their coordinates are
+converted to radians, with each latitude's cosine, in one pass over the
+arrays, and every leg is then a haversine over neighbouring entries.
+
+Per-day miles are kept in DailyDutyTotal (see trips.totals, which spreads a
+leg over the days it spans); per-log miles in DailyLog.miles, each leg
+counted on the log of the driving status that starts it.
+"""
+
+import math
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .geo import EARTH_RADIUS_KM
+from .models import DailyLog, DutyStatus
+
+KM_PER_MILE = 1.609344
+EARTH_RADIUS_MILES = EARTH_RADIUS_KM / KM_PER_MILE
+MILES_PLACES = Decimal("0.1")
+
+EVENT_FIELDS = ("daily_log_id", "timestamp", "duty_status", "latitude", "longitude")
+
+
+def leg_miles(latitudes, longitudes):
+    """
+    Great-circle miles from each point to the next: one fewer value than
+    points, None where either end has no coordinates
+    """
+    radians = [
+        None if lat is None or lon is None else (math.radians(lat), math.radians(lon))
+        for lat, lon in zip(latitudes, longitudes)
+    ]
+    cosines = [None if point is None else math.cos(point[0]) for point in radians]
+    legs = []
+    for index in range(len(radians) - 1):
+        start, end = radians[index], radians[index + 1]
+        if start is None or end is None:
+            legs.append(None)
+            continue
+        a = (
+            math.sin((end[0] - start[0]) / 2) ** 2
+            + cosines[index]
+            * cosines[index + 1]
+            * math.sin((end[1] - start[1]) / 2) ** 2
+        )
+        legs.append(2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a))))
+    return legs
+
+
+def driving_miles(statuses, latitudes, longitudes):
+    """
+    Miles driven from each status until the next, for statuses in time
+    order; 0 for statuses that are not driving, and for the last, still open
+    """
+    if not statuses:
+        return []
+    legs = leg_miles(latitudes, longitudes)
+    miles = [
+        (leg or 0.0) if status == "driving" else 0.0
+        for status, leg in zip(statuses, legs)
+    ]
+    return miles + [0.0]
+
+
+def _coordinate(value):
+    return None if value is None else float(value)
+
+
+def miles_by_log(events):
+    """
+    Miles per daily log from one driver's (daily_log_id, timestamp,
+    duty_status, latitude, longitude) events in time order
+    """
+    events = list(events)
+    miles = driving_miles(
+        [event[2] for event in events],
+        [_coordinate(event[3]) for event in events],
+        [_coordinate(event[4]) for event in events],
+    )
+    totals = {}
+    for event, leg in zip(events, miles):
+        totals[event[0]] = totals.get(event[0], 0.0) + leg
+    return totals
+
+
+def _store(totals):
+    """Save per-log miles; returns the ids of logs whose miles changed"""
+    totals = {
+        daily_log_id: Decimal(miles).quantize(MILES_PLACES)
+        for daily_log_id, miles in totals.items()
+    }
+    changed = [
+        DailyLog(id=daily_log_id, miles=totals[daily_log_id])
+        for daily_log_id, stored in DailyLog.objects.filter(id__in=totals).values_list(
+            "id", "miles"
+        )
+        if stored != totals[daily_log_id]
+    ]
+    DailyLog.objects.bulk_update(changed, ["miles"], batch_size=1000)
+    return {daily_log.id for daily_log in changed}
+
+
+def refresh_log_miles(driver_id, timestamps, daily_log_ids):
+    """
+    Recompute the miles of a driver's logs after statuses were added, moved
+    or removed at `timestamps` in `daily_log_ids`; returns the ids of logs
+    whose miles changed
+    """
+    statuses = (
+        DutyStatus.objects.filter(daily_log__driver_id=driver_id)
+        .order_by("timestamp", "id")
+        .values_list(*EVENT_FIELDS)
+    )
+    earliest, latest = min(timestamps), max(timestamps)
+    # The leg of the status before a change ends somewhere else now
+    before = statuses.filter(timestamp__lt=earliest).last()
+    affected = set(daily_log_ids) | set(
+        statuses.filter(
+            timestamp__gte=before[1] if before else earliest, timestamp__lte=latest
+        ).values_list("daily_log_id", flat=True)
+    )
+
+    # Every status of the affected logs, and the one closing the last leg
+    bounds = DutyStatus.objects.filter(daily_log_id__in=affected).aggregate(
+        first=Min("timestamp"), last=Max("timestamp")
+    )
+    totals = dict.fromkeys(affected, 0.0)
+    if bounds["first"]:
+        events = list(
+            statuses.filter(
+                timestamp__gte=bounds["first"], timestamp__lte=bounds["last"]
+            )
+        )
+        closing = statuses.filter(timestamp__gt=bounds["last"]).first()
+        if closing:
+            events.append(closing)
+        for daily_log_id, miles in miles_by_log(events).items():
+            if daily_log_id in affected:
+                totals[daily_log_id] = miles
+    return _store(totals)
+
+
+def rebuild_all_log_miles(driver_ids=None, batch_size=1000):
+    """Recompute every log's miles from the full history; returns log count"""
+    statuses = DutyStatus.objects.all()
+    if driver_ids is not None:
+        statuses = statuses.filter(daily_log__driver_id__in=driver_ids)
+    rows = (
+        statuses.order_by("daily_log__driver_id", "timestamp", "id")
+        .values_list("daily_log__driver_id", *EVENT_FIELDS)
+        .iterator(chunk_size=10000)
+    )
+    updated = 0
+    with transaction.atomic():
+        pending = {}
+        for _, driver_rows in groupby(rows, key=lambda row: row[0]):
+            pending.update(miles_by_log(row[1:] for row in driver_rows))
+            if len(pending) >= batch_size:
+                _store(pending)
+                updated += len(pending)
+                pending = {}
+        _store(pending)
+        updated += len(pending)
+    return updated
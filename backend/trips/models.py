@@ -7,6 +7,13 @@ class Driver(models.Model):
     license_number = models.CharField(max_length=50, unique=True)
     phone = models.CharField(max_length=20)
     address = models.TextField()
+
+    # Running 70-hour/8-day total, refreshed whenever the driver's duty
+    # statuses change (see trips.cycle)
+    cycle_seconds = models.PositiveIntegerField(default=0, editable=False)
+    cycle_status = models.CharField(max_length=20, blank=True, editable=False)
+    cycle_computed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -14,38 +21,16 @@ class Driver(models.Model):
         return f"{self.user.get_full_name()} - {self.license_number}"
 
     def get_current_cycle_hours(self):
-        """Calculate current cycle hours from TripLog entries in the last 8 days"""
-        from datetime import timedelta
-
-        from django.utils import timezone
-
-        # Get logs from last 8 days
-        eight_days_ago = timezone.now() - timedelta(days=8)
-
-        # Get all driving logs for this driver
-        driving_logs = DutyStatus.objects.filter(
-            daily_log__driver=self,
-            duty_status="driving",
-            timestamp__gte=eight_days_ago,
-        ).order_by("timestamp")
+        """Get on-duty and driving hours in the current 8-day cycle"""
+        from .cycle import current_cycle_seconds
 
-        total_hours = 0
-        driving_start_time = None
-
-        for log in driving_logs:
-            if driving_start_time is None:
-                driving_start_time = log.timestamp
-            else:
-                # Calculate hours between start and this log entry
-                duration = log.timestamp - driving_start_time
-                total_hours += duration.total_seconds() / 3600  # Convert to hours
-                driving_start_time = None
-
-        return round(total_hours, 2)
+        return round(current_cycle_seconds(self) / 3600, 2)
 
     def get_remaining_hours(self):
         """Get remaining hours (70 - current_cycle_hours)"""
-        return max(0, 70 - self.get_current_cycle_hours())
+        from .cycle import CYCLE_LIMIT_HOURS
+
+        return max(0, CYCLE_LIMIT_HOURS - self.get_current_cycle_hours())
 
 
 class Truck(models.Model):
@@ -101,9 +86,28 @@ class DailyLog(models.Model):
     trailer = models.ForeignKey(Trailer, on_delete=models.CASCADE)
 
     status = models.CharField(max_length=20, choices=LOG_STATUS, default="planning")
+    # Miles driven on this log, refreshed whenever its duty statuses change
+    # (see trips.mileage)
+    miles = models.DecimalField(
+        max_digits=8, decimal_places=1, default=0, editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Newest-first listing and its keyset pagination
+            models.Index(fields=["-created_at", "-id"], name="dailylog_created_idx"),
+            models.Index(
+                fields=["driver", "-created_at", "-id"],
+                name="dailylog_driver_created_idx",
+            ),
+            models.Index(
+                fields=["truck", "-created_at", "-id"],
+                name="dailylog_truck_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Daily Log {self.id} - {self.driver}"
 
@@ -130,10 +134,175 @@ class DutyStatus(models.Model):
 
     timestamp = models.DateTimeField()
     notes = models.TextField(blank=True)
+
+    # Client-supplied key so replayed device events are only stored once
+    idempotency_key = models.CharField(
+        max_length=64, unique=True, null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["timestamp"]
+        indexes = [
+            # A log's (and, through the log, a driver's) statuses in time order
+            models.Index(
+                fields=["daily_log", "timestamp"], name="dutystatus_log_time_idx"
+            ),
+            # Fleet-wide time ranges, with or without a status filter
+            models.Index(fields=["timestamp"], name="dutystatus_time_idx"),
+            models.Index(
+                fields=["duty_status", "timestamp"], name="dutystatus_status_time_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.daily_log} - {self.get_duty_status_display()} at {self.timestamp}"
+
+
+class DailyDutyTotal(models.Model):
+    """Time per duty status for one driver on one calendar day.
+
+    Maintained from the driver's duty statuses (see trips.totals). Only spans
+    closed by a later status are counted; the driver's current status is
+    recorded in last_status/last_status_at so readers can add its open time.
+    """
+
+    driver = models.ForeignKey(
+        Driver, on_delete=models.CASCADE, related_name="daily_totals"
+    )
+    day = models.DateField()
+
+    off_duty_minutes = models.FloatField(default=0)
+    sleeper_berth_minutes = models.FloatField(default=0)
+    driving_minutes = models.FloatField(default=0)
+    on_duty_minutes = models.FloatField(default=0)
+    miles = models.DecimalField(max_digits=8, decimal_places=1, null=True, blank=True)
+
+    first_status = models.CharField(max_length=20, choices=DutyStatus.DUTY_STATUSES)
+    last_status = models.CharField(max_length=20, choices=DutyStatus.DUTY_STATUSES)
+    last_status_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["driver", "day"], name="unique_daily_duty_total"
+            )
+        ]
+        indexes = [models.Index(fields=["day", "driver"], name="dailytotal_day_idx")]
+
+    def __str__(self):
+        return f"{self.driver} - {self.day}"
+
+
+class DriverPosition(models.Model):
+    """A driver's last known position, from their latest located duty status.
+
+    Maintained from the driver's duty statuses (see trips.positions). The
+    geohash index answers area searches; see trips.geo.
+    """
+
+    driver = models.OneToOneField(
+        Driver, on_delete=models.CASCADE, primary_key=True, related_name="position"
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    geohash = models.CharField(max_length=12, db_index=True)
+
+    duty_status = models.CharField(max_length=20, choices=DutyStatus.DUTY_STATUSES)
+    location_address = models.TextField()
+    timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.driver} at {self.latitude}, {self.longitude}"
+
+
+class RouteGeometry(models.Model):
+    """A provider's road route through some waypoints (see trips.routing)"""
+
+    # Hash of the provider and the rounded waypoints
+    key = models.CharField(max_length=40, unique=True)
+    provider = models.CharField(max_length=100)
+    waypoints = models.TextField()
+    # Encoded polyline of the route's points
+    polyline = models.TextField()
+    distance_km = models.FloatField()
+    duration_hours = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Least recently used entries are evicted first
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.provider} route through {self.waypoints}"
+
+
+class ArchiveSegment(models.Model):
+    """Manifest entry for one month of daily logs moved by one archive run.
+
+    The logs themselves are ArchivedDailyLog rows; see trips.archive.
+    """
+
+    month = models.DateField()
+    logs = models.PositiveIntegerField(default=0)
+    duty_statuses = models.PositiveIntegerField(default=0)
+    # JSON size of the archived statuses, and their size compressed
+    raw_bytes = models.PositiveBigIntegerField(default=0)
+    stored_bytes = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["month"], name="archivesegment_month_idx")]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.logs} logs, {self.duty_statuses} statuses"
+
+
+class ArchivedDailyLog(models.Model):
+    """A daily log moved out of the live tables, its statuses compressed.
+
+    Keeps the log's id and columns, so it reads like the live log it was and
+    can be restored as it was (see trips.archive).
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    segment = models.ForeignKey(
+        ArchiveSegment, on_delete=models.PROTECT, related_name="daily_logs"
+    )
+    driver = models.ForeignKey(
+        Driver, on_delete=models.CASCADE, related_name="archived_daily_logs"
+    )
+    co_driver = models.ForeignKey(
+        Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    truck = models.ForeignKey(Truck, on_delete=models.CASCADE)
+    trailer = models.ForeignKey(Trailer, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=DailyLog.LOG_STATUS)
+    miles = models.DecimalField(max_digits=8, decimal_places=1, default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    duty_status_count = models.PositiveIntegerField()
+    # zlib-compressed JSON of the statuses, column by column
+    duty_statuses = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["driver", "created_at"], name="archivedlog_driver_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"Archived daily log {self.id} - {self.driver_id}"
+
+
+class RevokedToken(models.Model):
+    """An API token revoked before its expiry (see trips.tokens)"""
+
+    token_id = models.CharField(max_length=32, unique=True)
+    # Rows are only needed until the token would have expired
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Revoked token {self.token_id}"
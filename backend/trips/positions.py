@@ -0,0 +1,181 @@
+"""
+Last known driver positions (trips.models.DriverPosition) and area searches.
+
+A driver's position is their latest duty status with coordinates, refreshed
+whenever their statuses change. Searches cover the area with geohash cells
+(see trips.geo), select the positions in those cells and the area's bounding
+box through the geohash index, and keep those within the exact distance.
+"""
+
+import math
+from datetime import timedelta
+
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import geo
+from .models import Driver, DriverPosition, DutyStatus
+
+POSITION_FIELDS = (
+    "driver_id",
+    "driver__user__first_name",
+    "driver__user__last_name",
+    "driver__user__username",
+    "latitude",
+    "longitude",
+    "duty_status",
+    "location_address",
+    "timestamp",
+)
+# Nearest-driver searches start with this radius and double it until enough
+# drivers are found
+NEAREST_START_KM = 25.0
+# Half the circumference: every point on Earth
+MAX_DISTANCE_KM = math.pi * geo.EARTH_RADIUS_KM
+
+
+def refresh_positions(driver_ids):
+    """Store the latest located status of each driver as their position"""
+    driver_ids = set(driver_ids)
+    if not driver_ids:
+        return
+    located = DutyStatus.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    latest_ids = (
+        Driver.objects.filter(id__in=driver_ids)
+        .annotate(
+            latest=Subquery(
+                located.filter(daily_log__driver_id=OuterRef("pk"))
+                .order_by("-timestamp", "-id")
+                .values("id")[:1]
+            )
+        )
+        .values("latest")
+    )
+    latest = DutyStatus.objects.filter(id__in=latest_ids).values_list(
+        "daily_log__driver_id",
+        "latitude",
+        "longitude",
+        "duty_status",
+        "location_address",
+        "timestamp",
+    )
+    positions = [
+        DriverPosition(
+            driver_id=driver_id,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            geohash=geo.encode(float(latitude), float(longitude)),
+            duty_status=duty_status,
+            location_address=address,
+            timestamp=timestamp,
+        )
+        for driver_id, latitude, longitude, duty_status, address, timestamp in latest
+    ]
+    DriverPosition.objects.bulk_create(
+        positions,
+        update_conflicts=True,
+        unique_fields=["driver"],
+        update_fields=[
+            "latitude",
+            "longitude",
+            "geohash",
+            "duty_status",
+            "location_address",
+            "timestamp",
+            "updated_at",
+        ],
+    )
+    # Drivers whose last located status was removed
+    DriverPosition.objects.filter(driver_id__in=driver_ids).exclude(
+        driver_id__in=[position.driver_id for position in positions]
+    ).delete()
+
+
+def _in_boxes(search_boxes, max_age=None, now=None):
+    """Positions in the boxes, as dicts, selected through the geohash index"""
+    cells = Q()
+    for start, stop in geo.prefix_ranges(geo.covering_cells(search_boxes)):
+        cells |= Q(geohash__gte=start, geohash__lt=stop)
+    bounds = Q()
+    for south, west, north, east in search_boxes:
+        bounds |= Q(
+            latitude__gte=south,
+            latitude__lte=north,
+            longitude__gte=west,
+            longitude__lte=east,
+        )
+    positions = DriverPosition.objects.filter(cells).filter(bounds)
+    if max_age is not None:
+        positions = positions.filter(timestamp__gte=(now or timezone.now()) - max_age)
+    for row in positions.values_list(*POSITION_FIELDS).iterator(chunk_size=2000):
+        (
+            driver_id,
+            first_name,
+            last_name,
+            username,
+            latitude,
+            longitude,
+            duty_status,
+            location_address,
+            timestamp,
+        ) = row
+        yield {
+            "driver_id": driver_id,
+            "name": f"{first_name} {last_name}".strip() or username,
+            "latitude": latitude,
+            "longitude": longitude,
+            "duty_status": duty_status,
+            "location_address": location_address,
+            "timestamp": timestamp,
+        }
+
+
+def _max_age(max_age_hours):
+    return None if max_age_hours is None else timedelta(hours=max_age_hours)
+
+
+def drivers_within(latitude, longitude, radius_km, limit=None, max_age_hours=None):
+    """Drivers within radius_km of a point, nearest first"""
+    search_boxes = geo.boxes(geo.bounding_box(latitude, longitude, radius_km))
+    found = []
+    for position in _in_boxes(search_boxes, _max_age(max_age_hours)):
+        distance = geo.haversine_km(
+            latitude, longitude, position["latitude"], position["longitude"]
+        )
+        if distance <= radius_km:
+            found.append({**position, "distance_km": round(distance, 3)})
+    found.sort(key=lambda position: (position["distance_km"], position["driver_id"]))
+    return found[:limit] if limit is not None else found
+
+
+def nearest_drivers(latitude, longitude, limit, max_age_hours=None):
+    """The `limit` drivers nearest a point, searching outward"""
+    radius = NEAREST_START_KM
+    while True:
+        found = drivers_within(latitude, longitude, radius, limit, max_age_hours)
+        if len(found) >= limit or radius >= MAX_DISTANCE_KM:
+            return found
+        radius = min(radius * 2, MAX_DISTANCE_KM)
+
+
+def drivers_along(route, width_km, limit=None, max_age_hours=None):
+    """
+    Drivers within width_km of a route of (latitude, longitude) points, in
+    order along it
+    """
+    search_boxes = geo.corridor_boxes(route, width_km)
+    found = []
+    for position in _in_boxes(search_boxes, _max_age(max_age_hours)):
+        distance, along = geo.corridor_distance_km(
+            position["latitude"], position["longitude"], route
+        )
+        if distance <= width_km:
+            found.append(
+                {
+                    **position,
+                    "distance_km": round(distance, 3),
+                    "along_route_km": round(along, 3),
+                }
+            )
+    found.sort(key=lambda position: (position["along_route_km"], position["driver_id"]))
+    return found[:limit] if limit is not None else found
@@ -0,0 +1,142 @@
+"""
+Printable daily logs: sheet data, the page render cache and batch rendering.
+
+A sheet is everything drawn on a log's page (see trips.logsheet). Rendered
+pages are cached under a hash of the sheet's content, so a page is drawn
+again only when something printed on it changes: a duty status, the driver
+or equipment, the timezone, or the drawing itself (RENDER_VERSION). Batches
+render the pages missing from the cache concurrently in a process pool.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import RESPONSE_CACHE_TIMEOUT
+from .cycle import cycle_start
+from .grid import get_grid
+from .logsheet import RENDERERS
+from .models import DailyLog, DutyStatus
+
+# Bump when the drawing changes, so cached pages are drawn again
+RENDER_VERSION = 2
+STATUS_LABELS = {value: label.upper() for value, label in DutyStatus.DUTY_STATUSES}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _name(driver):
+    if driver is None:
+        return ""
+    return driver.user.get_full_name() or driver.user.username
+
+
+def log_sheet(daily_log, zone):
+    """Sheet for a daily log fetched with its driver, co-driver and equipment"""
+    grid = get_grid(daily_log, zone)
+    statuses = daily_log.duty_statuses.order_by("timestamp", "id").values_list(
+        "timestamp", "duty_status", "location_address", "notes"
+    )
+    return {
+        "daily_log_id": daily_log.id,
+        "date": grid["date"].isoformat(),
+        "timezone": grid["timezone"],
+        "driver": _name(daily_log.driver),
+        "co_driver": _name(daily_log.co_driver),
+        "truck_number": daily_log.truck.truck_number,
+        "trailer_number": daily_log.trailer.trailer_number,
+        "miles": float(daily_log.miles),
+        "statuses": grid["statuses"],
+        "labels": [STATUS_LABELS[status] for status in grid["statuses"]],
+        "totals": grid["totals"],
+        "transitions": grid["transitions"],
+        "remarks": [
+            {
+                "time": timestamp.astimezone(zone).strftime("%H:%M"),
+                "label": STATUS_LABELS[duty_status],
+                "location": location,
+                "notes": notes,
+            }
+            for timestamp, duty_status, location, notes in statuses
+        ],
+    }
+
+
+def printable_logs():
+    return DailyLog.objects.select_related(
+        "driver__user", "co_driver__user", "truck", "trailer"
+    )
+
+
+def driver_sheets(driver_id, zone, now=None):
+    """Sheets for a driver's logs with activity in the last 8 days, by date"""
+    start = cycle_start(now or timezone.now())
+    daily_logs = (
+        printable_logs()
+        .filter(driver_id=driver_id)
+        .filter(Q(created_at__gte=start) | Q(duty_statuses__timestamp__gte=start))
+        .distinct()
+    )
+    sheets = [log_sheet(daily_log, zone) for daily_log in daily_logs]
+    return sorted(sheets, key=lambda sheet: (sheet["date"], sheet["daily_log_id"]))
+
+
+def _page_key(sheet, export_format):
+    content = json.dumps([RENDER_VERSION, sheet], sort_keys=True).encode()
+    return f"log-page:{export_format}:{hashlib.blake2b(content).hexdigest()}"
+
+
+def _workers():
+    return getattr(settings, "LOG_RENDER_WORKERS", None) or os.cpu_count() or 1
+
+
+def render_pool():
+    """The process pool shared by batch renders, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # A fresh interpreter per worker rather than a fork of this
+            # (threaded) process; workers only import trips.logsheet
+            _pool = ProcessPoolExecutor(
+                max_workers=_workers(),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def _render_many(render_page, sheets):
+    global _pool
+    # A page takes a few milliseconds to draw, so a single worker would only
+    # add the round trip to it
+    if len(sheets) < 2 or _workers() < 2:
+        return [render_page(sheet) for sheet in sheets]
+    try:
+        return list(render_pool().map(render_page, sheets))
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        return [render_page(sheet) for sheet in sheets]
+
+
+def render_document(sheets, export_format, title):
+    """A document with a page per sheet; pages come from the cache if drawn"""
+    render_page, document, _ = RENDERERS[export_format]
+    keys = [_page_key(sheet, export_format) for sheet in sheets]
+    pages = cache.get_many(keys)
+
+    missing = {key: sheet for key, sheet in zip(keys, sheets) if key not in pages}
+    rendered = dict(zip(missing, _render_many(render_page, list(missing.values()))))
+    if rendered:
+        cache.set_many(rendered, RESPONSE_CACHE_TIMEOUT)
+    pages.update(rendered)
+    return document([pages[key] for key in keys], title)
@@ -0,0 +1,279 @@
+"""
+Road geometry between waypoints, cached in the database.
+
+Routes come from the providers named in settings.ROUTE_PROVIDERS, tried in
+order: a routing service (Mapbox, or a self-hosted OSRM) and, last, a local
+stand-in that needs no network. A provider that is not configured or does
+not answer is skipped, and one that could not be reached is not asked
+again for PROVIDER_COOLDOWN seconds, so an outage costs one request timeout
+rather than one per request. Each provider's routes are cached (RouteGeometry) by
+their waypoints rounded to about 100 m, so requests for the same city pairs
+share an entry, and the least recently used entries are evicted beyond
+settings.ROUTE_CACHE_MAX_ENTRIES. Geometry is stored and served as an
+encoded polyline (Google's format, 5 decimal places), a third of the size
+of the same points as JSON arrays.
+
+A provider is a callable taking [(latitude, longitude), ...] and returning
+{"points": [...], "distance_km": ..., "duration_hours": ...}, or raising
+RouteUnavailable (ProviderUnreachable when the service itself is down).
+ROUTE_PROVIDERS lists the names below or dotted paths.
+"""
+
+import hashlib
+import json
+import math
+from datetime import timedelta
+from urllib.error import URLError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .geo import EARTH_RADIUS_KM, haversine_km
+from .models import RouteGeometry
+
+# Waypoints are rounded to this many decimal places (about 110 m)
+WAYPOINT_PLACES = 3
+POLYLINE_PRECISION = 5
+# A cache hit refreshes the entry's last use at most this often
+TOUCH_INTERVAL = timedelta(minutes=10)
+REQUEST_TIMEOUT = 5
+# Seconds a provider that could not be reached is skipped for
+PROVIDER_COOLDOWN = 60
+
+MAPBOX_URL = "https://api.mapbox.com/directions/v5/mapbox/driving"
+# Straight-line stand-in: roads run about a fifth longer than the great
+# circle, at a truck's average speed, with a point every STEP_KM
+ROAD_FACTOR = 1.2
+AVERAGE_SPEED_KMH = 88
+STEP_KM = 20
+
+
+class RouteUnavailable(Exception):
+    """The provider cannot route these waypoints now"""
+
+
+class ProviderUnreachable(RouteUnavailable):
+    """The provider did not answer, so it cannot route any waypoints now"""
+
+
+def encode_polyline(points, precision=POLYLINE_PRECISION):
+    """Points as an encoded polyline string"""
+    factor = 10**precision
+    chunks = []
+    previous = (0, 0)
+    for point in points:
+        current = tuple(round(value * factor) for value in point)
+        for value, last in zip(current, previous):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chunks.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            chunks.append(chr(delta + 63))
+        previous = current
+    return "".join(chunks)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """An encoded polyline as a list of (latitude, longitude)"""
+    factor = 10**precision
+    points = []
+    index = latitude = longitude = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        latitude += deltas[0]
+        longitude += deltas[1]
+        points.append((latitude / factor, longitude / factor))
+    return points
+
+
+def quantize(waypoints):
+    return [
+        (round(latitude, WAYPOINT_PLACES), round(longitude, WAYPOINT_PLACES))
+        for latitude, longitude in waypoints
+    ]
+
+
+def _cache_key(provider_name, waypoints):
+    text = provider_name + ";" + ";".join(f"{lat},{lon}" for lat, lon in waypoints)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+def straight_line(waypoints):
+    """Great-circle legs between the waypoints, with a point every STEP_KM"""
+    points = [waypoints[0]]
+    distance = 0.0
+    for start, end in zip(waypoints, waypoints[1:]):
+        leg = haversine_km(*start, *end)
+        distance += leg
+        steps = max(1, math.ceil(leg / STEP_KM))
+        points.extend(
+            _intermediate(start, end, leg, step / steps) for step in range(1, steps + 1)
+        )
+    distance *= ROAD_FACTOR
+    return {
+        "points": points,
+        "distance_km": distance,
+        "duration_hours": distance / AVERAGE_SPEED_KMH,
+    }
+
+
+def _intermediate(start, end, distance_km, fraction):
+    """The point `fraction` of the way along the great circle start-end"""
+    if fraction >= 1 or not distance_km:
+        return end if fraction >= 1 else start
+    phi1, lambda1 = map(math.radians, start)
+    phi2, lambda2 = map(math.radians, end)
+    delta = distance_km / EARTH_RADIUS_KM
+    a = math.sin((1 - fraction) * delta) / math.sin(delta)
+    b = math.sin(fraction * delta) / math.sin(delta)
+    x = a * math.cos(phi1) * math.cos(lambda1) + b * math.cos(phi2) * math.cos(lambda2)
+    y = a * math.cos(phi1) * math.sin(lambda1) + b * math.cos(phi2) * math.sin(lambda2)
+    z = a * math.sin(phi1) + b * math.sin(phi2)
+    return (
+        round(math.degrees(math.atan2(z, math.hypot(x, y))), 6),
+        round(math.degrees(math.atan2(y, x)), 6),
+    )
+
+
+def _directions(url):
+    """A route from a Mapbox or OSRM directions response"""
+    try:
+        with urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+            data = json.load(response)
+    except (URLError, OSError, ValueError) as error:
+        raise ProviderUnreachable(str(error)) from error
+    if data.get("code") != "Ok" or not data.get("routes"):
+        raise RouteUnavailable(data.get("code") or "No route")
+    route = data["routes"][0]
+    return {
+        # GeoJSON coordinates are [longitude, latitude]
+        "points": [(lat, lon) for lon, lat in route["geometry"]["coordinates"]],
+        "distance_km": route["distance"] / 1000,
+        "duration_hours": route["duration"] / 3600,
+    }
+
+
+def _lon_lat(waypoints):
+    return quote(";".join(f"{lon},{lat}" for lat, lon in waypoints), safe=",;")
+
+
+def mapbox(waypoints):
+    """Mapbox Directions, with settings.MAPBOX_ACCESS_TOKEN"""
+    token = getattr(settings, "MAPBOX_ACCESS_TOKEN", "")
+    if not token:
+        raise RouteUnavailable("MAPBOX_ACCESS_TOKEN is not set")
+    query = urlencode(
+        {"geometries": "geojson", "overview": "full", "access_token": token}
+    )
+    return _directions(f"{MAPBOX_URL}/{_lon_lat(waypoints)}?{query}")
+
+
+def osrm(waypoints):
+    """An OSRM server at settings.OSRM_URL"""
+    base_url = getattr(settings, "OSRM_URL", "")
+    if not base_url:
+        raise RouteUnavailable("OSRM_URL is not set")
+    query = urlencode({"geometries": "geojson", "overview": "full"})
+    return _directions(
+        f"{base_url.rstrip('/')}/route/v1/driving/{_lon_lat(waypoints)}?{query}"
+    )
+
+
+PROVIDERS = {"mapbox": mapbox, "osrm": osrm, "straight_line": straight_line}
+
+
+def providers():
+    """(name, callable) for each configured provider, in order"""
+    return [
+        (name, PROVIDERS[name] if name in PROVIDERS else import_string(name))
+        for name in settings.ROUTE_PROVIDERS
+    ]
+
+
+def _cooldown_key(provider_name):
+    return f"route-provider-unreachable:{provider_name}"
+
+
+def _response(entry, cached):
+    return {
+        "polyline": entry.polyline,
+        "distance_km": round(entry.distance_km, 3),
+        "duration_hours": round(entry.duration_hours, 3),
+        "provider": entry.provider,
+        "cached": cached,
+    }
+
+
+def _evict():
+    """Delete the least recently used entries beyond the cache size"""
+    excess = RouteGeometry.objects.count() - settings.ROUTE_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = RouteGeometry.objects.order_by("last_used_at", "id").values_list(
+            "id", flat=True
+        )
+        RouteGeometry.objects.filter(id__in=list(oldest[:excess])).delete()
+
+
+def get_route(waypoints, now=None):
+    """
+    The route through the waypoints from the first provider that has or can
+    compute it; raises RouteUnavailable if none can
+    """
+    now = now or timezone.now()
+    waypoints = quantize(waypoints)
+    configured = providers()
+    keys = {name: _cache_key(name, waypoints) for name, _ in configured}
+    cached = RouteGeometry.objects.in_bulk(list(keys.values()), field_name="key")
+
+    errors = []
+    for name, provider in configured:
+        entry = cached.get(keys[name])
+        if entry is not None:
+            if now - entry.last_used_at > TOUCH_INTERVAL:
+                RouteGeometry.objects.filter(id=entry.id).update(last_used_at=now)
+            return _response(entry, cached=True)
+        if cache.get(_cooldown_key(name)):
+            errors.append(f"{name}: unreachable, retried after a cooldown")
+            continue
+        try:
+            route = provider(waypoints)
+        except RouteUnavailable as error:
+            if isinstance(error, ProviderUnreachable):
+                cache.set(_cooldown_key(name), True, PROVIDER_COOLDOWN)
+            errors.append(f"{name}: {error}")
+            continue
+        entry = RouteGeometry(
+            key=keys[name],
+            provider=name,
+            waypoints=json.dumps(waypoints),
+            polyline=encode_polyline(route["points"]),
+            distance_km=route["distance_km"],
+            duration_hours=route["duration_hours"],
+            last_used_at=now,
+        )
+        try:
+            with transaction.atomic():
+                entry.save()
+        except IntegrityError:
+            # Another request stored the same route meanwhile
+            pass
+        else:
+            _evict()
+        return _response(entry, cached=False)
+    raise RouteUnavailable("; ".join(errors) or "No route providers configured")
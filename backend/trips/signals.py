@@ -0,0 +1,154 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import (
+    DAILY_LOGS,
+    FLEET_RECORDS,
+    bump_collection_version,
+    bump_log_version,
+)
+from .cycle import refresh_cycle_snapshot
+from .events import publish_duty_status_events
+from .metrics import record_query
+from .mileage import refresh_log_miles
+from .models import DailyLog, Driver, DutyStatus, Trailer, Truck
+from .positions import refresh_positions
+from .totals import refresh_driver_totals
+
+TIMESTAMP_FIELD = DutyStatus._meta.get_field("timestamp")
+
+
+def duty_statuses_changed(changes, events=(), previous_drivers=None):
+    """
+    Update everything derived from duty statuses after a write.
+
+    `changes` is an iterable of (daily_log_id, timestamp) pairs for statuses
+    that were added, removed, or moved from or to that position. Used by the
+    signal handlers below and by bulk paths that bypass them. `events` are
+    pushed to subscribers, as for publish_duty_status_events.
+    `previous_drivers` maps logs moved to another driver to their old one,
+    whose derived rows are refreshed too.
+    """
+    changes = [
+        (daily_log_id, TIMESTAMP_FIELD.to_python(timestamp))
+        for daily_log_id, timestamp in changes
+    ]
+    log_drivers = dict(
+        DailyLog.objects.filter(
+            id__in={daily_log_id for daily_log_id, _ in changes}
+        ).values_list("id", "driver_id")
+    )
+
+    for daily_log_id in {daily_log_id for daily_log_id, _ in changes}:
+        bump_log_version(daily_log_id)
+
+    driver_timestamps = {}
+    for daily_log_id, timestamp in changes:
+        if daily_log_id in log_drivers:
+            driver_timestamps.setdefault(log_drivers[daily_log_id], []).append(
+                timestamp
+            )
+        if previous_drivers and daily_log_id in previous_drivers:
+            driver_timestamps.setdefault(previous_drivers[daily_log_id], []).append(
+                timestamp
+            )
+
+    miles_changed = set()
+    for driver_id, timestamps in driver_timestamps.items():
+        refresh_driver_totals(driver_id, timestamps)
+        refresh_cycle_snapshot(driver_id)
+        miles_changed |= refresh_log_miles(
+            driver_id,
+            timestamps,
+            [log_id for log_id, driver in log_drivers.items() if driver == driver_id],
+        )
+    # Daily log responses include their miles
+    for daily_log_id in miles_changed - log_drivers.keys():
+        bump_log_version(daily_log_id)
+    if miles_changed:
+        bump_collection_version(DAILY_LOGS)
+    refresh_positions(driver_timestamps)
+    publish_duty_status_events(events, log_drivers)
+
+
+@receiver(pre_save, sender=DutyStatus)
+def remember_previous_position(sender, instance, **kwargs):
+    """Keep the stored log and timestamp of an edited status"""
+    instance._previous_position = (
+        DutyStatus.objects.filter(pk=instance.pk)
+        .values_list("daily_log_id", "timestamp")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=DutyStatus)
+@receiver(post_delete, sender=DutyStatus)
+def duty_status_saved_or_deleted(sender, instance, signal, created=False, **kwargs):
+    changes = [(instance.daily_log_id, instance.timestamp)]
+    previous = getattr(instance, "_previous_position", None)
+    if previous:
+        changes.append(previous)
+    if signal is post_delete:
+        action = "deleted"
+    else:
+        action = "created" if created else "updated"
+    duty_statuses_changed(
+        changes, events=[(action, instance, previous[0] if previous else None)]
+    )
+
+
+@receiver(pre_save, sender=DailyLog)
+def remember_previous_driver(sender, instance, **kwargs):
+    """Keep the stored driver of an edited log"""
+    instance._previous_driver_id = (
+        DailyLog.objects.filter(pk=instance.pk)
+        .values_list("driver_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=DailyLog)
+@receiver(post_delete, sender=DailyLog)
+def daily_log_saved_or_deleted(sender, instance, **kwargs):
+    bump_log_version(instance.id)
+    bump_collection_version(DAILY_LOGS)
+    # Totals, cycle, miles and positions are the driver's: move them along
+    previous_driver_id = getattr(instance, "_previous_driver_id", None)
+    if previous_driver_id is not None and previous_driver_id != instance.driver_id:
+        instance._previous_driver_id = instance.driver_id
+        timestamps = DutyStatus.objects.filter(daily_log_id=instance.id).values_list(
+            "timestamp", flat=True
+        )
+        if timestamps:
+            duty_statuses_changed(
+                [(instance.id, timestamp) for timestamp in timestamps],
+                previous_drivers={instance.id: previous_driver_id},
+            )
+
+
+# Daily log responses embed the driver, its user and the equipment
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(post_save, sender=Truck)
+@receiver(post_delete, sender=Truck)
+@receiver(post_save, sender=Trailer)
+@receiver(post_delete, sender=Trailer)
+def fleet_record_changed(sender, **kwargs):
+    bump_collection_version(FLEET_RECORDS)
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper, which keeps its wrappers
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
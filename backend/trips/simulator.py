@@ -0,0 +1,410 @@
+"""
+Synthetic fleet data: HOS-compliant multi-day trips for many drivers.
+
+Each simulated driver hauls back-to-back loads between US freight cities,
+shift by shift, within the rules trips.hos checks: at most 11 hours of
+driving inside a 14-hour window after 10 hours in the sleeper berth, a
+30-minute break before 8 hours of driving, and a 34-hour restart before the
+70-hour/8-day cycle runs out. While driving, a location record is logged
+every hour, as an ELD does, and every day's log opens with the status
+carried over from the day before.
+
+Road distances come from a city-to-city table computed once, so picking a
+load is a lookup rather than a haversine per candidate. Drivers are written
+a chunk at a time with bulk INSERTs, and the per-day totals, log miles,
+cycle snapshots and last known positions that signals would otherwise
+maintain row by row are rebuilt once per chunk.
+"""
+
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .caching import DAILY_LOGS, FLEET_RECORDS, bump_collection_version
+from .cycle import cycle_start, refresh_cycle_snapshot
+from .hos import (
+    BREAK_AFTER_DRIVING,
+    BREAK_LENGTH,
+    CYCLE_LIMIT,
+    DRIVING_LIMIT,
+    HOUR,
+    RESET_LENGTH,
+    RESTART_LENGTH,
+    WINDOW_LIMIT,
+)
+from .mileage import rebuild_all_log_miles
+from .models import DailyLog, Driver, DutyStatus, Trailer, Truck
+from .positions import refresh_positions
+from .totals import day_start, local_day, rebuild_all_totals
+
+MINUTE = 60
+
+CITIES = [
+    ("Atlanta, GA", 33.7490, -84.3880),
+    ("Albuquerque, NM", 35.0844, -106.6504),
+    ("Baltimore, MD", 39.2904, -76.6122),
+    ("Birmingham, AL", 33.5186, -86.8104),
+    ("Charlotte, NC", 35.2271, -80.8431),
+    ("Chicago, IL", 41.8781, -87.6298),
+    ("Cincinnati, OH", 39.1031, -84.5120),
+    ("Columbus, OH", 39.9612, -82.9988),
+    ("Dallas, TX", 32.7767, -96.7970),
+    ("Denver, CO", 39.7392, -104.9903),
+    ("Detroit, MI", 42.3314, -83.0458),
+    ("El Paso, TX", 31.7619, -106.4850),
+    ("Houston, TX", 29.7604, -95.3698),
+    ("Indianapolis, IN", 39.7684, -86.1581),
+    ("Jacksonville, FL", 30.3322, -81.6557),
+    ("Kansas City, MO", 39.0997, -94.5786),
+    ("Laredo, TX", 27.5306, -99.4803),
+    ("Little Rock, AR", 34.7465, -92.2896),
+    ("Los Angeles, CA", 34.0522, -118.2437),
+    ("Louisville, KY", 38.2527, -85.7585),
+    ("Memphis, TN", 35.1495, -90.0490),
+    ("Minneapolis, MN", 44.9778, -93.2650),
+    ("Nashville, TN", 36.1627, -86.7816),
+    ("New York, NY", 40.7128, -74.0060),
+    ("Oklahoma City, OK", 35.4676, -97.5164),
+    ("Omaha, NE", 41.2565, -95.9345),
+    ("Philadelphia, PA", 39.9526, -75.1652),
+    ("Phoenix, AZ", 33.4484, -112.0740),
+    ("Pittsburgh, PA", 40.4406, -79.9959),
+    ("Richmond, VA", 37.5407, -77.4360),
+    ("Salt Lake City, UT", 40.7608, -111.8910),
+    ("San Antonio, TX", 29.4241, -98.4936),
+    ("St. Louis, MO", 38.6270, -90.1994),
+    ("Washington, DC", 38.9072, -77.0369),
+]
+
+# Roads run about a fifth longer than the great circle between two cities
+ROAD_FACTOR = 1.2
+EARTH_RADIUS_KM = 6371
+MIN_LOAD_KM = 250
+MAX_LOAD_KM = 1800
+FUEL_INTERVAL_KM = 1200
+
+
+def distance_table(cities):
+    """Road kilometres between every pair of cities, as a nested list"""
+    points = [(math.radians(lat), math.radians(lng)) for _, lat, lng in cities]
+    cosines = [math.cos(lat) for lat, _ in points]
+    table = []
+    for i, (lat1, lng1) in enumerate(points):
+        row = []
+        for j, (lat2, lng2) in enumerate(points):
+            a = (
+                math.sin((lat2 - lat1) / 2) ** 2
+                + cosines[i] * cosines[j] * math.sin((lng2 - lng1) / 2) ** 2
+            )
+            row.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a)) * ROAD_FACTOR)
+        table.append(row)
+    return table
+
+
+DISTANCES = distance_table(CITIES)
+# Destinations a load can run to from each city
+LOADS = [
+    [j for j, km in enumerate(row) if MIN_LOAD_KM <= km <= MAX_LOAD_KM]
+    for row in DISTANCES
+]
+
+
+class Timeline:
+    """One driver's duty statuses, generated shift by shift"""
+
+    def __init__(self, rng, home, start):
+        self.rng = rng
+        self.events = []
+        self.at = start
+        self.city = home
+        self.position = CITIES[home][1:]
+        self.load = None
+        self.fuel_km = rng.uniform(0, FUEL_INTERVAL_KM)
+        self.cycle_spans = deque()
+        self.cycle_total = 0.0
+
+    def record(self, status, location, notes):
+        lat, lng = self.position
+        self.events.append(
+            (self.at, status, location, round(lat, 6), round(lng, 6), notes)
+        )
+
+    def on_duty(self, minutes, location, notes):
+        self.record("on_duty", location, notes)
+        self.work(minutes * MINUTE)
+
+    def work(self, seconds):
+        self.cycle_spans.append((self.at, self.at + seconds))
+        self.cycle_total += seconds
+        self.at += seconds
+
+    def rest(self, status, seconds, notes):
+        self.record(status, self.location(), notes)
+        self.at += seconds
+
+    def cycle_used(self):
+        window_start = cycle_start(_to_datetime(self.at)).timestamp()
+        while self.cycle_spans and self.cycle_spans[0][1] <= window_start:
+            start, end = self.cycle_spans.popleft()
+            self.cycle_total -= end - start
+        if self.cycle_spans and self.cycle_spans[0][0] < window_start:
+            return self.cycle_total - (window_start - self.cycle_spans[0][0])
+        return self.cycle_total
+
+    def location(self):
+        if self.load is None:
+            return CITIES[self.city][0]
+        return f"En route to {CITIES[self.load['destination']][0]}"
+
+    def next_load(self):
+        destination = self.rng.choice(LOADS[self.city])
+        self.load = {
+            "origin": CITIES[self.city][1:],
+            "target": CITIES[destination][1:],
+            "destination": destination,
+            "km": DISTANCES[self.city][destination],
+            "done": 0.0,
+            "speed": self.rng.uniform(72, 95),
+        }
+        self.on_duty(self.rng.randrange(30, 91, 15), CITIES[self.city][0], "Loading")
+
+    def drive(self, seconds):
+        """Drive the current load for up to `seconds`, logging every hour"""
+        load = self.load
+        # Whole minutes keep every clock exact against the limits
+        remaining = (load["km"] - load["done"]) / load["speed"] * HOUR
+        seconds = min(seconds, math.ceil(remaining / MINUTE) * MINUTE)
+        end = self.at + seconds
+        notes = "Start driving"
+        while self.at < end:
+            self.record("driving", self.location(), notes)
+            step = min(HOUR, end - self.at)
+            self.work(step)
+            km = min(load["speed"] * step / HOUR, load["km"] - load["done"])
+            load["done"] += km
+            self.fuel_km += km
+            progress = load["done"] / load["km"]
+            (lat1, lng1), (lat2, lng2) = load["origin"], load["target"]
+            self.position = (
+                lat1 + (lat2 - lat1) * progress,
+                lng1 + (lng2 - lng1) * progress,
+            )
+            notes = "Intermediate location"
+        if load["done"] >= load["km"] - 0.01:
+            self.city, self.load = load["destination"], None
+            self.position = CITIES[self.city][1:]
+        return seconds
+
+    def shift(self):
+        """One shift from pre-trip inspection to the sleeper berth"""
+        shift_start = self.at
+        driving = since_break = 0.0
+        self.on_duty(15, self.location(), "Pre-trip inspection")
+        while True:
+            if self.load is None:
+                self.next_load()
+            window_left = shift_start + WINDOW_LIMIT - self.at
+            drive_left = min(DRIVING_LIMIT - driving, window_left)
+            if min(drive_left, BREAK_AFTER_DRIVING - since_break) < 15 * MINUTE:
+                if drive_left < HOUR:
+                    break
+                self.rest("off_duty", BREAK_LENGTH, "30-minute break")
+                since_break = 0.0
+                continue
+            driven = self.drive(min(drive_left, BREAK_AFTER_DRIVING - since_break))
+            driving += driven
+            since_break += driven
+            if self.load is None:
+                self.on_duty(
+                    self.rng.randrange(30, 91, 15), CITIES[self.city][0], "Unloading"
+                )
+                since_break = 0.0
+            elif self.fuel_km >= FUEL_INTERVAL_KM:
+                self.on_duty(30, self.location(), "Fueling")
+                self.fuel_km = 0.0
+                since_break = 0.0
+        self.on_duty(15, self.location(), "Post-trip inspection")
+        self.rest(
+            "sleeper_berth",
+            RESET_LENGTH + self.rng.randrange(0, 121, 15) * MINUTE,
+            "Sleeper berth",
+        )
+
+    def run(self, end):
+        self.rest("off_duty", self.rng.randrange(5 * 60, 9 * 60, 15) * MINUTE, "")
+        while self.at < end:
+            if self.cycle_used() + WINDOW_LIMIT > CYCLE_LIMIT:
+                self.rest("off_duty", RESTART_LENGTH, "34-hour restart")
+            else:
+                self.shift()
+        return [event for event in self.events if event[0] < end]
+
+
+def _to_datetime(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def split_into_days(events, last_day, zone=None):
+    """
+    Group events into {local day: [event, ...]} up to `last_day`, opening
+    every day after the first with the status carried over from the day
+    before.
+    """
+    days = {}
+    previous = None
+
+    def carry_until(day):
+        carried_day = previous[0] + timedelta(days=1)
+        while carried_day <= day:
+            midnight = day_start(carried_day, zone).timestamp()
+            days[carried_day] = [
+                (midnight, *previous[1][1:5], "Carried over from the previous day")
+            ]
+            carried_day += timedelta(days=1)
+
+    for event in events:
+        day = local_day(_to_datetime(event[0]), zone)
+        if previous is not None:
+            carry_until(day)
+        days.setdefault(day, []).append(event)
+        previous = (day, event)
+    if previous is not None:
+        carry_until(last_day)
+    return days
+
+
+def _create_drivers(prefix, count):
+    usernames = [f"{prefix}-{index:05d}" for index in range(1, count + 1)]
+    users = User.objects.bulk_create(
+        User(username=username, first_name="Sim", last_name=username)
+        for username in usernames
+    )
+    drivers = Driver.objects.bulk_create(
+        Driver(
+            user=user,
+            license_number=user.username.upper(),
+            phone="555-0100",
+            address="Simulated",
+        )
+        for user in users
+    )
+    trucks = Truck.objects.bulk_create(
+        Truck(
+            truck_number=username.upper(),
+            make_model="Freightliner Cascadia",
+            year=2022,
+            license_plate=username.upper(),
+        )
+        for username in usernames
+    )
+    trailers = Trailer.objects.bulk_create(
+        Trailer(trailer_number=username.upper(), trailer_type="box", capacity="53ft")
+        for username in usernames
+    )
+    return list(zip(drivers, trucks, trailers))
+
+
+def _write_chunk(rng, fleet, start, end, batch_size):
+    """Simulate and store a chunk of drivers; returns (logs, statuses) written"""
+    today = local_day(timezone.now())
+    log_count = status_count = 0
+    with transaction.atomic():
+        for driver, truck, trailer in fleet:
+            home = rng.randrange(len(CITIES))
+            days = split_into_days(
+                Timeline(rng, home, start).run(end), local_day(_to_datetime(end))
+            )
+            logs = DailyLog.objects.bulk_create(
+                DailyLog(
+                    driver=driver,
+                    truck=truck,
+                    trailer=trailer,
+                    status="active" if day == today else "completed",
+                )
+                for day in days
+            )
+            DutyStatus.objects.bulk_create(
+                (
+                    DutyStatus(
+                        daily_log_id=log.id,
+                        duty_status=status,
+                        location_address=location,
+                        latitude=lat,
+                        longitude=lng,
+                        timestamp=_to_datetime(at),
+                        notes=notes,
+                    )
+                    for log, events in zip(logs, days.values())
+                    for at, status, location, lat, lng, notes in events
+                ),
+                batch_size=batch_size,
+            )
+            log_count += len(logs)
+            status_count += sum(len(events) for events in days.values())
+
+        # Logs are dated by their first status rather than by today
+        driver_ids = [driver.id for driver, _, _ in fleet]
+        DailyLog.objects.filter(driver_id__in=driver_ids).update(
+            created_at=Subquery(
+                DutyStatus.objects.filter(daily_log=OuterRef("pk"))
+                .order_by("timestamp")
+                .values("timestamp")[:1]
+            )
+        )
+        rebuild_all_totals(driver_ids=driver_ids, batch_size=batch_size)
+        rebuild_all_log_miles(driver_ids=driver_ids, batch_size=batch_size)
+        refresh_positions(driver_ids)
+    for driver_id in driver_ids:
+        refresh_cycle_snapshot(driver_id)
+    return log_count, status_count
+
+
+def simulate_fleet(
+    drivers,
+    days,
+    prefix="sim",
+    seed=None,
+    end=None,
+    chunk_size=50,
+    batch_size=2000,
+    progress=None,
+):
+    """
+    Create `drivers` drivers, each with `days` days of trips ending at `end`
+    (default: now). Usernames, licenses and equipment numbers are
+    `prefix`-00001 and up. `progress` is called with a running count of
+    (drivers, daily logs, duty statuses) after each chunk.
+    """
+    if User.objects.filter(username__startswith=f"{prefix}-").exists():
+        raise ValueError(f"Simulated drivers named '{prefix}-...' already exist")
+    rng = random.Random(seed)
+    end = int((end or timezone.now()).timestamp())
+    start = day_start(local_day(_to_datetime(end)) - timedelta(days=days - 1))
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        fleet = _create_drivers(prefix, drivers)
+    totals = {"drivers": 0, "daily_logs": 0, "duty_statuses": 0}
+    for index in range(0, len(fleet), chunk_size):
+        chunk = fleet[index : index + chunk_size]
+        logs, statuses = _write_chunk(
+            rng, chunk, int(start.timestamp()), end, batch_size
+        )
+        totals["drivers"] += len(chunk)
+        totals["daily_logs"] += logs
+        totals["duty_statuses"] += statuses
+        if progress:
+            progress(totals)
+
+    bump_collection_version(DAILY_LOGS)
+    bump_collection_version(FLEET_RECORDS)
+    totals["seconds"] = round(time.perf_counter() - started, 1)
+    return totals
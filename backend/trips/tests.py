@@ -1 +1,2010 @@
-# Create your tests here.
+import asyncio
+import csv
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DataError, connection
+from django.db.utils import ConnectionHandler
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from trip_tracker.database import sqlite_settings
+
+from . import writebehind
+from .admin import INLINE_DUTY_STATUSES, DutyStatusAdmin
+from .api import MAX_ROUTE_POINTS, api
+from .archive import archive_daily_logs
+from .benchmarks import benchmark_cases, run_benchmarks
+from .cycle import cycle_seconds_by_driver, cycle_seconds_for_driver, cycle_start
+from .events import (
+    FLEET,
+    QUEUE_SIZE,
+    QueueSubscription,
+    driver_channel,
+    get_hub,
+    log_channel,
+)
+from .exports import CHUNK_SIZE, EXPORT_COLUMNS
+from .geo import encode, haversine_km
+from .hos import evaluate_driver, evaluate_fleet, evaluate_timeline
+from .logsheet import RENDERERS
+from .metrics import registry
+from .mileage import leg_miles
+from .models import (
+    ArchivedDailyLog,
+    ArchiveSegment,
+    DailyDutyTotal,
+    DailyLog,
+    Driver,
+    DriverPosition,
+    DutyStatus,
+    RevokedToken,
+    RouteGeometry,
+    Trailer,
+    Truck,
+)
+from .pagination import EstimatedCountPaginator, estimated_row_count
+from .positions import drivers_along, drivers_within
+from .printing import _page_key, driver_sheets, log_sheet
+from .routing import (
+    ProviderUnreachable,
+    RouteUnavailable,
+    decode_polyline,
+    encode_polyline,
+    get_route,
+)
+from .simulator import simulate_fleet
+from .tokens import load_denylist
+from .totals import day_start, local_day
+from .writebehind import Journal, WriteBehindQueue, read_journal, recover_journals
+
+
+class TripsTestCase(TestCase):
+    """Shared fixtures: one truck, one trailer and a helper to add drivers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.truck = Truck.objects.create(
+            truck_number="T-1", make_model="Volvo VNL", year=2022, license_plate="TX1"
+        )
+        cls.trailer = Trailer.objects.create(
+            trailer_number="TR-1", trailer_type="box", capacity="53ft"
+        )
+        cls.driver = cls.make_driver("driver1")
+
+    @classmethod
+    def make_driver(cls, username):
+        user = User.objects.create_user(
+            username=username, first_name="Test", last_name=username
+        )
+        return Driver.objects.create(
+            user=user, license_number=f"CDL-{username}", phone="555", address="-"
+        )
+
+    def make_log(self, driver=None, **kwargs):
+        return DailyLog.objects.create(
+            driver=driver or self.driver,
+            truck=self.truck,
+            trailer=self.trailer,
+            **kwargs,
+        )
+
+    def add_statuses(self, daily_log, statuses):
+        """Create (hours_ago, duty_status) pairs relative to self.now"""
+        return [
+            DutyStatus.objects.create(
+                daily_log=daily_log,
+                duty_status=duty_status,
+                location_address="Dallas, TX",
+                timestamp=self.now - timedelta(hours=hours_ago),
+            )
+            for hours_ago, duty_status in statuses
+        ]
+
+    def setUp(self):
+        self.now = timezone.now()
+        cache.clear()
+
+
+class CycleHoursTests(TripsTestCase):
+    def test_each_status_lasts_until_the_next_one(self):
+        log = self.make_log()
+        self.add_statuses(
+            log,
+            [(20, "on_duty"), (18, "driving"), (10, "off_duty"), (2, "driving")],
+        )
+
+        seconds = cycle_seconds_for_driver(self.driver.id, now=self.now)
+
+        self.assertEqual(seconds, (2 + 8 + 2) * 3600)
+
+    def test_status_started_before_window_is_clipped(self):
+        log = self.make_log()
+        hours_into_window = (self.now - cycle_start(self.now)) / timedelta(hours=1)
+        self.add_statuses(
+            log,
+            [(hours_into_window + 5, "driving"), (hours_into_window - 3, "off_duty")],
+        )
+
+        seconds = cycle_seconds_for_driver(self.driver.id, now=self.now)
+
+        self.assertEqual(seconds, 3 * 3600)
+
+    def test_fleet_totals_in_one_query(self):
+        other = self.make_driver("driver2")
+        self.add_statuses(self.make_log(), [(5, "driving"), (1, "off_duty")])
+        self.add_statuses(self.make_log(other), [(3, "on_duty")])
+
+        with self.assertNumQueries(1):
+            totals = cycle_seconds_by_driver(now=self.now)
+
+        self.assertEqual(totals, {self.driver.id: 4 * 3600, other.id: 3 * 3600})
+
+    def test_running_total_follows_writes(self):
+        log = self.make_log()
+        driving, off_duty = self.add_statuses(log, [(6, "driving"), (1, "off_duty")])
+        driver = Driver.objects.get(id=self.driver.id)
+        self.assertEqual(driver.cycle_status, "off_duty")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(driver.get_current_cycle_hours(), 5)
+            self.assertEqual(driver.get_remaining_hours(), 65)
+
+        off_duty.delete()
+        driver.refresh_from_db()
+        self.assertEqual(driver.cycle_status, "driving")
+        self.assertGreaterEqual(driver.get_current_cycle_hours(), 6)
+
+    def test_stale_snapshots_are_read_and_refreshed_separately(self):
+        self.add_statuses(self.make_log(), [(6, "driving"), (1, "off_duty")])
+        Driver.objects.filter(id=self.driver.id).update(
+            cycle_seconds=9 * 3600, cycle_computed_at=self.now - timedelta(days=1)
+        )
+        driver = Driver.objects.get(id=self.driver.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(driver.get_current_cycle_hours(), 9)
+
+        stdout = StringIO()
+        call_command("refresh_cycle_snapshots", stdout=stdout)
+        self.assertIn("of 1 drivers", stdout.getvalue())
+        driver.refresh_from_db()
+        self.assertEqual(driver.get_current_cycle_hours(), 5)
+
+
+class DailyLogListTests(TripsTestCase):
+    def test_pages_follow_cursor_newest_first(self):
+        logs = [self.make_log() for _ in range(5)]
+
+        first = self.client.get("/api/daily-logs", {"limit": 2}).json()
+        second = self.client.get(
+            "/api/daily-logs", {"limit": 2, "cursor": first["next_cursor"]}
+        ).json()
+        third = self.client.get(
+            "/api/daily-logs", {"limit": 2, "cursor": second["next_cursor"]}
+        ).json()
+
+        pages = (first, second, third)
+        ids = [item["id"] for page in pages for item in page["items"]]
+        self.assertEqual(ids, [log.id for log in reversed(logs)])
+        self.assertIsNone(third["next_cursor"])
+
+    def test_filters(self):
+        other = self.make_driver("driver2")
+        self.make_log(status="active")
+        wanted = self.make_log(other, status="active")
+        self.make_log(other, status="completed")
+
+        response = self.client.get(
+            "/api/daily-logs", {"driver_id": other.id, "status": "active"}
+        )
+
+        items = response.json()["items"]
+        self.assertEqual([item["id"] for item in items], [wanted.id])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        for index in range(30):
+            self.make_log(self.make_driver(f"bulk{index}"))
+
+        # logs joined with the driver's name and the equipment numbers
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/daily-logs", {"limit": 30})
+
+        items = response.json()["items"]
+        self.assertEqual(len(items), 30)
+        self.assertEqual(items[0]["driver_name"], "Test bulk29")
+        self.assertEqual(items[0]["truck_number"], "T-1")
+        self.assertIsNone(items[0]["driver"])
+
+        # plus one query per expanded relation (no log has a co-driver)
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                "/api/daily-logs",
+                {"limit": 30, "expand": "driver,co_driver,truck,trailer"},
+            )
+
+        items = response.json()["items"]
+        self.assertEqual(items[0]["driver"]["username"], "bulk29")
+        self.assertEqual(items[0]["driver"]["name"], "Test bulk29")
+        self.assertEqual(items[0]["truck"]["make_model"], "Volvo VNL")
+        self.assertEqual(items[0]["trailer"]["trailer_number"], "TR-1")
+        self.assertIsNone(items[0]["co_driver"])
+        self.assertNotIn("user", items[0]["driver"])
+
+    def test_unknown_expansions_are_rejected(self):
+        response = self.client.get("/api/daily-logs", {"expand": "driver,user"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/daily-logs", {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log = self.make_log()
+        self.add_statuses(self.log, [(3, "on_duty"), (2, "driving")])
+
+    def test_repeat_requests_and_revalidation_skip_the_database(self):
+        for url in [
+            f"/api/daily-logs/{self.log.id}",
+            f"/api/daily-logs/{self.log.id}/duty-statuses",
+            "/api/daily-logs?limit=10",
+        ]:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            etag = first["ETag"]
+
+            with self.assertNumQueries(0):
+                again = self.client.get(url)
+                revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(again.content, first.content)
+            self.assertEqual(again["ETag"], etag)
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated["ETag"], etag)
+
+    def test_writes_invalidate_cached_responses(self):
+        detail = f"/api/daily-logs/{self.log.id}"
+        statuses = f"/api/daily-logs/{self.log.id}/duty-statuses"
+        etags = {url: self.client.get(url)["ETag"] for url in [detail, statuses]}
+
+        self.add_statuses(self.log, [(1, "off_duty")])
+        response = self.client.get(statuses, HTTP_IF_NONE_MATCH=etags[statuses])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        # The daily log itself did not change
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etags[detail])
+        self.assertEqual(response.status_code, 304)
+
+        self.log.status = "completed"
+        self.log.save()
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etags[detail])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "completed")
+
+        self.client.get("/api/daily-logs")
+        self.make_log()
+        self.assertEqual(len(self.client.get("/api/daily-logs").json()["items"]), 2)
+
+        listing = self.client.get("/api/daily-logs?expand=driver")
+        self.driver.phone = "556"
+        self.driver.save()
+        response = self.client.get("/api/daily-logs?expand=driver")
+        self.assertEqual(response.json()["items"][0]["driver"]["phone"], "556")
+        self.assertNotEqual(response["ETag"], listing["ETag"])
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.client.get("/api/daily-logs/999999").status_code, 404)
+        # The live table, then the archive
+        with self.assertNumQueries(2):
+            self.client.get("/api/daily-logs/999999")
+
+
+class AsyncReadApiTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log = self.make_log()
+        self.add_statuses(self.log, [(3, "on_duty"), (2, "driving")])
+
+    async def test_read_endpoints_under_asgi(self):
+        response = await self.async_client.get("/api/daily-logs?limit=1")
+        self.assertEqual(response.json()["items"][0]["id"], self.log.id)
+
+        response = await self.async_client.get(f"/api/daily-logs/{self.log.id}")
+        self.assertEqual(response.json()["driver_name"], "Test driver1")
+
+        response = await self.async_client.get(
+            f"/api/daily-logs/{self.log.id}?expand=driver,trailer"
+        )
+        self.assertEqual(response.json()["driver"]["username"], "driver1")
+        self.assertEqual(response.json()["trailer"]["capacity"], "53ft")
+
+        response = await self.async_client.get(
+            f"/api/daily-logs/{self.log.id}/duty-statuses"
+        )
+        self.assertEqual(
+            [status["duty_status"] for status in response.json()],
+            ["on_duty", "driving"],
+        )
+        revalidated = await self.async_client.get(
+            f"/api/daily-logs/{self.log.id}/duty-statuses",
+            headers={"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+        response = await self.async_client.get(f"/api/daily-logs/{self.log.id}/grid")
+        self.assertEqual(len(response.json()["slots"]), 96)
+
+        response = await self.async_client.get("/api/duty-statuses/999999")
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricsTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.log = self.make_log()
+        self.add_statuses(self.log, [(3, "on_duty"), (2, "driving")])
+
+    def metric(self, text, line):
+        for metric_line in text.splitlines():
+            name, _, value = metric_line.rpartition(" ")
+            if name == line:
+                return float(value)
+        self.fail(f"{line} not in metrics")
+
+    def test_requests_are_recorded_by_route(self):
+        self.client.get(f"/api/daily-logs/{self.log.id}/duty-statuses")
+        self.client.get(f"/api/daily-logs/{self.log.id}/duty-statuses")
+        self.client.get("/api/daily-logs/999999/duty-statuses")
+
+        response = self.client.get("/api/metrics")
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        route = 'method="GET",route="/api/daily-logs/{daily_log_id}/duty-statuses"'
+        self.assertEqual(
+            self.metric(
+                text, f'trip_tracker_http_requests_total{{{route},status="200"}}'
+            ),
+            2,
+        )
+        self.assertEqual(
+            self.metric(
+                text, f'trip_tracker_http_requests_total{{{route},status="404"}}'
+            ),
+            1,
+        )
+        self.assertEqual(
+            self.metric(
+                text, f"trip_tracker_http_request_duration_seconds_count{{{route}}}"
+            ),
+            3,
+        )
+        # The first request misses the response cache; the second hits it
+        self.assertGreaterEqual(
+            self.metric(text, f"trip_tracker_http_db_queries_sum{{{route}}}"), 3
+        )
+        self.assertGreater(
+            self.metric(text, f"trip_tracker_http_response_size_bytes_sum{{{route}}}"),
+            0,
+        )
+        self.assertEqual(
+            self.metric(
+                text, f'trip_tracker_http_db_queries_bucket{{{route},le="+Inf"}}'
+            ),
+            3,
+        )
+        self.assertIn("trip_tracker_http_serialization_duration_seconds_count", text)
+        self.assertNotIn('route="/api/metrics"', text)
+
+    async def test_queries_are_counted_under_asgi(self):
+        await self.async_client.get(f"/api/daily-logs/{self.log.id}/grid")
+        text = registry.render()
+        route = 'method="GET",route="/api/daily-logs/{daily_log_id}/grid"'
+        self.assertGreater(
+            self.metric(text, f"trip_tracker_http_db_queries_sum{{{route}}}"), 0
+        )
+
+    def test_slow_requests_are_profiled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(
+                PROFILE_SLOW_REQUESTS=0, PROFILE_SAMPLE_RATE=1, PROFILE_DIR=directory
+            ):
+                self.client.get(f"/api/daily-logs/{self.log.id}/grid")
+            with self.settings(
+                PROFILE_SLOW_REQUESTS=60, PROFILE_SAMPLE_RATE=1, PROFILE_DIR=directory
+            ):
+                self.client.get(f"/api/daily-logs/{self.log.id}")
+            profiles = os.listdir(directory)
+
+        self.assertEqual(len(profiles), 1)
+        self.assertIn("GET-api-daily-logs-daily_log_id-grid", profiles[0])
+        self.assertTrue(profiles[0].endswith(".prof"))
+
+
+class DutyStatusBatchTests(TripsTestCase):
+    def event(self, daily_log, hours_ago, duty_status="driving", **extra):
+        timestamp = self.now - timedelta(hours=hours_ago)
+        return {
+            "daily_log_id": daily_log.id,
+            "duty_status": duty_status,
+            "location_address": "Dallas, TX",
+            "latitude": 32.7767,
+            "longitude": -96.797,
+            "timestamp": timestamp.isoformat(),
+            **extra,
+        }
+
+    def post_batch(self, events):
+        return self.client.post(
+            "/api/duty-statuses/batch", events, content_type="application/json"
+        )
+
+    def test_creates_events_for_several_logs(self):
+        first, second = self.make_log(), self.make_log(self.make_driver("driver2"))
+
+        response = self.post_batch(
+            [self.event(first, 3), self.event(second, 2, "on_duty")]
+        )
+
+        body = response.json()
+        self.assertEqual(body["created"], 2)
+        self.assertEqual(first.duty_statuses.count(), 1)
+        self.assertEqual(second.duty_statuses.get().duty_status, "on_duty")
+        self.assertEqual(Driver.objects.get(id=self.driver.id).cycle_status, "driving")
+
+    def test_replayed_keys_are_not_stored_twice(self):
+        log = self.make_log()
+        events = [
+            self.event(log, 3, idempotency_key="dev-1"),
+            self.event(log, 2, idempotency_key="dev-2"),
+            self.event(log, 2, idempotency_key="dev-2"),
+        ]
+
+        first = self.post_batch(events).json()
+        replay = self.post_batch(events).json()
+
+        self.assertEqual(first["created"], 2)
+        self.assertEqual(first["results"][2]["id"], first["results"][1]["id"])
+        self.assertEqual(replay["created"], 0)
+        self.assertEqual(replay["duplicates"], 3)
+        self.assertEqual(log.duty_statuses.count(), 2)
+
+    def test_a_key_is_not_replayed_into_another_log(self):
+        log, other = self.make_log(), self.make_log(self.make_driver("driver2"))
+        first = self.client.post(
+            f"/api/daily-logs/{log.id}/duty-statuses",
+            self.event(log, 2, idempotency_key="dev-1"),
+            content_type="application/json",
+        )
+        replay = self.client.post(
+            f"/api/daily-logs/{log.id}/duty-statuses",
+            self.event(log, 2, idempotency_key="dev-1"),
+            content_type="application/json",
+        )
+        elsewhere = self.client.post(
+            f"/api/daily-logs/{other.id}/duty-statuses",
+            self.event(other, 2, idempotency_key="dev-1"),
+            content_type="application/json",
+        )
+
+        self.assertEqual(replay.json()["id"], first.json()["id"])
+        self.assertEqual(elsewhere.status_code, 409)
+        self.assertFalse(other.duty_statuses.exists())
+
+    def test_invalid_items_are_reported_per_item(self):
+        log = self.make_log()
+
+        body = self.post_batch(
+            [
+                self.event(log, 3),
+                self.event(log, 2, "napping"),
+                {**self.event(log, 1), "daily_log_id": 999},
+                {**self.event(log, 1), "timestamp": "yesterday"},
+                self.event(log, 1, idempotency_key="k" * 65),
+            ]
+        ).json()
+
+        statuses = [result["status"] for result in body["results"]]
+        self.assertEqual(statuses, ["created", "error", "error", "error", "error"])
+        self.assertIn("longer than 64", body["results"][4]["error"])
+        response = self.client.post(
+            f"/api/daily-logs/{log.id}/duty-statuses",
+            {**self.event(log, 1), "idempotency_key": "k" * 65},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(log.duty_statuses.count(), 1)
+
+
+class DutyStatusExportTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log = self.make_log()
+        self.other_log = self.make_log(driver=self.make_driver("driver2"))
+        self.add_statuses(self.log, [(50, "off_duty"), (3, "on_duty"), (2, "driving")])
+        self.add_statuses(self.other_log, [(1, "sleeper")])
+
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.DictReader(content.splitlines()))
+
+    def test_csv_export_filters_by_driver_and_days(self):
+        today = local_day(self.now)
+        response = self.client.get(
+            "/api/exports/duty-statuses",
+            {"driver_id": self.driver.id, "start": today - timedelta(days=1)},
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        rows = self.read_csv(response)
+        expected = [
+            status.duty_status
+            for status in DutyStatus.objects.filter(
+                daily_log__driver=self.driver,
+                timestamp__gte=day_start(today - timedelta(days=1)),
+            )
+        ]
+        self.assertEqual([row["duty_status"] for row in rows], expected)
+        self.assertEqual(list(rows[0]), EXPORT_COLUMNS)
+        self.assertEqual(rows[0]["driver_license"], "CDL-driver1")
+        self.assertEqual(rows[0]["truck_number"], "T-1")
+
+        response = self.client.get(
+            "/api/exports/duty-statuses", {"start": today, "end": today - timedelta(1)}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_spans_chunks(self):
+        DutyStatus.objects.bulk_create(
+            DutyStatus(
+                daily_log=self.log,
+                duty_status="driving",
+                location_address="I-35",
+                timestamp=self.now + timedelta(seconds=second),
+            )
+            for second in range(CHUNK_SIZE + 10)
+        )
+        rows = self.read_csv(self.client.get("/api/exports/duty-statuses"))
+        self.assertEqual(len(rows), DutyStatus.objects.count())
+
+    async def test_ndjson_export_streams_asynchronously(self):
+        response = await self.async_client.get(
+            "/api/exports/duty-statuses?format=ndjson"
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertTrue(response.is_async)
+        lines = [chunk async for chunk in response.streaming_content]
+        rows = [json.loads(line) for line in b"".join(lines).decode().splitlines()]
+        self.assertEqual(
+            [row["duty_status"] for row in rows],
+            ["off_duty", "on_duty", "driving", "sleeper"],
+        )
+
+    def test_command_writes_the_same_export(self):
+        response = self.client.get(
+            "/api/exports/duty-statuses",
+            {"driver_id": self.driver.id, "format": "ndjson"},
+        )
+        expected = b"".join(response.streaming_content).decode()
+
+        stdout = StringIO()
+        call_command(
+            "export_duty_statuses",
+            "--driver",
+            str(self.driver.id),
+            "--format",
+            "ndjson",
+            stdout=stdout,
+        )
+        self.assertEqual(stdout.getvalue(), expected)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.csv")
+            call_command("export_duty_statuses", "--output", path, stdout=StringIO())
+            with open(path, newline="") as file:
+                self.assertEqual(len(list(csv.DictReader(file))), 4)
+
+
+class SimulatorTests(TestCase):
+    def test_simulated_trips_are_compliant_and_split_into_daily_logs(self):
+        stdout = StringIO()
+        call_command(
+            "simulate_fleet",
+            "--drivers=3",
+            "--days=10",
+            "--seed=1",
+            stdout=stdout,
+        )
+        self.assertIn("Simulated 3 drivers over 10 days", stdout.getvalue())
+
+        drivers = Driver.objects.filter(user__username__startswith="sim-")
+        self.assertEqual(drivers.count(), 3)
+        self.assertEqual(DriverPosition.objects.filter(driver__in=drivers).count(), 3)
+        for driver in drivers:
+            self.assertEqual(evaluate_driver(driver.id)["violations"], [])
+            logs = DailyLog.objects.filter(driver=driver).order_by("created_at")
+            self.assertEqual(logs.count(), 10)
+            self.assertEqual(DailyDutyTotal.objects.filter(driver=driver).count(), 10)
+            for index, log in enumerate(logs):
+                timestamps = [status.timestamp for status in log.duty_statuses.all()]
+                self.assertEqual(log.created_at, timestamps[0])
+                self.assertEqual(
+                    {local_day(timestamp) for timestamp in timestamps},
+                    {local_day(log.created_at)},
+                )
+                if index:
+                    self.assertEqual(timestamps[0], day_start(local_day(timestamps[0])))
+            self.assertIn(
+                "driving",
+                DutyStatus.objects.filter(daily_log__driver=driver).values_list(
+                    "duty_status", flat=True
+                ),
+            )
+
+        with self.assertRaises(ValueError):
+            simulate_fleet(1, 1)
+
+
+class BenchmarkTests(TestCase):
+    def test_every_endpoint_has_a_case(self):
+        sample = dict.fromkeys(
+            [
+                "driver",
+                "truck",
+                "trailer",
+                "log",
+                "status",
+                "receipt",
+                "log_body",
+                "status_body",
+            ],
+            1,
+        )
+        operations = {
+            f"{method.upper()} {path}"
+            for path, methods in api.get_openapi_schema()["paths"].items()
+            for method in methods
+        }
+        self.assertEqual({name for name, *_ in benchmark_cases(sample)}, operations)
+
+    def test_cases_are_measured_and_writes_rolled_back(self):
+        simulate_fleet(drivers=1, days=5, prefix="bench", seed=1)
+        statuses = DutyStatus.objects.count()
+
+        results = run_benchmarks(iterations=2, only=["duty-statuses", "cycle", "Auth"])
+
+        self.assertEqual(DutyStatus.objects.count(), statuses)
+        batch = results["POST /api/duty-statuses/batch"]
+        self.assertGreater(batch["latency_ms"]["p50"], 0)
+        self.assertGreater(batch["queries"], 0)
+        self.assertGreater(batch["peak_memory_kb"], 0)
+        self.assertIn(
+            "cached_latency_ms", results["GET /api/duty-statuses/{duty_status_id}"]
+        )
+        self.assertEqual(results["Driver.get_current_cycle_hours"]["queries"], 0)
+        self.assertGreater(results["cycle.refresh_cycle_snapshot"]["queries"], 0)
+        # Session, user and driver, against none for a token
+        self.assertEqual(results["Auth: session"]["queries"], 3)
+        self.assertEqual(results["Auth: bearer token"]["queries"], 0)
+
+
+class HosEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=20)
+
+    def timeline(self, *segments):
+        """Build events from (hours, duty_status) durations laid end to end"""
+        events, at = [], self.start
+        for hours, duty_status in segments:
+            events.append((at, duty_status))
+            at += timedelta(hours=hours)
+        return events, at
+
+    def rules(self, report):
+        return [violation["rule"] for violation in report["violations"]]
+
+    def test_compliant_day(self):
+        events, end = self.timeline(
+            (1, "on_duty"), (6, "driving"), (0.5, "off_duty"), (4, "driving")
+        )
+
+        report = evaluate_timeline(events, as_of=end)
+
+        self.assertEqual(report["violations"], [])
+        self.assertEqual(report["clocks"]["driving_remaining"], 1)
+        self.assertEqual(report["clocks"]["window_remaining"], 2.5)
+        self.assertEqual(report["clocks"]["available_to_drive"], 1)
+
+    def test_driving_limit_and_missing_break(self):
+        events, end = self.timeline((12, "driving"))
+
+        report = evaluate_timeline(events, as_of=end)
+
+        self.assertEqual(self.rules(report), ["driving_11h", "break_30m"])
+        occurred = {v["rule"]: v["occurred_at"] for v in report["violations"]}
+        self.assertEqual(occurred["driving_11h"], self.start + timedelta(hours=11))
+        self.assertEqual(occurred["break_30m"], self.start + timedelta(hours=8))
+
+    def test_fourteen_hour_window(self):
+        events, end = self.timeline(
+            (7, "on_duty"), (4, "driving"), (3, "off_duty"), (1, "driving")
+        )
+
+        report = evaluate_timeline(events, as_of=end)
+
+        self.assertEqual(self.rules(report), ["window_14h"])
+
+    def test_ten_hour_reset_restores_daily_clocks(self):
+        events, end = self.timeline((11, "driving"), (10, "sleeper_berth"))
+
+        report = evaluate_timeline(events, as_of=end)
+
+        self.assertEqual(report["clocks"]["driving_remaining"], 11)
+        self.assertEqual(report["clocks"]["off_duty_elapsed"], 10)
+
+    def test_cycle_limit_and_34_hour_restart(self):
+        workday = [(1, "on_duty"), (7.5, "driving"), (0.5, "off_duty")]
+        workday += [(3, "driving"), (12, "off_duty")]
+        events, end = self.timeline(*(workday * 7))
+
+        report = evaluate_timeline(events, as_of=end)
+        self.assertIn("cycle_70h", self.rules(report))
+        self.assertEqual(report["clocks"]["cycle_remaining"], 0)
+
+        events, end = self.timeline(*(workday * 5), (34, "off_duty"))
+        report = evaluate_timeline(events, as_of=end)
+        self.assertEqual(report["clocks"]["cycle_remaining"], 70)
+
+    def test_long_timeline_is_fast(self):
+        pattern = [(1, "on_duty"), (5, "driving"), (1, "off_duty"), (5, "driving")]
+        pattern += [(10, "sleeper_berth"), (2, "off_duty")]
+        events, end = self.timeline(*(pattern * 5000))
+
+        started = time.perf_counter()
+        evaluate_timeline(events, as_of=end)
+
+        self.assertLess(time.perf_counter() - started, 1)
+
+
+class HosApiTests(TripsTestCase):
+    def test_driver_report_and_fleet_batch(self):
+        self.add_statuses(self.make_log(), [(13, "driving"), (1, "off_duty")])
+
+        response = self.client.get(f"/api/drivers/{self.driver.id}/hos")
+
+        body = response.json()
+        self.assertEqual(body["current_status"], "off_duty")
+        self.assertEqual(
+            [v["rule"] for v in body["violations"]], ["driving_11h", "break_30m"]
+        )
+        fleet = evaluate_fleet()
+        self.assertEqual(list(fleet), [self.driver.id])
+        fleet_rules = [v["rule"] for v in fleet[self.driver.id]["violations"]]
+        self.assertEqual(fleet_rules, ["driving_11h", "break_30m"])
+
+    def test_driver_report_and_fleet_summary_share_the_cycle(self):
+        # 8 hours on and 12 off, with no 34-hour restart, across 9 days
+        statuses = []
+        for hours_ago in range(215, 0, -20):
+            statuses += [(hours_ago, "on_duty"), (hours_ago - 8, "off_duty")]
+        self.add_statuses(self.make_log(), statuses)
+
+        report = self.client.get(f"/api/drivers/{self.driver.id}/hos").json()
+        summary = self.client.get("/api/fleet/hos-summary").json()
+
+        self.assertAlmostEqual(
+            report["clocks"]["cycle_remaining"],
+            summary[0]["cycle_hours_remaining"],
+            delta=0.01,
+        )
+
+
+class DailyLogGridTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def add_at(self, daily_log, hour, minute, duty_status):
+        return DutyStatus.objects.create(
+            daily_log=daily_log,
+            duty_status=duty_status,
+            location_address="Dallas, TX",
+            timestamp=self.day + timedelta(hours=hour, minutes=minute),
+        )
+
+    def test_slots_totals_and_transitions(self):
+        log = self.make_log()
+        self.add_at(log, 6, 10, "on_duty")
+        self.add_at(log, 7, 0, "driving")
+        self.add_at(log, 12, 50, "off_duty")
+
+        grid = self.client.get(f"/api/daily-logs/{log.id}/grid").json()
+
+        self.assertEqual(len(grid["slots"]), 96)
+        self.assertEqual(grid["date"], self.day.date().isoformat())
+        self.assertEqual(
+            grid["totals"],
+            {"off_duty": 6 + 11.25, "sleeper_berth": 0, "driving": 5.75, "on_duty": 1},
+        )
+        self.assertEqual(
+            grid["transitions"],
+            [
+                {"slot": 0, "status": "off_duty"},
+                {"slot": 24, "status": "on_duty"},
+                {"slot": 28, "status": "driving"},
+                {"slot": 51, "status": "off_duty"},
+            ],
+        )
+
+    def test_cached_until_statuses_change(self):
+        log = self.make_log()
+        self.add_at(log, 8, 0, "driving")
+        url = f"/api/daily-logs/{log.id}/grid"
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        self.add_at(log, 9, 0, "off_duty")
+        grid = self.client.get(url).json()
+        self.assertEqual(grid["totals"]["driving"], 1)
+
+    def test_unknown_timezone(self):
+        log = self.make_log()
+
+        response = self.client.get(f"/api/daily-logs/{log.id}/grid?tz=Mars/Base")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class PrintableLogTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log = self.make_log()
+        self.add_statuses(self.log, [(3, "on_duty"), (2, "driving")])
+
+    def test_pdf_and_svg_pages(self):
+        url = f"/api/daily-logs/{self.log.id}/print"
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.content.startswith(b"%PDF-1.4"))
+        self.assertIn(b"/Count 1", response.content)
+        revalidated = self.client.get(url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+
+        svg = self.client.get(url, {"format": "svg", "tz": "America/Chicago"})
+        self.assertEqual(svg["Content-Type"], "image/svg+xml")
+        self.assertIn(b"SLEEPER BERTH", svg.content)
+        self.assertIn(b"Test driver1", svg.content)
+        self.assertIn(b"America/Chicago", svg.content)
+        self.assertIn(b"<polyline", svg.content)
+
+        self.assertEqual(self.client.get(url, {"tz": "Mars/Base"}).status_code, 400)
+
+    def test_pages_cached_by_content(self):
+        self.client.get(f"/api/daily-logs/{self.log.id}/print")
+        zone = timezone.get_current_timezone()
+        key = _page_key(log_sheet(self.log, zone), "pdf")
+        self.assertEqual(cache.get(key), RENDERERS["pdf"][0](log_sheet(self.log, zone)))
+
+        self.add_statuses(self.log, [(1, "off_duty")])
+        self.assertNotEqual(_page_key(log_sheet(self.log, zone), "pdf"), key)
+        self.log.truck.truck_number = "T-2"
+        self.assertNotEqual(_page_key(log_sheet(self.log, zone), "pdf"), key)
+
+    def test_driver_batch_renders_last_eight_days(self):
+        second = self.make_log()
+        self.add_statuses(second, [(30, "driving")])
+        old = self.make_log()
+        self.add_statuses(old, [(24 * 10, "driving")])
+        DailyLog.objects.filter(id=old.id).update(
+            created_at=self.now - timedelta(days=10)
+        )
+        sheets = driver_sheets(self.driver.id, timezone.get_current_timezone())
+        self.assertEqual(
+            {sheet["daily_log_id"] for sheet in sheets}, {self.log.id, second.id}
+        )
+        self.assertEqual(sheets, sorted(sheets, key=lambda sheet: sheet["date"]))
+
+        url = f"/api/drivers/{self.driver.id}/daily-logs/print"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"/Count 2", response.content)
+
+        cache.clear()
+        with self.settings(LOG_RENDER_WORKERS=2):
+            self.assertEqual(self.client.get(url).content, response.content)
+
+        other = self.make_driver("driver2")
+        response = self.client.get(f"/api/drivers/{other.id}/daily-logs/print")
+        self.assertEqual(response.status_code, 404)
+
+
+class FleetSummaryTests(TripsTestCase):
+    def test_summary_uses_fixed_number_of_queries(self):
+        other = self.make_driver("driver2")
+        idle = self.make_driver("driver3")
+        self.add_statuses(self.make_log(), [(3, "driving"), (1, "off_duty")])
+        self.add_statuses(self.make_log(other), [(2, "on_duty")])
+
+        # drivers, cycle refresh + save for the idle driver's empty snapshot,
+        # recent and idle drivers' latest statuses, today's totals
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/fleet/hos-summary")
+        for index in range(10):
+            self.make_driver(f"bulk{index}")
+        with self.assertNumQueries(6):
+            self.client.get("/api/fleet/hos-summary")
+
+        summary = {row["driver_id"]: row for row in response.json()}
+        self.assertEqual(set(summary), {self.driver.id, other.id, idle.id})
+        self.assertEqual(summary[self.driver.id]["cycle_hours_used"], 2)
+        self.assertEqual(
+            summary[self.driver.id]["last_status"]["duty_status"], "off_duty"
+        )
+        self.assertEqual(summary[other.id]["cycle_hours_remaining"], 68)
+        self.assertIsNone(summary[idle.id]["last_status"])
+
+    def test_stale_snapshots_are_refreshed_with_their_status(self):
+        self.add_statuses(self.make_log(), [(10, "on_duty"), (4, "off_duty")])
+        # A snapshot gone stale while the driver was on duty
+        Driver.objects.filter(id=self.driver.id).update(
+            cycle_seconds=0,
+            cycle_status="on_duty",
+            cycle_computed_at=self.now - timedelta(hours=1),
+        )
+
+        summary = self.client.get("/api/fleet/hos-summary").json()
+
+        self.assertEqual(summary[0]["cycle_hours_used"], 6)
+        driver = Driver.objects.get(id=self.driver.id)
+        self.assertEqual(
+            (driver.cycle_seconds, driver.cycle_status), (6 * 3600, "off_duty")
+        )
+
+    def test_filter_by_driver(self):
+        other = self.make_driver("driver2")
+
+        response = self.client.get(f"/api/fleet/hos-summary?driver_ids={other.id}")
+
+        self.assertEqual([row["driver_id"] for row in response.json()], [other.id])
+
+
+class DriverPositionTests(TripsTestCase):
+    def locate(self, daily_log, hours_ago, latitude, longitude, duty_status="driving"):
+        return DutyStatus.objects.create(
+            daily_log=daily_log,
+            duty_status=duty_status,
+            location_address=f"{latitude}, {longitude}",
+            latitude=latitude,
+            longitude=longitude,
+            timestamp=self.now - timedelta(hours=hours_ago),
+        )
+
+    def place(self, count, seed=1):
+        """Drivers at random positions; returns {driver_id: (latitude, longitude)}"""
+        rng = random.Random(seed)
+        users = User.objects.bulk_create(
+            User(username=f"placed{seed}-{index}") for index in range(count)
+        )
+        drivers = Driver.objects.bulk_create(
+            Driver(user=user, license_number=user.username, phone="555", address="-")
+            for user in users
+        )
+        points = {
+            driver.id: (rng.uniform(-89, 89), rng.uniform(-180, 180))
+            for driver in drivers
+        }
+        DriverPosition.objects.bulk_create(
+            DriverPosition(
+                driver_id=driver_id,
+                latitude=latitude,
+                longitude=longitude,
+                geohash=encode(latitude, longitude),
+                duty_status="driving",
+                location_address="-",
+                timestamp=self.now,
+            )
+            for driver_id, (latitude, longitude) in points.items()
+        )
+        return points
+
+    def test_geohash_and_distance(self):
+        self.assertEqual(encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertAlmostEqual(
+            haversine_km(32.7767, -96.797, 33.749, -84.388), 1160, delta=5
+        )
+
+    def test_position_follows_latest_located_status(self):
+        log = self.make_log()
+        self.locate(log, 3, 32.7767, -96.797)
+        latest = self.locate(log, 1, 33.749, -84.388, "on_duty")
+        self.add_statuses(log, [(0, "off_duty")])
+
+        position = DriverPosition.objects.get(driver=self.driver)
+        self.assertEqual((position.latitude, position.duty_status), (33.749, "on_duty"))
+        self.assertEqual(position.geohash, encode(33.749, -84.388))
+
+        latest.delete()
+        self.assertEqual(
+            DriverPosition.objects.get(driver=self.driver).latitude, 32.7767
+        )
+        log.duty_statuses.all().delete()
+        self.assertFalse(DriverPosition.objects.filter(driver=self.driver).exists())
+
+    def test_searches_match_a_full_scan(self):
+        points = self.place(2000)
+        route = [(60, 170), (62, -175), (64, -160)]
+        for latitude, longitude, radius in [
+            (40, -100, 1500),
+            (10, 179.5, 800),
+            (88, 0, 600),
+            (-30, 20, 50),
+        ]:
+            expected = {
+                driver_id
+                for driver_id, point in points.items()
+                if haversine_km(latitude, longitude, *point) <= radius
+            }
+            found = drivers_within(latitude, longitude, radius)
+            self.assertEqual({row["driver_id"] for row in found}, expected)
+            distances = [row["distance_km"] for row in found]
+            self.assertEqual(distances, sorted(distances))
+
+        along = drivers_along(route, 400)
+        self.assertTrue(along)
+        self.assertTrue(all(row["distance_km"] <= 400 for row in along))
+        self.assertTrue(
+            all(
+                haversine_km(*points[row["driver_id"]], *route[1]) <= 2500
+                for row in along
+            )
+        )
+
+    def test_nearby_and_corridor_endpoints(self):
+        dallas, atlanta = self.make_log(), self.make_log(self.make_driver("driver2"))
+        self.locate(dallas, 1, 32.7767, -96.797)
+        self.locate(atlanta, 1, 33.749, -84.388)
+
+        with self.assertNumQueries(1):
+            nearest = self.client.get("/api/drivers/nearby?lat=32.9&lon=-96.8&limit=1")
+        self.assertEqual([row["driver_id"] for row in nearest.json()], [self.driver.id])
+        self.assertAlmostEqual(nearest.json()[0]["distance_km"], 13.7, delta=0.5)
+
+        both = self.client.get("/api/drivers/nearby?lat=32.9&lon=-96.8&limit=5")
+        self.assertEqual(len(both.json()), 2)
+        within = self.client.get("/api/drivers/nearby?lat=32.9&lon=-96.8&radius_km=100")
+        self.assertEqual(len(within.json()), 1)
+
+        corridor = self.client.post(
+            "/api/drivers/corridor",
+            {"route": [[32.5, -97], [33.5, -84.5]], "width_km": 50},
+            content_type="application/json",
+        )
+        rows = corridor.json()
+        self.assertEqual(
+            [row["driver_id"] for row in rows], [self.driver.id, atlanta.driver_id]
+        )
+        self.assertLess(rows[0]["along_route_km"], rows[1]["along_route_km"])
+
+        self.assertEqual(
+            self.client.get("/api/drivers/nearby?lat=91&lon=0").status_code, 400
+        )
+
+    def test_corridor_accepts_the_longest_route(self):
+        dallas = self.make_log()
+        self.locate(dallas, 1, 32.7767, -96.797)
+        # Dallas to Atlanta in MAX_ROUTE_POINTS steps
+        route = [
+            [32.5 + step / MAX_ROUTE_POINTS, -97 + 12.5 * step / MAX_ROUTE_POINTS]
+            for step in range(MAX_ROUTE_POINTS)
+        ]
+        response = self.client.post(
+            "/api/drivers/corridor",
+            {"route": route, "width_km": 50},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["driver_id"] for row in response.json()], [self.driver.id]
+        )
+
+        too_long = self.client.post(
+            "/api/drivers/corridor",
+            {"route": route + [[33.5, -84.5]], "width_km": 50},
+            content_type="application/json",
+        )
+        self.assertEqual(too_long.status_code, 400)
+
+
+class DailyDutyTotalTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.yesterday = local_day(self.now) - timedelta(days=1)
+        self.midnight = day_start(self.yesterday + timedelta(days=1))
+
+    def add_at(self, daily_log, moment, duty_status):
+        return DutyStatus.objects.create(
+            daily_log=daily_log,
+            duty_status=duty_status,
+            location_address="Dallas, TX",
+            timestamp=moment,
+        )
+
+    def totals(self):
+        return {
+            row.day: row for row in DailyDutyTotal.objects.filter(driver=self.driver)
+        }
+
+    def test_spans_are_split_at_midnight(self):
+        log = self.make_log()
+        self.add_at(log, self.midnight - timedelta(hours=3), "on_duty")
+        self.add_at(log, self.midnight - timedelta(hours=2), "driving")
+        self.add_at(log, self.midnight + timedelta(hours=1), "off_duty")
+
+        totals = self.totals()
+
+        yesterday, today = totals[self.yesterday], totals[local_day(self.midnight)]
+        self.assertEqual(yesterday.on_duty_minutes, 60)
+        self.assertEqual(yesterday.driving_minutes, 120)
+        self.assertEqual(
+            (yesterday.first_status, yesterday.last_status), ("on_duty", "driving")
+        )
+        self.assertEqual(today.driving_minutes, 60)
+        self.assertEqual(today.off_duty_minutes, 0)
+        self.assertEqual(
+            (today.first_status, today.last_status), ("driving", "off_duty")
+        )
+
+    def test_edits_and_deletes_update_affected_days(self):
+        log = self.make_log()
+        self.add_at(log, self.midnight - timedelta(hours=3), "driving")
+        off_duty = self.add_at(log, self.midnight - timedelta(hours=1), "off_duty")
+
+        off_duty.timestamp = self.midnight + timedelta(hours=2)
+        off_duty.save()
+        totals = self.totals()
+        self.assertEqual(totals[self.yesterday].driving_minutes, 180)
+        self.assertEqual(totals[local_day(self.midnight)].driving_minutes, 120)
+
+        off_duty.delete()
+        self.assertEqual(list(self.totals()), [self.yesterday])
+
+    def test_rebuild_command_matches_incremental_totals(self):
+        log = self.make_log()
+        for hours, duty_status in [(30, "on_duty"), (29, "driving"), (20, "off_duty")]:
+            self.add_at(log, self.now - timedelta(hours=hours), duty_status)
+        incremental = {
+            day: (row.driving_minutes, row.on_duty_minutes, row.last_status)
+            for day, row in self.totals().items()
+        }
+
+        call_command("rebuild_daily_totals", stdout=StringIO())
+
+        rebuilt = {
+            day: (row.driving_minutes, row.on_duty_minutes, row.last_status)
+            for day, row in self.totals().items()
+        }
+        self.assertEqual(rebuilt, incremental)
+
+    def test_reassigning_a_log_moves_its_totals(self):
+        other = self.make_driver("driver2")
+        log = self.make_log()
+        self.add_statuses(log, [(10, "on_duty"), (9, "driving"), (4, "off_duty")])
+        self.assertEqual(
+            Driver.objects.get(id=self.driver.id).get_remaining_hours(), 64
+        )
+
+        response = self.client.put(
+            f"/api/daily-logs/{log.id}",
+            {"driver_id": other.id},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), {})
+        self.assertAlmostEqual(
+            sum(row.driving_minutes for row in other.daily_totals.all()), 300
+        )
+        self.assertEqual(
+            Driver.objects.get(id=self.driver.id).get_remaining_hours(), 70
+        )
+        self.assertEqual(Driver.objects.get(id=other.id).get_remaining_hours(), 64)
+
+
+class MileageTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.midnight = day_start(local_day(self.now))
+
+    def add_at(self, daily_log, hours, duty_status, latitude, longitude=-97.0):
+        """A status `hours` after midnight today, on the -97 meridian"""
+        return DutyStatus.objects.create(
+            daily_log=daily_log,
+            duty_status=duty_status,
+            location_address="I-35",
+            latitude=latitude,
+            longitude=longitude,
+            timestamp=self.midnight + timedelta(hours=hours),
+        )
+
+    def miles(self):
+        days = {
+            row.day: float(row.miles)
+            for row in DailyDutyTotal.objects.filter(driver=self.driver)
+        }
+        logs = dict(DailyLog.objects.values_list("id", "miles"))
+        return days, {log_id: float(miles) for log_id, miles in logs.items()}
+
+    def test_legs(self):
+        self.assertEqual(
+            [
+                round(leg, 1) if leg else leg
+                for leg in leg_miles([32, 33, None], [-97] * 3)
+            ],
+            [69.1, None],
+        )
+
+    def test_driving_legs_count_on_their_log_and_days(self):
+        yesterday, today = self.make_log(), self.make_log()
+        self.add_at(yesterday, -3, "on_duty", 31.9)
+        self.add_at(yesterday, -2, "driving", 32.0)
+        self.add_at(today, 2, "off_duty", 33.0)
+
+        days, logs = self.miles()
+        self.assertEqual(
+            days,
+            {
+                self.midnight.date() - timedelta(days=1): 34.5,
+                self.midnight.date(): 34.5,
+            },
+        )
+        self.assertEqual(logs, {yesterday.id: 69.1, today.id: 0})
+
+        listed = self.client.get("/api/daily-logs").json()["items"]
+        self.assertEqual(
+            {row["id"]: row["miles"] for row in listed}[yesterday.id], 69.1
+        )
+        # A status inside the leg splits it between the logs
+        self.add_at(today, 0, "driving", 32.5)
+        self.assertEqual(self.miles()[1], {yesterday.id: 34.5, today.id: 34.5})
+        listed = self.client.get("/api/daily-logs").json()["items"]
+        self.assertEqual({row["id"]: row["miles"] for row in listed}[today.id], 34.5)
+
+    def test_rebuild_command_matches_incremental_miles(self):
+        log = self.make_log()
+        for hours, duty_status, latitude in [
+            (-20, "driving", 30.0),
+            (-17, "driving", 31.1),
+            (-14, "on_duty", 32.3),
+            (-13, "driving", 32.3),
+            (1, "off_duty", 35.0),
+        ]:
+            self.add_at(log, hours, duty_status, latitude)
+        incremental = self.miles()
+        DailyLog.objects.update(miles=0)
+
+        call_command("rebuild_daily_totals", stdout=StringIO())
+
+        self.assertEqual(self.miles(), incremental)
+        self.assertAlmostEqual(incremental[1][log.id], 5 * 69.1, delta=0.5)
+
+
+def unavailable_provider(waypoints):
+    raise RouteUnavailable("offline")
+
+
+def unreachable_provider(waypoints):
+    unreachable_provider.calls += 1
+    raise ProviderUnreachable("timed out")
+
+
+unreachable_provider.calls = 0
+
+
+class RoutingTests(TestCase):
+    DALLAS_ATLANTA = "32.7767,-96.797;33.749,-84.388"
+
+    def test_polyline_round_trip(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(points), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        self.assertEqual(decode_polyline(encode_polyline(points)), points)
+
+    @override_settings(
+        ROUTE_PROVIDERS=[f"{__name__}.unavailable_provider", "straight_line"]
+    )
+    def test_falls_back_and_caches_by_rounded_waypoints(self):
+        first = self.client.get(f"/api/routes?waypoints={self.DALLAS_ATLANTA}").json()
+        self.assertEqual((first["provider"], first["cached"]), ("straight_line", False))
+        self.assertAlmostEqual(first["distance_km"], 1160 * 1.2, delta=10)
+        points = decode_polyline(first["polyline"])
+        self.assertEqual(
+            (points[0], points[-1]), ((32.777, -96.797), (33.749, -84.388))
+        )
+        self.assertGreater(len(points), 50)
+
+        with self.assertNumQueries(1):
+            again = self.client.get(
+                "/api/routes?waypoints=32.77671,-96.79702;33.74898,-84.388"
+            ).json()
+        self.assertEqual({**again, "cached": False}, first)
+
+    @override_settings(
+        ROUTE_PROVIDERS=[f"{__name__}.unreachable_provider", "straight_line"]
+    )
+    def test_an_unreachable_provider_is_skipped_for_a_while(self):
+        cache.clear()
+        unreachable_provider.calls = 0
+        dallas, atlanta = (32.7767, -96.797), (33.749, -84.388)
+
+        self.assertEqual(get_route([dallas, atlanta])["provider"], "straight_line")
+        with self.assertNumQueries(1):
+            self.assertTrue(get_route([dallas, atlanta])["cached"])
+        self.assertEqual(unreachable_provider.calls, 1)
+
+        cache.clear()
+        get_route([dallas, atlanta])
+        self.assertEqual(unreachable_provider.calls, 2)
+
+    @override_settings(ROUTE_PROVIDERS=["straight_line"], ROUTE_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_routes_are_evicted(self):
+        now = timezone.now()
+        dallas, atlanta, denver = (
+            (32.7767, -96.797),
+            (33.749, -84.388),
+            (39.74, -104.99),
+        )
+        get_route([dallas, atlanta], now=now)
+        get_route([dallas, denver], now=now + timedelta(hours=1))
+        self.assertTrue(
+            get_route([dallas, atlanta], now=now + timedelta(hours=2))["cached"]
+        )
+        get_route([atlanta, denver], now=now + timedelta(hours=3))
+
+        self.assertFalse(get_route([dallas, denver])["cached"])
+        self.assertEqual(RouteGeometry.objects.count(), 2)
+
+    @override_settings(ROUTE_PROVIDERS=[f"{__name__}.unavailable_provider"])
+    def test_no_provider_and_bad_waypoints(self):
+        response = self.client.get(f"/api/routes?waypoints={self.DALLAS_ATLANTA}")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            self.client.get("/api/routes?waypoints=32.7,-96.7").status_code, 400
+        )
+
+
+class ArchiveTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_log = self.make_log(status="completed")
+        self.then = self.now - timedelta(days=200)
+        DailyLog.objects.filter(id=self.old_log.id).update(created_at=self.then)
+        for hours, duty_status in [(0, "on_duty"), (1, "driving"), (9, "off_duty")]:
+            DutyStatus.objects.create(
+                daily_log=self.old_log,
+                duty_status=duty_status,
+                location_address="Dallas, TX",
+                latitude="32.776700",
+                longitude="-96.797000",
+                timestamp=self.then + timedelta(hours=hours),
+                idempotency_key=f"old-{hours}",
+            )
+        self.recent_log = self.make_log(status="completed")
+        self.add_statuses(self.recent_log, [(5, "on_duty"), (4, "driving")])
+
+    def responses(self, daily_log_id):
+        return [
+            self.client.get(path).json()
+            for path in [
+                f"/api/daily-logs/{daily_log_id}?expand=driver,truck",
+                f"/api/daily-logs/{daily_log_id}/duty-statuses",
+            ]
+        ]
+
+    def test_archived_logs_read_through_and_restore(self):
+        live = self.responses(self.old_log.id)
+
+        moved = archive_daily_logs(self.now - timedelta(days=183), batch_size=1)
+        self.assertEqual((moved["logs"], moved["duty_statuses"]), (1, 3))
+        self.assertLess(moved["stored_bytes"], moved["raw_bytes"])
+        self.assertEqual(
+            list(DailyLog.objects.values_list("id", flat=True)), [self.recent_log.id]
+        )
+        self.assertFalse(DutyStatus.objects.filter(daily_log=self.old_log.id))
+        segment = ArchiveSegment.objects.get()
+        self.assertEqual(
+            (segment.month, segment.logs, segment.duty_statuses),
+            (local_day(self.then).replace(day=1), 1, 3),
+        )
+
+        self.assertEqual(self.responses(self.old_log.id), live)
+        self.assertEqual(
+            [item["id"] for item in self.client.get("/api/daily-logs").json()["items"]],
+            [self.recent_log.id],
+        )
+
+        call_command("restore_daily_logs", month=[segment.month], stdout=StringIO())
+        self.assertFalse(ArchivedDailyLog.objects.exists())
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertEqual(self.responses(self.old_log.id), live)
+
+    def test_totals_rebuild_reads_the_archive(self):
+        totals = list(DailyDutyTotal.objects.order_by("day").values())
+        archive_daily_logs(self.now - timedelta(days=183))
+        call_command("rebuild_daily_totals", stdout=StringIO())
+        self.assertEqual(
+            [
+                {**total, "id": None, "updated_at": None}
+                for total in DailyDutyTotal.objects.order_by("day").values()
+            ],
+            [{**total, "id": None, "updated_at": None} for total in totals],
+        )
+
+    def test_recent_logs_are_never_archived(self):
+        with self.assertRaises(ValueError):
+            archive_daily_logs(self.now - timedelta(days=2))
+
+
+class TokenAuthTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.driver.user.set_password("secret")
+        self.driver.user.save()
+
+    def login(self):
+        return self.client.post(
+            "/api/login",
+            {"username": "driver1", "password": "secret"},
+            content_type="application/json",
+        ).json()
+
+    def me(self, token):
+        return self.client.get("/api/me", headers={"Authorization": f"Bearer {token}"})
+
+    def test_login_token_authenticates_without_queries(self):
+        login = self.login()
+        self.assertTrue(login["success"])
+        self.assertGreater(login["expires_at"], self.now.isoformat())
+
+        self.me(login["token"])
+        with self.assertNumQueries(0):
+            response = self.me(login["token"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["driver_id"], self.driver.id)
+        self.assertEqual(response.json()["username"], "driver1")
+
+        self.assertEqual(self.me(login["token"] + "x").status_code, 401)
+        with override_settings(AUTH_TOKEN_MAX_AGE=-1):
+            expired = self.login()["token"]
+        self.assertEqual(self.me(expired).status_code, 401)
+        self.assertEqual(self.client.get("/api/me").status_code, 401)
+
+    def test_session_still_authenticates(self):
+        self.client.force_login(self.driver.user)
+        response = self.client.get("/api/me")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["driver_id"], self.driver.id)
+        self.assertIsNone(response.json()["expires_at"])
+
+    def test_logout_revokes_the_token(self):
+        token, other = self.login()["token"], self.login()["token"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/logout", headers={"Authorization": f"Bearer {token}"}
+            )
+
+        self.assertEqual(self.me(token).status_code, 401)
+        self.assertEqual(self.me(other).status_code, 200)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        # As another process sees it once it reloads the denylist
+        load_denylist()
+        self.assertEqual(self.me(token).status_code, 401)
+
+
+@override_settings(DUTY_STATUS_WRITE_BEHIND=True)
+class WriteBehindTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # Not started: the tests flush it themselves
+        self.queue = writebehind._queue = WriteBehindQueue(self.directory, 60, 500)
+        self.addCleanup(setattr, writebehind, "_queue", None)
+        self.addCleanup(self.queue.journal.close)
+        self.log = self.make_log()
+
+    def post(self, daily_log_id=None, **fields):
+        return self.client.post(
+            f"/api/daily-logs/{daily_log_id or self.log.id}/duty-statuses",
+            {
+                "duty_status": "driving",
+                "location_address": "Dallas, TX",
+                "timestamp": self.now.isoformat(),
+                **fields,
+            },
+            content_type="application/json",
+        )
+
+    def test_posts_are_journaled_then_stored_together(self):
+        responses = [self.post() for _ in range(3)]
+        self.assertEqual({response.status_code for response in responses}, {202})
+        receipts = [response.json()["receipt"] for response in responses]
+        self.assertEqual(
+            self.post(idempotency_key="device-1").json()["receipt"], "device-1"
+        )
+        self.assertEqual(self.post(duty_status="napping").status_code, 400)
+        self.assertEqual(self.post(daily_log_id=self.log.id + 100).status_code, 404)
+
+        self.assertFalse(DutyStatus.objects.exists())
+        self.assertEqual(len(read_journal(self.queue.journal.path)), 4)
+        pending = self.client.get(f"/api/duty-statuses/receipts/{receipts[0]}")
+        self.assertEqual(pending.status_code, 202)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.queue.flush()
+        inserts = [
+            query
+            for query in queries
+            if query["sql"].startswith('INSERT INTO "trips_dutystatus"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(DutyStatus.objects.filter(daily_log=self.log).count(), 4)
+        self.assertEqual(self.queue.journal.path.stat().st_size, 0)
+        stored = self.client.get(f"/api/duty-statuses/receipts/{receipts[0]}")
+        self.assertEqual(stored.json()["idempotency_key"], receipts[0])
+        # Already stored: answered like the synchronous path
+        self.assertEqual(self.post(idempotency_key="device-1").status_code, 200)
+
+    def test_statuses_that_cannot_be_stored_are_dead_lettered(self):
+        store = writebehind.store
+
+        def refuse_bad(records):
+            if any(record["idempotency_key"] == "bad" for record in records):
+                raise DataError("value too long")
+            return store(records)
+
+        self.post()
+        self.post(idempotency_key="bad")
+        self.post()
+        with (
+            mock.patch.object(writebehind, "store", refuse_bad),
+            mock.patch.object(writebehind, "RETRY_SECONDS", 0),
+            self.assertLogs("trips.writebehind", "ERROR"),
+        ):
+            self.queue.flush()
+
+        self.assertEqual(DutyStatus.objects.count(), 2)
+        self.assertEqual(self.queue.journal.path.stat().st_size, 0)
+        dead = read_journal(os.path.join(self.directory, "dead-letter.jsonl"))
+        self.assertEqual([record["idempotency_key"] for record in dead], ["bad"])
+        self.assertIn("value too long", dead[0]["error"])
+        response = self.client.get("/api/duty-statuses/receipts/bad")
+        self.assertEqual(response.status_code, 422)
+
+        # Neither a failed receipt nor an unknown one holds a read
+        for receipt in ["bad", "never-queued"]:
+            started = time.monotonic()
+            self.client.get(
+                f"/api/daily-logs/{self.log.id}/duty-statuses",
+                headers={"X-Write-Receipt": receipt},
+            )
+            self.assertLess(time.monotonic() - started, 1)
+
+    def test_reads_wait_for_the_writers_receipt(self):
+        receipt = self.post().json()["receipt"]
+        self.assertFalse(self.queue.wait(receipt, 0))
+
+        waited = []
+        reader = threading.Thread(
+            target=lambda: waited.append(self.queue.wait(receipt, 5))
+        )
+        reader.start()
+        self.queue.flush()
+        reader.join()
+        self.assertEqual(waited, [True])
+
+        response = self.client.get(
+            f"/api/daily-logs/{self.log.id}/duty-statuses",
+            headers={"X-Write-Receipt": receipt},
+        )
+        self.assertEqual(
+            [status["idempotency_key"] for status in response.json()], [receipt]
+        )
+
+    def test_journals_of_stopped_processes_are_replayed(self):
+        record = {
+            "daily_log_id": self.log.id,
+            "duty_status": "off_duty",
+            "location_address": "Dallas, TX",
+            "latitude": None,
+            "longitude": None,
+            "timestamp": self.now.isoformat(),
+            "notes": None,
+        }
+        path = os.path.join(self.directory, "journal-1.jsonl")
+        for attempt in range(2):
+            journal = Journal(path)
+            for key in ["a", "b"]:
+                journal.append({**record, "idempotency_key": key})
+            journal.file.write(b'{"daily_log_id": ')
+            journal.close()
+            with override_settings(WRITE_BEHIND_DIR=self.directory):
+                self.assertTrue(writebehind.queued_elsewhere("a"))
+                self.assertFalse(writebehind.queued_elsewhere("c"))
+
+            call_command(
+                "replay_write_behind_journal", dir=self.directory, stdout=StringIO()
+            )
+            self.assertFalse(os.path.exists(path))
+            # Replaying what is already stored changes nothing
+            self.assertEqual(DutyStatus.objects.count(), 2)
+
+        # This process's journal is live, so it is left alone
+        self.post()
+        self.assertEqual(recover_journals(self.directory), 0)
+        self.assertEqual(len(read_journal(self.queue.journal.path)), 1)
+
+
+class AdminTests(TripsTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser("admin", password="admin")
+        self.client.force_login(admin)
+
+    def add_logs(self, count):
+        for index in range(count):
+            driver = self.make_driver(f"admin-{self.id()}-{DailyLog.objects.count()}")
+            log = self.make_log(driver=driver, co_driver=self.driver)
+            self.add_statuses(log, [(2, "on_duty"), (1, "driving")])
+        return log
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [
+            "/admin/trips/driver/",
+            "/admin/trips/dailylog/",
+            "/admin/trips/dutystatus/",
+        ]
+        self.add_logs(2)
+        before = [self.queries(url) for url in urls]
+        self.add_logs(10)
+        self.assertEqual([self.queries(url) for url in urls], before)
+
+    def test_daily_log_page_lists_latest_statuses(self):
+        log = self.add_logs(1)
+        url = f"/admin/trips/dailylog/{log.id}/change/"
+        # The first load also fills the content type cache
+        self.queries(url)
+        before = self.queries(url)
+        self.add_statuses(
+            log, [(hours, "driving") for hours in range(3, INLINE_DUTY_STATUSES + 13)]
+        )
+        self.assertEqual(self.queries(url), before)
+
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(len(formset.forms), INLINE_DUTY_STATUSES)
+        self.assertEqual(
+            formset.forms[0].instance,
+            log.duty_statuses.order_by("-timestamp", "-id").first(),
+        )
+        self.assertContains(response, f"?daily_log__id__exact={log.id}")
+        # Drivers, trucks and trailers are searched, not listed in full
+        fields = response.context["adminform"].form.fields
+        for name in ["driver", "co_driver", "truck", "trailer"]:
+            self.assertIsInstance(fields[name].widget.widget, AutocompleteSelect)
+
+    def test_paginator_counts_up_to_the_limit(self):
+        self.add_logs(3)
+        statuses = DutyStatus.objects.order_by("id")
+        with mock.patch("trips.pagination.EXACT_COUNT_LIMIT", 4):
+            self.assertIsNone(estimated_row_count(DutyStatus))
+            self.assertEqual(str(EstimatedCountPaginator(statuses, 2).count), "4+")
+            self.assertEqual(
+                EstimatedCountPaginator(statuses, 2, count_up_to=10).count, 6
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.assertEqual(estimated_row_count(DutyStatus), 6)
+            self.assertEqual(EstimatedCountPaginator(statuses, 2).count, 6)
+            filtered = statuses.filter(duty_status="driving")
+            self.assertEqual(EstimatedCountPaginator(filtered, 2).count, 3)
+
+    def test_every_page_of_a_long_filtered_list_can_be_reached(self):
+        self.add_logs(5)
+        url = "/admin/trips/dutystatus/?duty_status__exact=driving"
+        with (
+            mock.patch("trips.pagination.EXACT_COUNT_LIMIT", 1),
+            mock.patch("trips.admin.COUNTED_PAGES_AHEAD", 1),
+            mock.patch.object(DutyStatusAdmin, "list_per_page", 1),
+        ):
+            first = self.client.get(url)
+            last = self.client.get(f"{url}&p=5")
+
+        self.assertContains(first, "2+ duty")
+        self.assertEqual(last.status_code, 200)
+        self.assertEqual(last.context["cl"].result_count, 5)
+
+
+class DutyStatusEventTests(TripsTestCase):
+    def subscribe(self, channel):
+        subscription = QueueSubscription(channel)
+        get_hub().subscribe(subscription)
+        self.addCleanup(get_hub().unsubscribe, subscription)
+        return subscription
+
+    def events(self, subscription):
+        messages = []
+        while message := subscription.get(0):
+            event, data, _ = message.split("\n", 2)
+            self.assertEqual(event, "event: duty_status")
+            messages.append(json.loads(data.removeprefix("data: ")))
+        return messages
+
+    def test_changes_are_published_on_commit(self):
+        log, other_log = self.make_log(), self.make_log()
+        channels = [
+            log_channel(log.id),
+            driver_channel(self.driver.id),
+            FLEET,
+            log_channel(other_log.id),
+        ]
+        log_stream, driver_stream, fleet_stream, other_stream = map(
+            self.subscribe, channels
+        )
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            created = self.client.post(
+                f"/api/daily-logs/{log.id}/duty-statuses",
+                {
+                    "duty_status": "driving",
+                    "location_address": "Dallas, TX",
+                    "latitude": 32.7767,
+                    "timestamp": self.now.isoformat(),
+                },
+                content_type="application/json",
+            ).json()
+        self.assertEqual(self.events(log_stream), [])
+        for callback in callbacks:
+            callback()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = DutyStatus.objects.get(id=created["id"])
+            moved.daily_log = other_log
+            moved.save()
+            self.client.delete(f"/api/duty-statuses/{created['id']}")
+
+        self.assertEqual(
+            [event["action"] for event in self.events(log_stream)],
+            ["created", "updated"],
+        )
+        fleet_events = self.events(fleet_stream)
+        self.assertEqual(
+            [event["action"] for event in fleet_events],
+            ["created", "updated", "deleted"],
+        )
+        self.assertEqual(self.events(driver_stream), fleet_events)
+        self.assertEqual(len(self.events(other_stream)), 2)
+        self.assertEqual(fleet_events[0]["duty_status"], created)
+        self.assertEqual(fleet_events[0]["driver_id"], self.driver.id)
+        self.assertEqual(fleet_events[2]["duty_status"]["id"], created["id"])
+
+    def test_batches_are_published(self):
+        log = self.make_log()
+        stream = self.subscribe(FLEET)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/duty-statuses/batch",
+                [
+                    {
+                        "daily_log_id": log.id,
+                        "duty_status": "on_duty",
+                        "location_address": "Dallas, TX",
+                        "timestamp": (self.now + timedelta(minutes=i)).isoformat(),
+                    }
+                    for i in range(3)
+                ],
+                content_type="application/json",
+            )
+        self.assertEqual(
+            [event["action"] for event in self.events(stream)], ["created"] * 3
+        )
+
+    @override_settings(EVENT_HUB="trips.events.BrokerHub")
+    def test_broker_hub_and_slow_subscribers(self):
+        stream = self.subscribe(FLEET)
+        for index in range(QUEUE_SIZE):
+            get_hub().publish([FLEET], f"message {index}")
+        self.assertEqual(stream.get(0), "message 0")
+        self.assertFalse(stream.dropped)
+
+        get_hub().publish([FLEET], "one more")
+        get_hub().publish([FLEET], "and another")
+        self.assertTrue(stream.dropped)
+
+    async def test_streams_under_asgi(self):
+        response = await self.async_client.get(
+            "/api/fleet/duty-statuses/events?timeout=5"
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        self.assertIn(b": connected", await anext(chunks))
+
+        # Published from another thread, as a sync view's commit would be
+        await asyncio.to_thread(get_hub().publish, [FLEET], "event: test\n\n")
+        self.assertEqual(await anext(chunks), b"event: test\n\n")
+
+        # A client disconnecting cancels the task sending the response
+        waiting = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        self.assertEqual(get_hub().subscriber_count(), 0)
+
+    def test_timeout_is_bounded(self):
+        response = self.client.get("/api/fleet/duty-statuses/events?timeout=0")
+        self.assertEqual(
+            b"".join(response.streaming_content), b"retry: 3000\n: connected\n\n"
+        )
+        self.assertEqual(
+            self.client.get("/api/fleet/duty-statuses/events?timeout=-1").status_code,
+            400,
+        )
+
+
+@skipUnlessDBFeature("supports_explaining_query_execution")
+class QueryPlanTests(TripsTestCase):
+    """The hot filters must be served by an index, not a full table scan"""
+
+    def assert_uses_index(self, queryset):
+        if connection.vendor == "postgresql":
+            # Tiny test tables make sequential scans cheapest; forbid them so
+            # the plan shows whether an index can serve the query at all
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+            self.assertNotIn("Seq Scan", plan, plan)
+        elif connection.vendor == "sqlite":
+            plan = queryset.explain()
+            for line in plan.splitlines():
+                if "SCAN" in line and "USING" not in line and "SUBQUERY" not in line:
+                    self.fail(f"Full scan in plan:\n{plan}")
+            self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan, plan)
+        else:
+            self.skipTest(f"No plan check for {connection.vendor}")
+
+    def test_daily_log_listing(self):
+        self.assert_uses_index(DailyLog.objects.order_by("-created_at", "-id")[:50])
+        self.assert_uses_index(
+            DailyLog.objects.filter(driver_id=1).order_by("-created_at", "-id")[:50]
+        )
+        self.assert_uses_index(
+            DailyLog.objects.filter(truck_id=1).order_by("-created_at", "-id")[:50]
+        )
+
+    def test_duty_statuses_of_a_log(self):
+        self.assert_uses_index(
+            DutyStatus.objects.filter(daily_log_id=1).order_by("timestamp", "id")
+        )
+
+    def test_driver_statuses_in_time_range(self):
+        self.assert_uses_index(
+            DutyStatus.objects.filter(
+                daily_log__driver_id=1,
+                timestamp__gte=self.now - timedelta(days=8),
+                timestamp__lt=self.now,
+            ).order_by()
+        )
+
+    def test_fleet_statuses_in_time_range(self):
+        since = self.now - timedelta(days=1)
+        self.assert_uses_index(DutyStatus.objects.filter(timestamp__gte=since))
+        self.assert_uses_index(
+            DutyStatus.objects.filter(duty_status="driving", timestamp__gte=since)
+        )
+
+    def test_driver_day_totals(self):
+        today = local_day(self.now)
+        self.assert_uses_index(DailyDutyTotal.objects.filter(day=today))
+        self.assert_uses_index(
+            DailyDutyTotal.objects.filter(
+                driver_id=1, day__gte=today - timedelta(days=7)
+            )
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite tuning")
+class SQLiteTuningTests(SimpleTestCase):
+    # Connections go to a scratch file, under their own "default" alias
+    databases = {"default"}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "tuning.sqlite3")
+
+    def connect(self):
+        tuned = ConnectionHandler({"default": sqlite_settings(self.path)})["default"]
+        tuned.ensure_connection()
+        self.addCleanup(tuned.close)
+        return tuned.connection
+
+    def count(self, connection):
+        return connection.execute("SELECT count(*) FROM events").fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        pragmas = {
+            name: self.connect().execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ["journal_mode", "synchronous", "busy_timeout", "mmap_size"]
+        }
+
+        self.assertEqual(pragmas["journal_mode"], "wal")
+        self.assertEqual(pragmas["synchronous"], 1)
+        self.assertEqual(pragmas["busy_timeout"], 5000)
+        self.assertGreater(pragmas["mmap_size"], 0)
+
+    def test_writers_and_readers_do_not_block_each_other(self):
+        writer, reader = self.connect(), self.connect()
+        writer.execute("CREATE TABLE events (id INTEGER PRIMARY KEY)")
+        writer.execute("INSERT INTO events DEFAULT VALUES")
+        started = time.perf_counter()
+
+        # A reader keeps its snapshot while a writer commits under it
+        reader.execute("BEGIN")
+        self.assertEqual(self.count(reader), 1)
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO events DEFAULT VALUES")
+        self.assertEqual(self.count(reader), 1)
+        writer.execute("COMMIT")
+        self.assertEqual(self.count(reader), 1)
+        reader.execute("COMMIT")
+        self.assertEqual(self.count(reader), 2)
+
+        # Nothing waited on a lock
+        self.assertLess(time.perf_counter() - started, 1)
+
+    def test_default_journal_blocks_commit_under_a_reader(self):
+        writer = sqlite3.connect(self.path, timeout=0.1, isolation_level=None)
+        reader = sqlite3.connect(self.path, timeout=0.1, isolation_level=None)
+        self.addCleanup(writer.close)
+        self.addCleanup(reader.close)
+        writer.execute("CREATE TABLE events (id INTEGER PRIMARY KEY)")
+
+        reader.execute("BEGIN")
+        self.count(reader)
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO events DEFAULT VALUES")
+        with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+            writer.execute("COMMIT")
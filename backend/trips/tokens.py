@@ -0,0 +1,176 @@
+"""
+Signed, expiring bearer tokens for the API.
+
+/api/login issues a token that carries the principal itself: user id,
+username, driver id and staff flag, with a token id and an expiry, signed
+with SECRET_KEY (django.core.signing, so SECRET_KEY_FALLBACKS rotate keys).
+token_auth_middleware resolves an `Authorization: Bearer` header to
+`request.principal` without a query: verified tokens are kept in a small
+LRU, so a repeat request costs a dict lookup, and a new one an HMAC.
+
+Revoking a token (/api/logout) records its id in RevokedToken until the
+token would have expired anyway, so the denylist only ever holds the ids of
+live tokens. Each process keeps the denylist in memory and reloads it every
+AUTH_TOKEN_DENYLIST_REFRESH seconds; the process that revoked a token stops
+accepting it once the revocation commits, the others within that interval.
+
+Requests without a token keep Django's session authentication.
+"""
+
+import secrets
+import threading
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from functools import lru_cache, partial
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from .models import Driver, RevokedToken
+
+SALT = "trips.tokens"
+# Verified tokens kept per process
+PRINCIPAL_CACHE_SIZE = 1024
+
+
+class Principal(NamedTuple):
+    """Who a request is made by"""
+
+    user_id: int
+    username: str
+    driver_id: int | None
+    is_staff: bool
+    # Both None for a session
+    token_id: str | None = None
+    expires_at: int | None = None
+
+
+def expiry_time(expires_at):
+    """A token's Unix expiry time as an aware datetime"""
+    return datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+
+
+def issue_token(user, driver_id=None):
+    """(token, expiry as a Unix time) for `user`, who drives as `driver_id`"""
+    expires_at = int(time.time()) + settings.AUTH_TOKEN_MAX_AGE
+    token = signing.Signer(salt=SALT).sign_object(
+        {
+            "u": user.id,
+            "n": user.username,
+            "d": driver_id,
+            "s": user.is_staff,
+            "j": secrets.token_hex(8),
+            "e": expires_at,
+        },
+        compress=True,
+    )
+    return token, expires_at
+
+
+@lru_cache(maxsize=PRINCIPAL_CACHE_SIZE)
+def verify_token(token):
+    """
+    A token's principal, expired or not; raises BadSignature, which the LRU
+    does not keep
+    """
+    claims = signing.Signer(salt=SALT).unsign_object(token)
+    return Principal(
+        claims["u"], claims["n"], claims["d"], claims["s"], claims["j"], claims["e"]
+    )
+
+
+def principal_for(token):
+    """The principal of a valid, unexpired and unrevoked token, or None"""
+    try:
+        principal = verify_token(token)
+    except signing.BadSignature:
+        return None
+    if principal.expires_at <= time.time() or is_revoked(principal.token_id):
+        return None
+    return principal
+
+
+def session_principal(user):
+    """The principal of a session's user, or None; this one costs queries"""
+    if not user.is_authenticated:
+        return None
+    driver_id = Driver.objects.filter(user=user).values_list("id", flat=True).first()
+    return Principal(user.id, user.username, driver_id, user.is_staff)
+
+
+_denylist = {"token_ids": frozenset(), "loaded_at": None}
+_denylist_lock = threading.Lock()
+
+
+def denylist_stale():
+    loaded_at = _denylist["loaded_at"]
+    return (
+        loaded_at is None
+        or time.monotonic() - loaded_at >= settings.AUTH_TOKEN_DENYLIST_REFRESH
+    )
+
+
+def load_denylist():
+    """Reload this process's copy of the denylist"""
+    token_ids = frozenset(
+        RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list(
+            "token_id", flat=True
+        )
+    )
+    with _denylist_lock:
+        _denylist.update(token_ids=token_ids, loaded_at=time.monotonic())
+
+
+def is_revoked(token_id):
+    if denylist_stale():
+        load_denylist()
+    return token_id in _denylist["token_ids"]
+
+
+def revoke(principal):
+    """Deny a token's principal from now until the token expires"""
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    RevokedToken.objects.get_or_create(
+        token_id=principal.token_id,
+        defaults={"expires_at": expiry_time(principal.expires_at)},
+    )
+    transaction.on_commit(partial(_deny, principal.token_id))
+
+
+def _deny(token_id):
+    with _denylist_lock:
+        _denylist["token_ids"] = _denylist["token_ids"] | {token_id}
+
+
+def bearer_token(request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
+
+
+@sync_and_async_middleware
+def token_auth_middleware(get_response):
+    """Set request.principal from a bearer token, or to None"""
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            token = bearer_token(request)
+            if token and denylist_stale():
+                await sync_to_async(load_denylist)()
+            request.principal = principal_for(token) if token else None
+            return await get_response(request)
+
+        return async_middleware
+
+    def middleware(request):
+        token = bearer_token(request)
+        request.principal = principal_for(token) if token else None
+        return get_response(request)
+
+    return middleware
@@ -0,0 +1,186 @@
+"""
+Materialized per-day duty totals (trips.models.DailyDutyTotal).
+
+Days are calendar days in the default timezone (settings.TIME_ZONE, the
+home terminal). A status lasts until the driver's next status; spans that
+cross midnight are split between days. The driver's latest status is still
+open, so its time is left for readers to add from last_status_at.
+
+Writes to duty statuses only rebuild the days whose spans they touch, from
+the status before the change up to the status after it.
+
+Miles driven (see trips.mileage) are spread over the days a driving span
+covers in proportion to its time on each.
+"""
+
+import heapq
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from .mileage import MILES_PLACES, driving_miles
+from .models import DailyDutyTotal, DutyStatus
+
+STATUS_NAMES = [value for value, _ in DutyStatus.DUTY_STATUSES]
+EVENT_FIELDS = ("timestamp", "duty_status", "latitude", "longitude")
+
+
+def day_start(day, zone=None):
+    return datetime.combine(
+        day, time.min, tzinfo=zone or timezone.get_default_timezone()
+    )
+
+
+def local_day(moment, zone=None):
+    return moment.astimezone(zone or timezone.get_default_timezone()).date()
+
+
+def split_days(events, zone=None):
+    """
+    Per-day totals from (timestamp, duty_status, latitude, longitude) events
+    sorted by time.
+
+    Returns {day: {"seconds": {status: seconds}, "miles": ...,
+    "first_status": ..., "last_status": ..., "last_status_at": ...}}.
+    """
+    zone = zone or timezone.get_default_timezone()
+    events = list(events)
+    miles = driving_miles(
+        [event[1] for event in events],
+        [None if event[2] is None else float(event[2]) for event in events],
+        [None if event[3] is None else float(event[3]) for event in events],
+    )
+    days = {}
+
+    def touch(day, status, status_at):
+        row = days.get(day)
+        if row is None:
+            row = days[day] = {
+                "seconds": dict.fromkeys(STATUS_NAMES, 0.0),
+                "miles": 0.0,
+                "first_status": status,
+            }
+        row["last_status"] = status
+        row["last_status_at"] = status_at
+        return row
+
+    previous = None
+    for (timestamp, status, *_), leg in zip(events, miles):
+        if previous is not None:
+            status_at, previous_status, previous_leg = previous
+            span = (timestamp - status_at).total_seconds()
+            start, day = status_at, local_day(status_at, zone)
+            while start < timestamp:
+                chunk_end = min(timestamp, day_start(day + timedelta(days=1), zone))
+                seconds = (chunk_end - start).total_seconds()
+                row = touch(day, previous_status, status_at)
+                row["seconds"][previous_status] += seconds
+                row["miles"] += previous_leg * seconds / span
+                start, day = chunk_end, day + timedelta(days=1)
+        row = touch(local_day(timestamp, zone), status, timestamp)
+        if previous is not None and previous[0] == timestamp:
+            # Statuses at the same moment still mark a move between them
+            row["miles"] += previous[2]
+        previous = (timestamp, status, leg)
+    return days
+
+
+def _total_rows(driver_id, days):
+    return [
+        DailyDutyTotal(
+            driver_id=driver_id,
+            day=day,
+            off_duty_minutes=row["seconds"]["off_duty"] / 60,
+            sleeper_berth_minutes=row["seconds"]["sleeper_berth"] / 60,
+            driving_minutes=row["seconds"]["driving"] / 60,
+            on_duty_minutes=row["seconds"]["on_duty"] / 60,
+            miles=Decimal(row["miles"]).quantize(MILES_PLACES),
+            first_status=row["first_status"],
+            last_status=row["last_status"],
+            last_status_at=row["last_status_at"],
+        )
+        for day, row in sorted(days.items())
+    ]
+
+
+def _driver_events(driver_id):
+    return DutyStatus.objects.filter(daily_log__driver_id=driver_id).order_by(
+        "timestamp", "id"
+    )
+
+
+def rebuild_driver_days(driver_id, first_day, last_day):
+    """Recompute a driver's totals for the days first_day..last_day"""
+    range_start = day_start(first_day)
+    range_end = day_start(last_day + timedelta(days=1))
+    statuses = _driver_events(driver_id).values_list(*EVENT_FIELDS)
+
+    carried_in = statuses.filter(timestamp__lt=range_start).last()
+    closing = statuses.filter(timestamp__gte=range_end).first()
+    events = list(statuses.filter(timestamp__gte=range_start, timestamp__lt=range_end))
+    if carried_in:
+        events.insert(0, carried_in)
+    if closing:
+        events.append(closing)
+
+    days = {
+        day: row
+        for day, row in split_days(events).items()
+        if first_day <= day <= last_day
+    }
+    with transaction.atomic():
+        DailyDutyTotal.objects.filter(
+            driver_id=driver_id, day__gte=first_day, day__lte=last_day
+        ).delete()
+        DailyDutyTotal.objects.bulk_create(_total_rows(driver_id, days))
+
+
+def refresh_driver_totals(driver_id, timestamps):
+    """Rebuild the days affected by statuses added, moved or removed at `timestamps`"""
+    earliest, latest = min(timestamps), max(timestamps)
+    statuses = _driver_events(driver_id).values_list("timestamp", flat=True)
+    before = statuses.filter(timestamp__lt=earliest).last()
+    after = statuses.filter(timestamp__gt=latest).first()
+    rebuild_driver_days(
+        driver_id, local_day(before or earliest), local_day(after or latest)
+    )
+
+
+def rebuild_all_totals(driver_ids=None, batch_size=1000):
+    """
+    Rebuild every driver's totals from their full history, archived statuses
+    included; returns row count
+    """
+    statuses = DutyStatus.objects.all()
+    existing = DailyDutyTotal.objects.all()
+    if driver_ids is not None:
+        statuses = statuses.filter(daily_log__driver_id__in=driver_ids)
+        existing = existing.filter(driver_id__in=driver_ids)
+
+    # Archived statuses still count; imported here as trips.archive uses us
+    from .archive import archived_events
+
+    rows = heapq.merge(
+        statuses.order_by("daily_log__driver_id", "timestamp", "id")
+        .values_list("daily_log__driver_id", *EVENT_FIELDS)
+        .iterator(chunk_size=10000),
+        archived_events(EVENT_FIELDS, driver_ids=driver_ids),
+        key=lambda row: row[:2],
+    )
+    created = 0
+    with transaction.atomic():
+        existing.delete()
+        pending = []
+        for driver_id, driver_rows in groupby(rows, key=lambda row: row[0]):
+            days = split_days(row[1:] for row in driver_rows)
+            pending.extend(_total_rows(driver_id, days))
+            if len(pending) >= batch_size:
+                DailyDutyTotal.objects.bulk_create(pending, batch_size=batch_size)
+                created += len(pending)
+                pending = []
+        DailyDutyTotal.objects.bulk_create(pending, batch_size=batch_size)
+        created += len(pending)
+    return created
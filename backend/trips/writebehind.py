@@ -0,0 +1,445 @@
+"""
+Write-behind ingest of single duty status POSTs.
+
+With settings.DUTY_STATUS_WRITE_BEHIND on, POST
+/api/daily-logs/{id}/duty-statuses validates the status, appends it to this
+process's journal (a file in WRITE_BEHIND_DIR, fsynced before the response)
+and answers 202 with a receipt. A writer thread then stores queued statuses
+through ingest_duty_statuses, one transaction per WRITE_BEHIND_FLUSH_MS or
+WRITE_BEHIND_MAX_EVENTS statuses, whichever comes first, so a burst costs a
+few batched transactions instead of one per status.
+
+The receipt is the status's idempotency key: the client's own, or one made
+up here. Storing a journaled status again is therefore harmless, which is
+what makes recovery simple: a process holds a lock on its journal, and the
+first write-behind POST of any process replays every journal whose owner has
+died (`manage.py replay_write_behind_journal` does the same with the server
+stopped). A journal is emptied whenever everything in it has been stored.
+
+A batch the database refuses is retried one status at a time. A status that
+still fails STORE_ATTEMPTS times, while the database is up, is set aside in
+WRITE_BEHIND_DIR/dead-letter.jsonl with the error and its receipt reports
+the error, so one bad status never holds up the ones queued behind it.
+
+Read-your-writes: a client that sends its latest receipt in the
+X-Write-Receipt header has the request held until that status is stored
+(for at most RECEIPT_WAIT_SECONDS), so it reads what it wrote. A receipt
+that no process has queued, or whose status was dead-lettered, is not
+waited for.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, connections
+from django.utils.decorators import sync_and_async_middleware
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from .ingest import MAX_BATCH_SIZE, ingest_duty_statuses
+from .models import DutyStatus
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_PREFIX = "wb-"
+RECEIPT_HEADER = "X-Write-Receipt"
+RECEIPT_WAIT_SECONDS = 5
+# Outcomes of stored statuses kept for receipt lookups
+OUTCOMES_KEPT = 10000
+# Pause before retrying a batch the database refused
+RETRY_SECONDS = 1
+# Tries for a single status before it is dead-lettered
+STORE_ATTEMPTS = 3
+JOURNAL_PATTERN = "journal-*.jsonl"
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+def new_receipt():
+    return f"{RECEIPT_PREFIX}{uuid.uuid4().hex}"
+
+
+class Journal:
+    """This process's append-only file of queued statuses, one JSON per line"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = open(self.path, "ab")
+        # Held while the process lives; recovery skips locked journals
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.appended = 0
+        self.synced = 0
+
+    def append(self, record):
+        """Write a record and return once it is on disk"""
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.appended += 1
+            position = self.appended
+        # One fsync covers every record appended before it started
+        with self.sync_lock:
+            if self.synced < position:
+                with self.lock:
+                    target = self.appended
+                os.fsync(self.file.fileno())
+                self.synced = target
+
+    def truncate(self):
+        with self.lock:
+            self.file.truncate(0)
+
+    def close(self):
+        self.file.close()
+
+
+def read_journal(path):
+    """The records of a journal; a line cut short by a crash is skipped"""
+    records = []
+    with open(path, "rb") as journal:
+        for line in journal:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def store(records):
+    """Store journaled statuses; returns ingest results in the same order"""
+    results = []
+    for start in range(0, len(records), MAX_BATCH_SIZE):
+        results.extend(
+            ingest_duty_statuses(
+                [
+                    SimpleNamespace(**record)
+                    for record in records[start : start + MAX_BATCH_SIZE]
+                ]
+            )
+        )
+    return results
+
+
+def database_available():
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        return False
+    return connection.is_usable()
+
+
+def dead_letter(directory, record, error):
+    """Set a status that cannot be stored aside, with the reason"""
+    line = json.dumps({**record, "error": error}, separators=(",", ":"))
+    with open(Path(directory) / DEAD_LETTER_FILE, "ab") as file:
+        file.write(line.encode() + b"\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def store_each(records, directory):
+    """
+    Store statuses one at a time, once their batch failed; a status still
+    failing after STORE_ATTEMPTS tries is dead-lettered and reported as an
+    error, unless the database is down, which raises to retry them all later
+    """
+    results = []
+    for record in records:
+        for attempt in range(STORE_ATTEMPTS):
+            try:
+                results.extend(store([record]))
+                break
+            except Exception as error:
+                failure = error
+                logger.exception("Storing duty status %s", record["idempotency_key"])
+                close_old_connections()
+                if attempt + 1 < STORE_ATTEMPTS:
+                    time.sleep(RETRY_SECONDS)
+        else:
+            if not database_available():
+                raise failure
+            error = f"Could not be stored: {failure}"
+            dead_letter(directory, record, error)
+            results.append({"status": "error", "error": error})
+    return results
+
+
+def store_journaled(records, directory):
+    """Store journaled statuses, dead-lettering any that cannot be stored"""
+    try:
+        return store(records)
+    except Exception:
+        logger.exception("Storing %s journaled duty statuses", len(records))
+        close_old_connections()
+        return store_each(records, directory)
+
+
+def recover_journals(directory):
+    """
+    Replay and remove the journals in `directory` no live process holds;
+    returns the number of statuses replayed
+    """
+    replayed = 0
+    for path in sorted(Path(directory).glob(JOURNAL_PATTERN)):
+        with open(path, "rb") as journal:
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            records = read_journal(path)
+            if records:
+                store_journaled(records, directory)
+                replayed += len(records)
+            path.unlink(missing_ok=True)
+    return replayed
+
+
+class WriteBehindQueue:
+    """Journals statuses and stores them in batches from a writer thread"""
+
+    def __init__(self, directory, flush_seconds, max_events):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.flush_seconds = flush_seconds
+        self.max_events = max_events
+        path = self.directory / f"journal-{os.getpid()}.jsonl"
+        # A journal left by an earlier process with the same pid
+        recover_journals(self.directory)
+        self.journal = Journal(path)
+        self.condition = threading.Condition()
+        self.pending = []
+        self.first_queued_at = None
+        # Receipts journaled and not yet stored, and outcomes of stored ones
+        self.unstored = set()
+        self.outcomes = OrderedDict()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self._run, name="duty-status-writer", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, record):
+        """Journal a validated status; returns its receipt once durable"""
+        receipt = record["idempotency_key"]
+        with self.condition:
+            if receipt in self.unstored:
+                return receipt
+            self.unstored.add(receipt)
+        try:
+            self.journal.append(record)
+        except OSError:
+            with self.condition:
+                self.unstored.discard(receipt)
+            raise
+        with self.condition:
+            if not self.pending:
+                self.first_queued_at = time.monotonic()
+            self.pending.append(record)
+            # The writer wakes to time the first status, or for a full batch
+            if len(self.pending) in (1, self.max_events):
+                self.condition.notify_all()
+        return receipt
+
+    def queued(self, receipt):
+        with self.condition:
+            return receipt in self.unstored
+
+    def outcome(self, receipt):
+        """The ingest result for a stored receipt, if still remembered"""
+        with self.condition:
+            return self.outcomes.get(receipt)
+
+    def wait(self, receipt, timeout):
+        """Wait until a receipt is stored; False if it is still queued"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: receipt not in self.unstored, timeout
+            )
+
+    def _take(self):
+        """The next batch, once it is full or its oldest status is due"""
+        with self.condition:
+            while True:
+                if len(self.pending) >= self.max_events:
+                    break
+                if self.pending:
+                    due = self.first_queued_at + self.flush_seconds
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                else:
+                    self.condition.wait()
+            batch = self.pending[: self.max_events]
+            del self.pending[: self.max_events]
+            self.first_queued_at = time.monotonic() if self.pending else None
+            return batch
+
+    def flush(self):
+        """Store everything queued now, in the calling thread"""
+        with self.condition:
+            batch, self.pending = self.pending, []
+            self.first_queued_at = None
+        if batch:
+            self._store(batch)
+
+    def _store(self, batch):
+        close_old_connections()
+        results = store_journaled(batch, self.directory)
+        with self.condition:
+            for record, result in zip(batch, results):
+                receipt = record["idempotency_key"]
+                self.unstored.discard(receipt)
+                self.outcomes[receipt] = result
+                self.outcomes.move_to_end(receipt)
+            while len(self.outcomes) > OUTCOMES_KEPT:
+                self.outcomes.popitem(last=False)
+            # Everything journaled is stored: start the journal over
+            if not self.unstored:
+                self.journal.truncate()
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            while True:
+                try:
+                    self._store(batch)
+                    break
+                except Exception:
+                    logger.exception("Storing %s queued duty statuses", len(batch))
+                    time.sleep(RETRY_SECONDS)
+
+    def close(self):
+        """Store what is still queued; the journal covers a failure here"""
+        try:
+            self.flush()
+        finally:
+            self.journal.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """The process's write-behind queue, started on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue(
+                settings.WRITE_BEHIND_DIR,
+                settings.WRITE_BEHIND_FLUSH_MS / 1000,
+                settings.WRITE_BEHIND_MAX_EVENTS,
+            )
+            _queue.start()
+            atexit.register(_queue.close)
+        return _queue
+
+
+def receipt_status(receipt):
+    """
+    "queued" while this process has the receipt's status queued, "error" if
+    storing it failed validation, else None
+    """
+    if _queue is None:
+        return None, None
+    if _queue.queued(receipt):
+        return "queued", None
+    outcome = _queue.outcome(receipt)
+    if outcome and outcome["status"] == "error":
+        return "error", outcome["error"]
+    return None, None
+
+
+def _mentioned_in(paths, receipt):
+    # Records are written compactly, so the key appears exactly like this
+    needle = json.dumps({"idempotency_key": receipt}, separators=(",", ":"))
+    needle = needle[1:-1].encode()
+    for path in paths:
+        try:
+            if needle in path.read_bytes():
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def queued_elsewhere(receipt):
+    """Whether another process has the receipt's status journaled, unstored"""
+    directory = Path(settings.WRITE_BEHIND_DIR)
+    if not _mentioned_in(directory.glob(JOURNAL_PATTERN), receipt):
+        return False
+    return not _mentioned_in([directory / DEAD_LETTER_FILE], receipt)
+
+
+def _stored(receipt):
+    return DutyStatus.objects.filter(idempotency_key=receipt).exists()
+
+
+def wait_for_receipt(receipt, timeout=RECEIPT_WAIT_SECONDS):
+    """
+    Wait until the status of a receipt is stored; True once it is. False at
+    once for a receipt whose status failed to store, or that no process has
+    queued
+    """
+    if _queue is not None:
+        if _queue.queued(receipt):
+            return _queue.wait(receipt, timeout)
+        outcome = _queue.outcome(receipt)
+        if outcome:
+            return outcome["status"] != "error"
+    # Queued by another process: wait while its journal holds it
+    deadline = time.monotonic() + timeout
+    while not _stored(receipt):
+        if time.monotonic() >= deadline:
+            return False
+        if not queued_elsewhere(receipt):
+            # Stored, and its journal emptied, since the first look
+            return _stored(receipt)
+        time.sleep(settings.WRITE_BEHIND_FLUSH_MS / 1000)
+    return True
+
+
+def _wait_in_worker(receipt):
+    # The worker threads are not request threads: nothing else closes these
+    try:
+        return wait_for_receipt(receipt)
+    finally:
+        connections.close_all()
+
+
+@sync_and_async_middleware
+def read_your_writes_middleware(get_response):
+    """Hold a request carrying a write receipt until that write is stored"""
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            receipt = request.headers.get(RECEIPT_HEADER)
+            if receipt:
+                await sync_to_async(_wait_in_worker, thread_sensitive=False)(receipt)
+            return await get_response(request)
+
+        return async_middleware
+
+    def middleware(request):
+        receipt = request.headers.get(RECEIPT_HEADER)
+        if receipt:
+            wait_for_receipt(receipt)
+        return get_response(request)
+
+    return middleware
@@ -48,7 +48,7 @@ echo "   - Configure environment variables"
 echo ""
 echo "3. Update Environment Variables:"
 echo "   - VITE_API_URL: Your backend URL"
-echo "   - VITE_MAPBOX_ACCESS_TOKEN: Your Mapbox token"
+echo "   - MAPBOX_ACCESS_TOKEN (backend): Your Mapbox token"
 echo ""
 echo "4. Update CORS settings in backend/trip_tracker/settings_production.py"
 echo "   - Replace 'your-netlify-app.netlify.app' with your actual Netlify domain"
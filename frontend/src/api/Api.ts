@@ -6,15 +6,29 @@ const API_BASE_URL =
   (import.meta.env.PROD ? '/api' : 'http://localhost:8000')
 
 // Ensure we don't double up on /api
-const normalizedBaseUrl = API_BASE_URL.endsWith('/api')
+export const normalizedBaseUrl = API_BASE_URL.endsWith('/api')
   ? API_BASE_URL.slice(0, -4)
   : API_BASE_URL
 
+// Bearer token from /api/login, kept across reloads
+export const AUTH_TOKEN_KEY = 'auth_token'
+
 // Create the API client with full type safety
 export const api = openapiFetch<paths>({
   baseUrl: normalizedBaseUrl,
   credentials: 'include', // For session-based auth
 })
 
+// Authenticate every request with the token when there is one
+api.use({
+  onRequest({ request }) {
+    const token = localStorage.getItem(AUTH_TOKEN_KEY)
+    if (token) {
+      request.headers.set('Authorization', `Bearer ${token}`)
+    }
+    return request
+  },
+})
+
 // Export types for convenience
 export type { components } from '@/types/api'
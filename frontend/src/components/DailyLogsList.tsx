@@ -1,6 +1,6 @@
 import type { components } from '@/types/api'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 
 interface DailyLogsListProps {
   dailyLogs: DailyLog[]
@@ -56,12 +56,9 @@ export default function DailyLogsList({
                   </span>
                 </div>
                 <div className='text-sm text-gray-300 space-y-1 mb-3'>
-                  <p>
-                    Driver: {log.driver?.user?.first_name}{' '}
-                    {log.driver?.user?.last_name}
-                  </p>
-                  <p>Truck: {log.truck?.truck_number || 'Unknown'}</p>
-                  <p>Trailer: {log.trailer?.trailer_number || 'Unknown'}</p>
+                  <p>Driver: {log.driver_name}</p>
+                  <p>Truck: {log.truck_number || 'Unknown'}</p>
+                  <p>Trailer: {log.trailer_number || 'Unknown'}</p>
                   <p>Created: {new Date(log.created_at).toLocaleString()}</p>
                 </div>
                 <div className='flex flex-col sm:flex-row gap-2'>
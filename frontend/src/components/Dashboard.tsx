@@ -13,16 +13,16 @@ export default function Dashboard() {
   const { user, logout } = useAuth()
   const { isSimulating, simulationResult, simulateDay } = useSimulator()
   const [dailyLogs, setDailyLogs] = useState<
-    components['schemas']['DailyLog'][]
+    components['schemas']['DailyLogSchema'][]
   >([])
   const [isLoadingLogs, setIsLoadingLogs] = useState(false)
   const [selectedDailyLog, setSelectedDailyLog] = useState<
-    components['schemas']['DailyLog'] | null
+    components['schemas']['DailyLogSchema'] | null
   >(null)
   const [viewMode, setViewMode] = useState<'list' | 'map' | 'chart'>('list')
   const [isModalOpen, setIsModalOpen] = useState(false)
   const [latestSimulatedLog, setLatestSimulatedLog] = useState<
-    components['schemas']['DailyLog'] | null
+    components['schemas']['DailyLogSchema'] | null
   >(null)
 
   const handleLogout = async () => {
@@ -36,7 +36,7 @@ export default function Dashboard() {
       if (error) {
         // handle error (removed console)
       } else if (data) {
-        setDailyLogs(data)
+        setDailyLogs(data.items)
       }
     } catch {
       // handle error (removed console)
@@ -84,12 +84,12 @@ export default function Dashboard() {
     }
   }
 
-  const handleShowMap = (dailyLog: components['schemas']['DailyLog']) => {
+  const handleShowMap = (dailyLog: components['schemas']['DailyLogSchema']) => {
     setSelectedDailyLog(dailyLog)
     setViewMode('map')
   }
 
-  const handleShowChart = (dailyLog: components['schemas']['DailyLog']) => {
+  const handleShowChart = (dailyLog: components['schemas']['DailyLogSchema']) => {
     setSelectedDailyLog(dailyLog)
     setViewMode('chart')
   }
@@ -1,6 +1,6 @@
 import type { components } from '@/types/api'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 
 interface LogBookDriverInfoProps {
   dailyLog: DailyLog
@@ -11,13 +11,13 @@ export default function LogBookDriverInfo({
 }: LogBookDriverInfoProps) {
   return (
     <div className='border-2 border-black mb-6'>
-      <div className='grid grid-cols-2 md:grid-cols-4 gap-4 p-4 text-sm'>
+      <div className='grid grid-cols-2 md:grid-cols-5 gap-4 p-4 text-sm'>
         <div>
           <label className='text-gray-700 block font-medium'>
             Truck Number:
           </label>
           <span className='text-black font-bold'>
-            {dailyLog.truck?.truck_number || 'N/A'}
+            {dailyLog.truck_number || 'N/A'}
           </span>
         </div>
         <div>
@@ -25,20 +25,27 @@ export default function LogBookDriverInfo({
             Trailer Number:
           </label>
           <span className='text-black font-bold'>
-            {dailyLog.trailer?.trailer_number || 'N/A'}
+            {dailyLog.trailer_number || 'N/A'}
           </span>
         </div>
         <div>
           <label className='text-gray-700 block font-medium'>Driver:</label>
           <span className='text-black font-bold'>
-            {dailyLog.driver?.user?.first_name}{' '}
-            {dailyLog.driver?.user?.last_name}
+            {dailyLog.driver_name}
           </span>
         </div>
         <div>
           <label className='text-gray-700 block font-medium'>Co-Driver:</label>
           <span className='text-black font-bold'>N/A</span>
         </div>
+        <div>
+          <label className='text-gray-700 block font-medium'>
+            Total Miles Driving Today:
+          </label>
+          <span className='text-black font-bold'>
+            {dailyLog.miles.toFixed(1)}
+          </span>
+        </div>
       </div>
     </div>
   )
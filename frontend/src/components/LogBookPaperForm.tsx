@@ -4,7 +4,7 @@ import LogBookTable from './LogBookTable'
 import LogBookTotals from './LogBookTotals'
 import LogBookRemarks from './LogBookRemarks'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 
 interface LogBookPaperFormProps {
   dailyLog: DailyLog
@@ -3,7 +3,7 @@ import { useDutyStatuses } from '@/hooks/useDutyStatuses'
 import { useDutyStatusTotals } from '@/hooks/useDutyStatusTotals'
 import LogBookPaperForm from './LogBookPaperForm'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 
 interface LogBookViewProps {
   dailyLog: DailyLog
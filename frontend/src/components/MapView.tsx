@@ -87,7 +87,7 @@ const dutyStatusColors = {
 const fuelingIcon = createCustomIcon('#F59E0B') // orange
 const fuelingColor = 'bg-orange-500'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 type DutyStatus = components['schemas']['DutyStatus']
 
 interface MapViewProps {
@@ -281,8 +281,7 @@ export default function MapView({
             Route Map - Daily Log #{dailyLog.id}
           </h2>
           <p className='text-gray-300 text-sm'>
-            {dailyLog.driver?.user?.first_name}{' '}
-            {dailyLog.driver?.user?.last_name} •
+            {dailyLog.driver_name} •
             {new Date(dailyLog.created_at).toLocaleDateString()}
           </p>
         </div>
@@ -1,5 +1,5 @@
 import { useState, useEffect, type ReactNode } from 'react'
-import { api } from '@/api/Api'
+import { api, AUTH_TOKEN_KEY } from '@/api/Api'
 import type { components } from '@/types/api'
 import { AuthContext, type AuthContextType } from './AuthContext'
 
@@ -17,17 +17,21 @@ export function AuthProvider({ children }: AuthProviderProps) {
   useEffect(() => {
     const checkAuth = async () => {
       try {
-        // For session-based auth, check if we have stored user info
+        // Restore the stored user while their token is still accepted
         const storedUser = localStorage.getItem('user_info')
         if (storedUser) {
-          const user = JSON.parse(storedUser)
-          setUser(user)
+          const { error } = await api.GET('/api/me')
+          if (error) {
+            throw new Error('Session expired')
+          }
+          setUser(JSON.parse(storedUser))
         }
         setIsLoading(false)
       } catch {
         // Auth check failed, clear session
         setUser(null)
         localStorage.removeItem('user_info')
+        localStorage.removeItem(AUTH_TOKEN_KEY)
         setIsLoading(false)
       }
     }
@@ -47,8 +51,11 @@ export function AuthProvider({ children }: AuthProviderProps) {
     if (data?.success && data.user) {
       setUser(data.user as User)
 
-      // Store user info in localStorage for persistence
+      // Store user info and token in localStorage for persistence
       localStorage.setItem('user_info', JSON.stringify(data.user))
+      if (data.token) {
+        localStorage.setItem(AUTH_TOKEN_KEY, data.token)
+      }
     } else {
       throw new Error(data?.message || 'Login failed')
     }
@@ -67,6 +74,7 @@ export function AuthProvider({ children }: AuthProviderProps) {
   const clearSession = () => {
     setUser(null)
     localStorage.removeItem('user_info')
+    localStorage.removeItem(AUTH_TOKEN_KEY)
   }
 
   const value: AuthContextType = {
@@ -1,22 +1,45 @@
 import { useState, useEffect } from 'react'
-import { api } from '@/api/Api'
+import { api, normalizedBaseUrl } from '@/api/Api'
 import type { components } from '@/types/api'
 
-type DailyLog = components['schemas']['DailyLog']
+type DailyLog = components['schemas']['DailyLogSchema']
 type DutyStatus = components['schemas']['DutyStatus']
 
+interface DutyStatusEvent {
+  action: 'created' | 'updated' | 'deleted'
+  daily_log_id: number
+  duty_status: DutyStatus
+}
+
+const byTimestamp = (a: DutyStatus, b: DutyStatus) =>
+  a.timestamp.localeCompare(b.timestamp)
+
+// Apply a pushed change to the log's statuses
+const applyEvent = (
+  statuses: DutyStatus[],
+  dailyLogId: number,
+  { action, daily_log_id, duty_status }: DutyStatusEvent
+) => {
+  const others = statuses.filter(status => status.id !== duty_status.id)
+  if (action === 'deleted' || daily_log_id !== dailyLogId) {
+    return others
+  }
+  return [...others, duty_status].sort(byTimestamp)
+}
+
 export const useDutyStatuses = (dailyLog: DailyLog) => {
   const [dutyStatuses, setDutyStatuses] = useState<DutyStatus[]>([])
   const [isLoading, setIsLoading] = useState(true)
 
   useEffect(() => {
+    const dailyLogId = dailyLog.id!
+
     const loadDutyStatuses = async () => {
-      setIsLoading(true)
       try {
         const { data, error } = await api.GET(
           '/api/daily-logs/{daily_log_id}/duty-statuses',
           {
-            params: { path: { daily_log_id: dailyLog.id! } },
+            params: { path: { daily_log_id: dailyLogId } },
           }
         )
         if (error) {
@@ -30,7 +53,25 @@ export const useDutyStatuses = (dailyLog: DailyLog) => {
         setIsLoading(false)
       }
     }
+
+    setIsLoading(true)
     loadDutyStatuses()
+
+    // Changes are pushed as they commit. Reload once subscribed, and after
+    // every reconnect, for anything committed while not listening
+    const events = new EventSource(
+      `${normalizedBaseUrl}/api/daily-logs/${dailyLogId}/duty-statuses/events`,
+      { withCredentials: true }
+    )
+    events.onopen = () => {
+      loadDutyStatuses()
+    }
+    events.addEventListener('duty_status', message => {
+      const event: DutyStatusEvent = JSON.parse((message as MessageEvent).data)
+      setDutyStatuses(statuses => applyEvent(statuses, dailyLogId, event))
+    })
+
+    return () => events.close()
   }, [dailyLog.id])
 
   return { dutyStatuses, isLoading }
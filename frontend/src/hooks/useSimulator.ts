@@ -394,34 +394,26 @@ export function useSimulator() {
         throw new Error('Failed to create daily log')
       }
 
-      // Save all duty status events
-      for (const event of events) {
-        const { error: dutyStatusError } = await api.POST(
-          '/api/daily-logs/{daily_log_id}/duty-statuses',
-          {
-            params: {
-              path: { daily_log_id: dailyLog?.id },
-            },
-            body: {
-              duty_status: event.status,
-              location_address: event.location,
-              latitude:
-                typeof event.lat === 'string'
-                  ? parseFloat(event.lat)
-                  : event.lat,
-              longitude:
-                typeof event.lng === 'string'
-                  ? parseFloat(event.lng)
-                  : event.lng,
-              timestamp: event.time.toISOString(),
-              notes: event.notes,
-            } as components['schemas']['DutyStatusCreateInput'],
-          }
-        )
-
-        if (dutyStatusError) {
-          // handle error (removed console)
+      // Save all duty status events in one batch
+      const { data: batch, error: batchError } = await api.POST(
+        '/api/duty-statuses/batch',
+        {
+          body: events.map(event => ({
+            daily_log_id: dailyLog.id as number,
+            duty_status: event.status,
+            location_address: event.location,
+            latitude:
+              typeof event.lat === 'string' ? parseFloat(event.lat) : event.lat,
+            longitude:
+              typeof event.lng === 'string' ? parseFloat(event.lng) : event.lng,
+            timestamp: event.time.toISOString(),
+            notes: event.notes,
+          })) as components['schemas']['DutyStatusBatchItem'][],
         }
+      )
+
+      if (batchError || !batch || batch.errors > 0) {
+        // handle error (removed console)
       }
 
       // Format result for display
@@ -15,7 +15,7 @@ export interface paths {
     put?: never
     /**
      * Login
-     * @description Authenticate user and return user data
+     * @description Authenticate user and return user data with a bearer token
      */
     post: operations['trips_api_login']
     delete?: never
@@ -35,7 +35,7 @@ export interface paths {
     put?: never
     /**
      * Logout
-     * @description Log out the current user (session-based)
+     * @description Log out the current user, revoking their bearer token
      */
     post: operations['trips_api_logout']
     delete?: never
@@ -44,6 +44,26 @@ export interface paths {
     patch?: never
     trace?: never
   }
+  '/api/me': {
+    parameters: {
+      query?: never
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    /**
+     * Me
+     * @description Who the request is authenticated as, by bearer token or session
+     */
+    get: operations['trips_api_me']
+    put?: never
+    post?: never
+    delete?: never
+    options?: never
+    head?: never
+    patch?: never
+    trace?: never
+  }
   '/api/daily-logs': {
     parameters: {
       query?: never
@@ -53,7 +73,7 @@ export interface paths {
     }
     /**
      * List Daily Logs
-     * @description Get all daily logs
+     * @description Get daily logs, newest first, one cursor page at a time
      */
     get: operations['trips_api_list_daily_logs']
     put?: never
@@ -120,6 +140,26 @@ export interface paths {
     patch?: never
     trace?: never
   }
+  '/api/duty-statuses/batch': {
+    parameters: {
+      query?: never
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    get?: never
+    put?: never
+    /**
+     * Create Duty Statuses Batch
+     * @description Create duty statuses for one or many daily logs in a single transaction
+     */
+    post: operations['trips_api_create_duty_statuses_batch']
+    delete?: never
+    options?: never
+    head?: never
+    patch?: never
+    trace?: never
+  }
   '/api/duty-statuses/{duty_status_id}': {
     parameters: {
       query?: never
@@ -148,6 +188,26 @@ export interface paths {
     patch?: never
     trace?: never
   }
+  '/api/routes': {
+    parameters: {
+      query?: never
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    /**
+     * Get Road Route
+     * @description Get the road route through 'lat,lon;lat,lon;...' as an encoded polyline
+     */
+    get: operations['trips_api_get_road_route']
+    put?: never
+    post?: never
+    delete?: never
+    options?: never
+    head?: never
+    patch?: never
+    trace?: never
+  }
 }
 export type webhooks = Record<string, never>
 export interface components {
@@ -189,9 +249,26 @@ export interface components {
       /** Success */
       success: boolean
       user?: components['schemas']['User2'] | null
-      driver?: components['schemas']['Driver2'] | null
+      driver?: components['schemas']['DriverSchema'] | null
       /** Message */
       message?: string
+      /** Token */
+      token?: string | null
+      /** Expires At */
+      expires_at?: string | null
+    }
+    /** PrincipalSchema */
+    PrincipalSchema: {
+      /** User Id */
+      user_id: number
+      /** Username */
+      username: string
+      /** Driver Id */
+      driver_id: number | null
+      /** Is Staff */
+      is_staff: boolean
+      /** Expires At */
+      expires_at?: string | null
     }
     /** Permission */
     Permission: {
@@ -305,17 +382,16 @@ export interface components {
       /** Password */
       password: string
     }
-    /** DailyLog */
-    DailyLog: {
-      /** ID */
-      id?: number | null
-      driver: components['schemas']['Driver']
-      truck: components['schemas']['Truck']
-      trailer: components['schemas']['Trailer']
-      /**
-       * Status
-       * @default planning
-       */
+    /**
+     * DailyLogSchema
+     * @description A daily log with the ids of its driver and equipment and the few fields
+     *     lists show. The related objects themselves are only embedded when asked
+     *     for with ?expand=driver,co_driver,truck,trailer.
+     */
+    DailyLogSchema: {
+      /** Id */
+      id: number
+      /** Status */
       status: string
       /**
        * Created At
@@ -327,28 +403,46 @@ export interface components {
        * Format: date-time
        */
       updated_at: string
-    }
-    /** Driver */
-    Driver: {
-      /** ID */
-      id?: number | null
-      user: components['schemas']['User']
+      /** Driver Id */
+      driver_id: number
+      /** Co Driver Id */
+      co_driver_id?: number | null
+      /** Truck Id */
+      truck_id: number
+      /** Trailer Id */
+      trailer_id: number
+      /** Driver Name */
+      driver_name: string
+      /** Truck Number */
+      truck_number: string
+      /** Trailer Number */
+      trailer_number: string
+      /** Miles */
+      miles: number
+      driver?: components['schemas']['DriverSchema'] | null
+      co_driver?: components['schemas']['DriverSchema'] | null
+      truck?: components['schemas']['Truck'] | null
+      trailer?: components['schemas']['Trailer'] | null
+    }
+    /** PagedDailyLogSchema */
+    PagedDailyLogSchema: {
+      /** Items */
+      items: components['schemas']['DailyLogSchema'][]
+      /** Next Cursor */
+      next_cursor?: string | null
+    }
+    /** DriverSchema */
+    DriverSchema: {
+      /** Id */
+      id: number
+      /** Name */
+      name: string
+      /** Username */
+      username: string
       /** License Number */
       license_number: string
       /** Phone */
       phone: string
-      /** Address */
-      address: string
-      /**
-       * Created At
-       * Format: date-time
-       */
-      created_at: string
-      /**
-       * Updated At
-       * Format: date-time
-       */
-      updated_at: string
     }
     /** Trailer */
     Trailer: {
@@ -360,16 +454,6 @@ export interface components {
       trailer_type: string
       /** Capacity */
       capacity: string
-      /**
-       * Created At
-       * Format: date-time
-       */
-      created_at: string
-      /**
-       * Updated At
-       * Format: date-time
-       */
-      updated_at: string
     }
     /** Truck */
     Truck: {
@@ -383,16 +467,6 @@ export interface components {
       year: number
       /** License Plate */
       license_plate: string
-      /**
-       * Created At
-       * Format: date-time
-       */
-      created_at: string
-      /**
-       * Updated At
-       * Format: date-time
-       */
-      updated_at: string
     }
     /** User */
     User: {
@@ -463,6 +537,19 @@ export interface components {
        */
       status: string
     }
+    /** DailyLogUpdateInput */
+    DailyLogUpdateInput: {
+      /** Driver Id */
+      driver_id?: number | null
+      /** Co Driver Id */
+      co_driver_id?: number | null
+      /** Truck Id */
+      truck_id?: number | null
+      /** Trailer Id */
+      trailer_id?: number | null
+      /** Status */
+      status?: string | null
+    }
     /** DutyStatus */
     DutyStatus: {
       /** ID */
@@ -504,6 +591,64 @@ export interface components {
       timestamp: string
       /** Notes */
       notes?: string | null
+      /** Idempotency Key */
+      idempotency_key?: string | null
+    }
+    /** DutyStatusBatchResponse */
+    DutyStatusBatchResponse: {
+      /** Created */
+      created: number
+      /** Duplicates */
+      duplicates: number
+      /** Errors */
+      errors: number
+      /** Events Per Second */
+      events_per_second: number
+      /** Results */
+      results: components['schemas']['DutyStatusBatchResult'][]
+    }
+    /** DutyStatusBatchResult */
+    DutyStatusBatchResult: {
+      /** Index */
+      index: number
+      /** Status */
+      status: string
+      /** Id */
+      id?: number | null
+      /** Error */
+      error?: string | null
+    }
+    /** DutyStatusBatchItem */
+    DutyStatusBatchItem: {
+      /** Duty Status */
+      duty_status: string
+      /** Location Address */
+      location_address: string
+      /** Latitude */
+      latitude?: number | null
+      /** Longitude */
+      longitude?: number | null
+      /** Timestamp */
+      timestamp: string
+      /** Notes */
+      notes?: string | null
+      /** Idempotency Key */
+      idempotency_key?: string | null
+      /** Daily Log Id */
+      daily_log_id: number
+    }
+    /** RouteSchema */
+    RouteSchema: {
+      /** Polyline */
+      polyline: string
+      /** Distance Km */
+      distance_km: number
+      /** Duration Hours */
+      duration_hours: number
+      /** Provider */
+      provider: string
+      /** Cached */
+      cached: boolean
     }
   }
   responses: never
@@ -556,7 +701,7 @@ export interface operations {
       }
     }
   }
-  trips_api_list_daily_logs: {
+  trips_api_me: {
     parameters: {
       query?: never
       header?: never
@@ -571,7 +716,36 @@ export interface operations {
           [name: string]: unknown
         }
         content: {
-          'application/json': components['schemas']['DailyLog'][]
+          'application/json': components['schemas']['PrincipalSchema']
+        }
+      }
+    }
+  }
+  trips_api_list_daily_logs: {
+    parameters: {
+      query?: {
+        driver_id?: number | null
+        truck_id?: number | null
+        status?: string | null
+        created_after?: string | null
+        created_before?: string | null
+        expand?: string | null
+        cursor?: string | null
+        limit?: number
+      }
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    requestBody?: never
+    responses: {
+      /** @description OK */
+      200: {
+        headers: {
+          [name: string]: unknown
+        }
+        content: {
+          'application/json': components['schemas']['PagedDailyLogSchema']
         }
       }
     }
@@ -595,14 +769,16 @@ export interface operations {
           [name: string]: unknown
         }
         content: {
-          'application/json': components['schemas']['DailyLog']
+          'application/json': components['schemas']['DailyLogSchema']
         }
       }
     }
   }
   trips_api_get_daily_log: {
     parameters: {
-      query?: never
+      query?: {
+        expand?: string | null
+      }
       header?: never
       path: {
         daily_log_id: number
@@ -617,7 +793,7 @@ export interface operations {
           [name: string]: unknown
         }
         content: {
-          'application/json': components['schemas']['DailyLog']
+          'application/json': components['schemas']['DailyLogSchema']
         }
       }
     }
@@ -633,7 +809,7 @@ export interface operations {
     }
     requestBody: {
       content: {
-        'application/json': components['schemas']['DailyLog']
+        'application/json': components['schemas']['DailyLogUpdateInput']
       }
     }
     responses: {
@@ -643,7 +819,7 @@ export interface operations {
           [name: string]: unknown
         }
         content: {
-          'application/json': components['schemas']['DailyLog']
+          'application/json': components['schemas']['DailyLogSchema']
         }
       }
     }
@@ -716,6 +892,30 @@ export interface operations {
       }
     }
   }
+  trips_api_create_duty_statuses_batch: {
+    parameters: {
+      query?: never
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    requestBody: {
+      content: {
+        'application/json': components['schemas']['DutyStatusBatchItem'][]
+      }
+    }
+    responses: {
+      /** @description OK */
+      200: {
+        headers: {
+          [name: string]: unknown
+        }
+        content: {
+          'application/json': components['schemas']['DutyStatusBatchResponse']
+        }
+      }
+    }
+  }
   trips_api_get_duty_status: {
     parameters: {
       query?: never
@@ -784,4 +984,26 @@ export interface operations {
       }
     }
   }
+  trips_api_get_road_route: {
+    parameters: {
+      query: {
+        waypoints: string
+      }
+      header?: never
+      path?: never
+      cookie?: never
+    }
+    requestBody?: never
+    responses: {
+      /** @description OK */
+      200: {
+        headers: {
+          [name: string]: unknown
+        }
+        content: {
+          'application/json': components['schemas']['RouteSchema']
+        }
+      }
+    }
+  }
 }
@@ -1,42 +1,44 @@
-// Mapbox Directions API utility for road-following coordinates
-// Free tier: 100,000 requests/month
-// Requires Mapbox access token
+// Road-following coordinates from the backend's route service (/api/routes),
+// which calls the routing provider and caches routes for every client
+
+import { api } from '@/api/Api'
 
 interface RouteCoordinate {
   lat: number
   lng: number
 }
 
-interface MapboxRouteResponse {
-  routes: Array<{
-    geometry: {
-      coordinates: Array<[number, number]> // [lng, lat] format
+/**
+ * Decode an encoded polyline (Google's format, 5 decimal places)
+ */
+export function decodePolyline(encoded: string): RouteCoordinate[] {
+  const points: RouteCoordinate[] = []
+  let index = 0
+  let lat = 0
+  let lng = 0
+
+  while (index < encoded.length) {
+    const deltas: number[] = []
+    for (let value = 0; value < 2; value++) {
+      let shift = 0
+      let result = 0
+      let byte: number
+      do {
+        byte = encoded.charCodeAt(index++) - 63
+        result |= (byte & 0x1f) << shift
+        shift += 5
+      } while (byte >= 0x20)
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1)
     }
-    distance: number
-    duration: number
-  }>
-  code: string
+    lat += deltas[0]
+    lng += deltas[1]
+    points.push({ lat: lat / 1e5, lng: lng / 1e5 })
+  }
+
+  return points
 }
 
 export class RouteService {
-  private static readonly BASE_URL =
-    'https://api.mapbox.com/directions/v5/mapbox/driving'
-
-  /**
-   * Get the Mapbox access token from environment or show error
-   */
-  private static getAccessToken(): string {
-    // In a real app, this would come from environment variables
-    // For now, we'll use a placeholder and show instructions
-    const token = import.meta.env.VITE_MAPBOX_ACCESS_TOKEN
-
-    if (!token) {
-      return ''
-    }
-
-    return token
-  }
-
   /**
    * Get road-following coordinates between two points
    */
@@ -44,44 +46,7 @@ export class RouteService {
     start: RouteCoordinate,
     end: RouteCoordinate
   ): Promise<RouteCoordinate[]> {
-    const accessToken = this.getAccessToken()
-
-    if (!accessToken) {
-      // Fallback to direct line if no token
-      return [start, end]
-    }
-
-    try {
-      const coordinates = `${start.lng},${start.lat};${end.lng},${end.lat}`
-      const url = `${this.BASE_URL}/${coordinates}?geometries=geojson&access_token=${accessToken}`
-
-      const response = await fetch(url)
-
-      if (!response.ok) {
-        throw new Error(
-          `Mapbox API error: ${response.status} ${response.statusText}`
-        )
-      }
-
-      const data: MapboxRouteResponse = await response.json()
-
-      if (!data.routes || data.routes.length === 0) {
-        throw new Error('No route found')
-      }
-
-      // Convert [lng, lat] back to {lat, lng} format
-      const coordinates_result = data.routes[0].geometry.coordinates.map(
-        coord => ({
-          lng: coord[0],
-          lat: coord[1],
-        })
-      )
-
-      return coordinates_result
-    } catch {
-      // Fallback to direct line if API fails
-      return [start, end]
-    }
+    return this.getMultiPointRoute([start, end])
   }
 
   /**
@@ -94,64 +59,25 @@ export class RouteService {
       return waypoints
     }
 
-    const accessToken = this.getAccessToken()
-
-    if (!accessToken) {
-      // Fallback to direct lines if no token
-      return waypoints
-    }
-
     try {
-      const coordinates = waypoints
-        .map(point => `${point.lng},${point.lat}`)
-        .join(';')
-      const url = `${this.BASE_URL}/${coordinates}?geometries=geojson&access_token=${accessToken}`
-
-      const response = await fetch(url)
-
-      if (!response.ok) {
-        throw new Error(
-          `Mapbox API error: ${response.status} ${response.statusText}`
-        )
-      }
-
-      const data: MapboxRouteResponse = await response.json()
-
-      if (!data.routes || data.routes.length === 0) {
+      const { data, error } = await api.GET('/api/routes', {
+        params: {
+          query: {
+            waypoints: waypoints
+              .map(point => `${point.lat},${point.lng}`)
+              .join(';'),
+          },
+        },
+      })
+
+      if (error || !data) {
         throw new Error('No route found')
       }
 
-      // Convert [lng, lat] back to {lat, lng} format
-      const coordinates_result = data.routes[0].geometry.coordinates.map(
-        coord => ({
-          lng: coord[0],
-          lat: coord[1],
-        })
-      )
-
-      return coordinates_result
+      return decodePolyline(data.polyline)
     } catch {
-      // Fallback to direct lines if API fails
+      // Fallback to direct lines if the route service fails
       return waypoints
     }
   }
-
-  /**
-   * Calculate total distance and duration from route response
-   */
-  static getRouteStats(routeResponse: MapboxRouteResponse): {
-    distance: number
-    duration: number
-  } {
-    if (!routeResponse.routes || routeResponse.routes.length === 0) {
-      return { distance: 0, duration: 0 }
-    }
-
-    const route = routeResponse.routes[0]
-
-    return {
-      distance: route.distance / 1000, // Convert to km
-      duration: route.duration / 3600, // Convert to hours
-    }
-  }
 }